@@ -0,0 +1,147 @@
+"""
+Benchmark: per-alert queries vs set-based alert matching.
+
+Runs against session-local TEMP copies of ``cars``, ``car_price_history``,
+``price_alerts`` and ``alert_matches`` cloned from the real schema (run
+``python -m scraper.src.db`` once first), so nothing persistent is
+touched. Seeds 50k existing listings and 100k alerts over a few thousand
+keywords, then syncs 10k new listings through ``upsert_listings`` and
+times:
+
+- per-alert: one full-text + price query per alert against the listings
+  of the sync (timed on a sample and extrapolated to every alert)
+- set-based: ``match_alerts`` — one INSERT ... SELECT for all alerts
+
+Both must find the same matches for the sampled alerts.
+
+Usage (from project root):
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_alert_matching
+"""
+
+import os
+import random
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from benchmarks.bench_load_data import synthetic_cars
+from scraper.src.alerts import match_alerts
+from scraper.src.db import upsert_listings
+
+EXISTING = 50_000
+NEW_LISTINGS = 10_000
+ALERTS = 100_000
+SAMPLE = 1_000
+
+MODELS = (
+    "Honda Civic", "Honda Accord", "Honda CR-V", "Toyota Corolla", "Toyota Camry",
+    "Toyota RAV4", "Toyota Tacoma", "Ford F-150", "Ford Escape", "Ford Mustang",
+    "Chevrolet Silverado", "Chevrolet Equinox", "Dodge Ram", "GMC Sierra",
+    "Hyundai Elantra", "Hyundai Tucson", "Kia Soul", "Kia Sorento", "Mazda CX-5",
+    "Mazda 3", "Nissan Rogue", "Nissan Altima", "Subaru Outback", "Subaru Forester",
+    "Jeep Wrangler", "Jeep Cherokee", "Volkswagen Jetta", "Volkswagen Golf",
+    "BMW 330i", "Audi A4",
+)
+TRIMS = ("", " LX", " EX", " Sport", " Limited", " XLT", " SE", " Touring")
+
+PER_ALERT_SQL = """
+    SELECT c.id, c.price_cents FROM cars AS c
+    WHERE to_tsvector('english', c.title) @@ plainto_tsquery('english', %s)
+      AND c.price_cents <= %s * 100
+      AND c.id IN (SELECT listing_id FROM car_price_history WHERE observed_at >= %s)
+"""
+
+
+def listings(n, start):
+    cars = synthetic_cars(start + n)[start:]
+    for i, car in enumerate(cars, start):
+        car["title"] = f"{2008 + i % 16} {MODELS[i % len(MODELS)]}{TRIMS[i % len(TRIMS)]}"
+    return cars
+
+
+def alert_rows(n, rng):
+    """Alerts on a model, a model year or a model year and trim, mostly below market."""
+    def keyword():
+        model = rng.choice(MODELS)
+        kind = rng.randrange(3)
+        if kind == 0:
+            return model
+        year = 2008 + rng.randrange(16)
+        return f"{year} {model}" + (rng.choice(TRIMS[1:]) if kind == 2 else "")
+
+    return [
+        (f"user{i}@example.com", rng.randrange(5, 30) * 1_000, keyword())
+        for i in range(n)
+    ]
+
+
+def temp_schema(cur):
+    for table in ("cars", "car_price_history", "price_alerts", "alert_matches"):
+        cur.execute(
+            f"CREATE TEMP TABLE {table} (LIKE public.{table} "
+            "INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING INDEXES);"
+        )
+    for table in ("cars", "price_alerts", "alert_matches"):
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT;")
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;")
+
+
+def per_alert(cur, alerts, since):
+    found = set()
+    for alert_id, target_price, keyword in alerts:
+        cur.execute(PER_ALERT_SQL, (keyword, target_price, since))
+        found.update((alert_id, car_id, price) for car_id, price in cur.fetchall())
+    return found
+
+
+def main():
+    rng = random.Random(7)
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    cur = conn.cursor()
+    temp_schema(cur)
+
+    upsert_listings(cur, listings(EXISTING, 0))
+    execute_values(
+        cur,
+        "INSERT INTO price_alerts (email, target_price, keyword) VALUES %s",
+        alert_rows(ALERTS, rng),
+        page_size=10_000,
+    )
+    # Existing history predates the sync
+    cur.execute("UPDATE car_price_history SET observed_at = observed_at - interval '1 day';")
+    cur.execute("ANALYZE cars; ANALYZE car_price_history; ANALYZE price_alerts;")
+
+    cur.execute("SELECT LOCALTIMESTAMP;")
+    since = cur.fetchone()[0]
+    upsert_listings(cur, listings(NEW_LISTINGS, EXISTING))
+    cur.execute("ANALYZE car_price_history;")
+
+    cur.execute("SELECT id, target_price, keyword FROM price_alerts ORDER BY random() LIMIT %s", (SAMPLE,))
+    sample = cur.fetchall()
+    start = time.perf_counter()
+    expected = per_alert(cur, sample, since)
+    per_alert_s = (time.perf_counter() - start) * ALERTS / SAMPLE
+
+    start = time.perf_counter()
+    matched = match_alerts(cur, since)
+    set_based_s = time.perf_counter() - start
+
+    cur.execute(
+        "SELECT alert_id, car_id, price_cents FROM alert_matches WHERE alert_id = ANY(%s)",
+        ([a[0] for a in sample],),
+    )
+    assert set(cur.fetchall()) == expected
+    rerun = match_alerts(cur, since)
+
+    print(f"{ALERTS:,} alerts x {NEW_LISTINGS:,} new listings ({EXISTING:,} existing)")
+    print(f"  per-alert : {per_alert_s:>8.2f}s (extrapolated from {SAMPLE:,} alerts)")
+    print(f"  set-based : {set_based_s:>8.2f}s — {matched:,} matches, re-run added {rerun}")
+    print(f"  speedup   : {per_alert_s / set_based_s:>8.1f}x")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
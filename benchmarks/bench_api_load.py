@@ -0,0 +1,134 @@
+"""
+Load test: sustained requests per second against a running API.
+
+Starts ``uvicorn scraper.src.api:app`` with a fixed worker count and the
+response cache off (``API_CACHE_MAX_ENTRIES=0``), so every request does
+its database work. It then drives a mix of /cars, /stats and /health
+requests from asyncio clients for a fixed duration and reports
+throughput and latency percentiles.
+
+Point ``--app-dir`` at another checkout (e.g. a ``git worktree`` of an
+older commit) to compare two versions of the API under the same load.
+
+``--seed N`` first runs ``init_db`` and syncs N synthetic listings into
+DATABASE_URL, so only use it on a scratch database.
+
+Usage (from project root):
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_api_load --seed 20000
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_api_load --workers 2 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_alert_matching import listings
+
+PATHS = (
+    "/cars",
+    "/cars?page=20",
+    "/cars?keyword=civic",
+    "/cars?max_price=15000&sort=deal",
+    "/stats",
+    "/health",
+)
+
+
+def seed(n):
+    from scraper.src.db import bump_data_version, get_db, init_db, refresh_market_stats, upsert_listings
+    from scraper.src.model import registry
+
+    init_db()
+    conn = get_db()
+    cur = conn.cursor()
+    upsert_listings(cur, listings(n, 0))
+    bump_data_version(cur)
+    refresh_market_stats(cur)
+    conn.commit()
+    registry.get(conn)
+    conn.close()
+
+
+def start_server(app_dir, port, workers):
+    env = dict(os.environ, API_CACHE_MAX_ENTRIES="0")
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "scraper.src.api:app",
+            "--app-dir", app_dir, "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("API did not start")
+
+
+async def drive(base_url, concurrency, duration):
+    latencies, errors = [], 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def client(i, http):
+        nonlocal errors
+        n = i
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = await http.get(PATHS[n % len(PATHS)])
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.TransportError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            n += 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        await asyncio.gather(*(client(i, http) for i in range(concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Car Scout API.")
+    parser.add_argument("--app-dir", default=".")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0, help="seed N listings first (scratch DB only)")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+    server = start_server(args.app_dir, args.port, args.workers)
+    try:
+        # Warm every worker's pools and model before measuring
+        asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.concurrency, 3))
+        latencies, errors = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    ms = [t * 1000 for t in latencies]
+    print(f"{args.app_dir}: {args.workers} workers, {args.concurrency} concurrent clients, {args.duration:.0f}s")
+    print(f"  requests/s : {len(ms) / args.duration:>8.1f}  ({len(ms):,} requests, {errors} errors)")
+    print(f"  p50        : {statistics.median(ms):>8.1f} ms")
+    print(f"  p99        : {ms[int(len(ms) * 0.99) - 1]:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
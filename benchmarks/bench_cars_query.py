@@ -0,0 +1,128 @@
+"""
+Benchmark: /cars query latency vs table size.
+
+Seeds a session-local TEMP ``cars`` table (it shadows the real table for
+this connection only, so nothing persistent is touched) with N synthetic
+listings, then times the SQL built by ``build_listings_query`` for a few
+typical filter combinations, next to the legacy "fetch every row" query
+the API used before filtering moved into SQL. Only one page ever leaves
+the database, so transfer cost stays flat as N grows; what remains is
+the server-side scan needed for ``COUNT(*) OVER ()``.
+
+A second table compares deep pages at the largest size: ``page=N`` with
+LIMIT/OFFSET (plus its window count) against the keyset query a
+``cursor`` request runs (``build_keyset_query``), which seeks straight
+to the page in ``idx_cars_created_at``.
+
+Usage (from project root):
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_cars_query
+"""
+
+import os
+import statistics
+import time
+
+import psycopg2
+
+from scraper.src.queries import TITLE_TSVECTOR, build_keyset_query, build_listings_query
+
+SIZES = (1_000, 10_000, 100_000)
+DEEP_PAGES = (1, 100, 1_000)
+PAGE_SIZE = 20
+REPEATS = 20
+LEGACY_SQL = "SELECT id, title, price, mileage, link FROM cars ORDER BY created_at DESC;"
+CASES = {
+    "page 1": {},
+    "page 50": {"page": 50},
+    "keyword": {"keyword": "civic"},
+    "price range": {"min_price": 10_000, "max_price": 20_000},
+}
+
+
+def seed(cur, n):
+    """(Re)create the temp cars table with n synthetic rows."""
+    cur.execute("DROP TABLE IF EXISTS pg_temp.cars;")
+    cur.execute("""
+        CREATE TEMP TABLE cars (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            price TEXT NOT NULL,
+            mileage TEXT NOT NULL,
+            link TEXT UNIQUE NOT NULL,
+            price_cents INTEGER,
+            mileage_km INTEGER,
+            model_year SMALLINT,
+            make TEXT,
+            model TEXT,
+            fair_price_cents INTEGER,
+            deal_rating TEXT,
+            deal_color TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("""
+        INSERT INTO cars (title, price, mileage, link, price_cents, mileage_km, created_at)
+        SELECT
+            (2010 + g %% 14) || ' ' ||
+                (ARRAY['Honda Civic', 'Toyota Corolla', 'Ford F-150',
+                       'Mazda CX-5', 'Kia Sportage'])[1 + g %% 5],
+            '$' || to_char(5000 + (g::bigint * 7919) %% 40000, 'FM999,999'),
+            to_char((g::bigint * 104729) %% 250000, 'FM999,999') || ' km',
+            'https://example.com/' || g,
+            (5000 + (g::bigint * 7919) %% 40000) * 100,
+            (g::bigint * 104729) %% 250000,
+            now() - g * interval '1 minute'
+        FROM generate_series(1, %s) AS g;
+    """, (n,))
+    cur.execute("CREATE INDEX ON cars (created_at DESC, id DESC);")
+    cur.execute(f"CREATE INDEX ON cars USING gin({TITLE_TSVECTOR});")
+    cur.execute("CREATE INDEX ON cars (price_cents);")
+    cur.execute("ANALYZE cars;")
+
+
+def time_query(cur, sql, params):
+    """Return median wall time in milliseconds over REPEATS runs."""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    cur = conn.cursor()
+
+    names = ["legacy full"] + list(CASES)
+    print(f"{'rows':>8} | " + " | ".join(f"{name:>12}" for name in names))
+    for n in SIZES:
+        seed(cur, n)
+        timings = [time_query(cur, LEGACY_SQL, [])] + [
+            time_query(cur, *build_listings_query(**kwargs))
+            for kwargs in CASES.values()
+        ]
+        print(f"{n:>8} | " + " | ".join(f"{t:>9.2f} ms" for t in timings))
+
+    print(f"\n{SIZES[-1]:,} rows, {PAGE_SIZE} per page")
+    print(f"{'page':>8} | {'offset':>12} | {'cursor':>12}")
+    for page in DEEP_PAGES:
+        after = None
+        if page > 1:
+            # The cursor a client would hold: the last row of the previous page
+            cur.execute(
+                "SELECT created_at, id FROM cars ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %s;",
+                ((page - 1) * PAGE_SIZE - 1,),
+            )
+            after = cur.fetchone()
+        offset_ms = time_query(cur, *build_listings_query(page=page, limit=PAGE_SIZE))
+        cursor_ms = time_query(cur, *build_keyset_query(limit=PAGE_SIZE, after=after))
+        print(f"{page:>8} | {offset_ms:>9.2f} ms | {cursor_ms:>9.2f} ms")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: per-row vs batched deal rating.
+
+Fits the pricing model on a synthetic market, then rates pages of 20,
+100 and 1000 listings two ways:
+
+- per-row: one ``predict`` call and one ``deal_rating`` call per car
+  (how /cars used to work)
+- batched: ``rate_listings`` — one ``predict`` over a NumPy array and a
+  vectorized ``np.select`` classification
+
+Usage (from project root):
+    python -m benchmarks.bench_deal_rating
+"""
+
+import statistics
+import time
+
+import numpy as np
+
+from scraper.src.model import deal_rating, fit_pricing_model, rate_listings
+
+PAGE_SIZES = (20, 100, 1000)
+REPEATS = 3
+
+
+MAKES = (("Honda", "Civic"), ("Toyota", "RAV4"), ("Ford", "F-150"), ("Kia", "Soul"))
+
+
+def synthetic_market(n, seed=42):
+    """Return n (price_cents, mileage_km, model_year, make, model) rows with a mileage/price trend."""
+    rng = np.random.default_rng(seed)
+    mileage = rng.integers(5_000, 250_000, n)
+    years = rng.integers(2008, 2025, n)
+    price = 40_000 - mileage * 0.12 + rng.normal(0, 3_000, n)
+    return [
+        (int(max(p, 1_000) * 100), int(m), int(y), *MAKES[i % len(MAKES)])
+        for i, (p, m, y) in enumerate(zip(price, mileage, years))
+    ]
+
+
+def per_row(model, values):
+    return [
+        deal_rating(model.fair_price(*row[1:]) - row[0] / 100)
+        for row in values
+    ]
+
+
+def median_ms(fn, *args):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    model = fit_pricing_model(synthetic_market(5_000), data_version=1)
+
+    print(f"{'cars':>6} | {'per-row':>12} | {'batched':>12} | {'speedup':>8}")
+    for n in PAGE_SIZES:
+        page = synthetic_market(n, seed=n)
+        assert per_row(model, page) == rate_listings(model, page)
+        slow = median_ms(per_row, model, page)
+        fast = median_ms(rate_listings, model, page)
+        print(f"{n:>6} | {slow:>9.2f} ms | {fast:>9.2f} ms | {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark: climbing get_text() vs single-pass card extraction.
+
+Builds result pages of 15, 150 and 1500 cards from the saved AutoTrader
+fixtures in ``tests/fixtures/autotrader`` (every fifth slot is a
+price-less placeholder, like the site's ad and skeleton slots) and
+extracts listings two ways:
+
+- climbing: the original loop — ``get_text()`` on each seed and up to
+  three ancestors looking for "$", then uncompiled regexes per card
+- single-pass: ``extract_listings`` — one sweep marks priced nodes, each
+  card root is found once and parsed with precompiled regexes
+
+Both must produce the same de-duplicated listings. Reports cards/sec
+including HTML parsing.
+
+Usage (from project root):
+    python -m benchmarks.bench_extract
+"""
+
+import glob
+import hashlib
+import os
+import re
+import statistics
+import time
+import urllib.parse
+
+from bs4 import BeautifulSoup
+
+from scraper.src.main import extract_listings
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "autotrader"
+)
+CARD_COUNTS = (15, 150, 1500)
+REPEATS = 3
+
+PLACEHOLDER = """
+    <div class="result-item sponsored">
+      <div class="listing-details"><span class="proximity-text">Sponsored</span></div>
+    </div>
+"""
+
+
+def fixture_cards():
+    """Return the card markup blocks from every saved result page."""
+    cards = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "results_*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        cards += re.findall(r'    <div class="result-item">.*?\n    </div>\n', html, re.S)
+    return cards
+
+
+def build_page(cards, n):
+    """A results page of n slots, each card given a distinct model year."""
+    slots = []
+    for i in range(n):
+        if i % 5 == 4:
+            slots.append(PLACEHOLDER)
+            continue
+        card = cards[i % len(cards)]
+        slots.append(re.sub(r"(19|20)\d{2}", str(1990 + i % 35), card, count=1)
+                     .replace("$", f"${i % 9 + 1}", 1))
+    return (
+        "<html><body><div id='result-list'>" + "".join(slots) + "</div></body></html>"
+    )
+
+
+def legacy_parse_card(soup):
+    text = soup.get_text(separator=" ", strip=True)
+    data = {}
+    match = re.search(r"\$[0-9,]+", text)
+    data["price"] = match.group(0) if match else "N/A"
+    matches = re.findall(r"(\d{1,3}(?:,\d{3})*|\d+)\s*km", text, re.IGNORECASE)
+    data["mileage"] = (
+        f"{max(int(m.replace(',', '')) for m in matches):,} km" if matches else "N/A"
+    )
+    title_tag = soup.find(
+        ["h2", "span"],
+        class_=lambda x: x and ("title" in x.lower() or "make-model" in x.lower()),
+    )
+    data["title"] = title_tag.get_text(strip=True) if title_tag else "N/A"
+    if data["title"] == "N/A":
+        match = re.search(r"(19|20)\d{2}\s+[A-Za-z]{3,}", text)
+        if match:
+            data["title"] = match.group(0)
+    safe_query = urllib.parse.quote(f"{data['title']} Sudbury AutoTrader")
+    unique_ref = hashlib.md5((data["title"] + data["price"]).encode()).hexdigest()[:10]
+    data["link"] = f"https://www.google.com/search?q={safe_query}&ref={unique_ref}"
+    return data
+
+
+def legacy_extract(html):
+    soup = BeautifulSoup(html, "html.parser")
+    seeds = soup.find_all(
+        "div",
+        class_=lambda x: x and ("re-layout-inner" in x or "listing-details" in x),
+    )
+    listings = []
+    for seed in seeds:
+        context = seed
+        found_dollar = False
+        for _ in range(4):
+            if "$" in context.get_text():
+                found_dollar = True
+                break
+            if context.parent:
+                context = context.parent
+        if not found_dollar:
+            continue
+        item = legacy_parse_card(context)
+        if item["title"] != "N/A" and item["price"] != "N/A":
+            listings.append(item)
+    return listings
+
+
+def dedup(listings):
+    seen, out = set(), []
+    for item in listings:
+        sig = f"{item['title']}-{item['price']}"
+        if sig not in seen:
+            seen.add(sig)
+            out.append(item)
+    return out
+
+
+def median_s(fn, *args):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    cards = fixture_cards()
+    print(f"{'cards':>6} | {'climbing':>14} | {'single-pass':>14} | {'speedup':>8}")
+    for n in CARD_COUNTS:
+        html = build_page(cards, n)
+        expected = dedup(legacy_extract(html))
+        assert dedup(extract_listings(html)) == expected
+        found = len(expected)
+        slow = median_s(legacy_extract, html)
+        fast = median_s(extract_listings, html)
+        print(
+            f"{n:>6} | {found / slow:>8.0f} c/s   | {found / fast:>8.0f} c/s   | "
+            f"{slow / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
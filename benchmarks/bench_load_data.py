@@ -0,0 +1,97 @@
+"""
+Benchmark: legacy per-row ingest vs bulk COPY + upsert.
+
+Runs against session-local TEMP ``cars`` and ``car_price_history``
+tables cloned from the real schema (run ``python -m scraper.src.db`` once first), so nothing
+persistent is touched. For 10k and 100k synthetic listings it times:
+
+- legacy: ``SELECT id ... WHERE link = %s`` + ``INSERT`` per listing
+- bulk:   ``upsert_listings`` into an empty table
+- resync: ``upsert_listings`` again with 10% of prices changed
+
+Usage (from project root):
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_load_data
+"""
+
+import os
+import time
+
+import psycopg2
+
+from scraper.src.db import upsert_listings
+from scraper.src.normalize import parse_mileage_km, parse_price_cents
+
+SIZES = (10_000, 100_000)
+
+
+def synthetic_cars(n, reprice_every=0):
+    cars = []
+    for i in range(n):
+        price = 5_000 + (i * 7919) % 40_000
+        if reprice_every and i % reprice_every == 0:
+            price -= 500
+        cars.append({
+            "title": f"{2010 + i % 14} Honda Civic #{i}",
+            "price": f"${price:,}",
+            "mileage": f"{(i * 104729) % 250_000:,} km",
+            "link": f"https://www.autotrader.ca/a/{i}",
+        })
+    return cars
+
+
+def fresh_table(cur):
+    cur.execute("DROP TABLE IF EXISTS pg_temp.cars;")
+    cur.execute("CREATE TEMP TABLE cars (LIKE public.cars INCLUDING INDEXES);")
+    cur.execute("ALTER TABLE cars ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;")
+    cur.execute("ALTER TABLE cars ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP;")
+    # Give the legacy path the link index it relied on (UNIQUE(link))
+    cur.execute("CREATE INDEX ON cars (link);")
+    # Shadow the history table too; upsert_listings appends to it
+    cur.execute("DROP TABLE IF EXISTS pg_temp.car_price_history;")
+    cur.execute(
+        "CREATE TEMP TABLE car_price_history "
+        "(LIKE public.car_price_history INCLUDING DEFAULTS INCLUDING INDEXES);"
+    )
+
+
+def legacy_load(cur, cars):
+    for car in cars:
+        cur.execute("SELECT id FROM cars WHERE link = %s", (car["link"],))
+        if not cur.fetchone():
+            cur.execute(
+                "INSERT INTO cars (title, price, mileage, link, listing_key, "
+                "price_cents, mileage_km) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (car["title"], car["price"], car["mileage"], car["link"], car["link"],
+                 parse_price_cents(car["price"]), parse_mileage_km(car["mileage"])),
+            )
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    cur = conn.cursor()
+
+    print(f"{'rows':>8} | {'legacy':>9} | {'bulk':>9} | {'resync':>9} | resync counts (ins/upd/unch)")
+    for n in SIZES:
+        cars = synthetic_cars(n)
+
+        fresh_table(cur)
+        legacy_s, _ = timed(legacy_load, cur, cars)
+
+        fresh_table(cur)
+        bulk_s, _ = timed(upsert_listings, cur, cars)
+        resync_s, counts = timed(upsert_listings, cur, synthetic_cars(n, reprice_every=10))
+
+        print(f"{n:>8} | {legacy_s:>8.2f}s | {bulk_s:>8.2f}s | {resync_s:>8.2f}s | {counts}")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark: listing extraction throughput per HTML parser backend.
+
+Extracts listings from result pages of 15, 150 and 1500 cards built from
+the saved AutoTrader fixtures (see ``bench_extract``) with every backend
+in ``parsing.PARSERS`` and checks they all return the same listings.
+Reports cards/sec including parsing the HTML.
+
+Usage (from project root):
+    python -m benchmarks.bench_parsers
+"""
+
+import statistics
+import time
+
+from benchmarks.bench_extract import CARD_COUNTS, build_page, fixture_cards
+from scraper.src.main import extract_listings
+from scraper.src.parsing import PARSERS
+
+REPEATS = 5
+
+
+def cards_per_sec(html, parser, found):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        extract_listings(html, parser)
+        samples.append(time.perf_counter() - start)
+    return found / statistics.median(samples)
+
+
+def main():
+    cards = fixture_cards()
+    print(f"{'cards':>6} | " + " | ".join(f"{p:>14}" for p in PARSERS))
+    for n in CARD_COUNTS:
+        html = build_page(cards, n)
+        expected = extract_listings(html, "html.parser")
+        for parser in PARSERS[1:]:
+            assert extract_listings(html, parser) == expected, parser
+        rates = [cards_per_sec(html, p, len(expected)) for p in PARSERS]
+        print(f"{n:>6} | " + " | ".join(f"{r:>10.0f} c/s" for r in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: pricing model accuracy and inference cost.
+
+Generates a synthetic market whose prices depend on make/model, model
+year and mileage, renders each listing as a title ("2019 Honda Civic
+EX") and parses it back with ``normalize.parse_title`` the way ingest
+does. Three models are fitted on the same training split and scored on a
+held-out split:
+
+- forest: the previous model — a 100-tree Random Forest on mileage only
+- segment median: median price per (make, model, year), falling back to
+  (make, model), make and the market median
+- gradient boosting: ``fit_pricing_model`` (mileage, year, make, model)
+
+Reports mean absolute error, R², fit time, predict time for a /cars page
+and for a full re-scoring pass, and the pickled model size.
+
+Usage (from project root):
+    python -m benchmarks.bench_pricing_model
+"""
+
+import pickle
+import statistics
+import time
+from collections import defaultdict
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from scraper.src.model import fit_pricing_model
+from scraper.src.normalize import parse_title
+
+TRAIN = 20_000
+TEST = 5_000
+PAGE = 20
+REPEATS = 50
+
+# (make, model, new price in dollars)
+CATALOG = (
+    ("Honda", "Civic", 28_000), ("Honda", "CR-V", 36_000), ("Toyota", "Corolla", 26_000),
+    ("Toyota", "RAV4", 37_000), ("Toyota", "Tacoma", 45_000), ("Ford", "F-150", 55_000),
+    ("Ford", "Escape", 34_000), ("Chevrolet", "Silverado", 52_000), ("Chevrolet", "Equinox", 33_000),
+    ("Ram", "1500", 54_000), ("GMC", "Sierra", 56_000), ("Hyundai", "Elantra", 24_000),
+    ("Hyundai", "Tucson", 33_000), ("Kia", "Soul", 23_000), ("Kia", "Sorento", 38_000),
+    ("Mazda", "CX-5", 35_000), ("Mazda", "3", 25_000), ("Nissan", "Rogue", 34_000),
+    ("Subaru", "Outback", 38_000), ("Subaru", "Ascent", 45_000), ("Jeep", "Wrangler", 48_000),
+    ("Volkswagen", "Jetta", 27_000), ("BMW", "330i", 55_000), ("Audi", "Q5", 58_000),
+    ("Mercedes-Benz", "GLC", 62_000), ("Porsche", "Macan", 75_000), ("Nissan", "Altima", 30_000),
+    ("Dodge", "Charger", 40_000), ("Lexus", "RX", 65_000), ("Mitsubishi", "Mirage", 18_000),
+)
+TRIMS = ("", " LX", " EX", " Sport", " Limited", " XLT", " SE", " Touring")
+
+
+def synthetic_market(n, seed=42):
+    """Return n (price_cents, mileage_km, model_year, make, model) rows parsed from titles."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        make, model, new_price = CATALOG[rng.integers(len(CATALOG))]
+        year = int(rng.integers(2006, 2026))
+        age = 2026 - year
+        mileage = max(1_000, int(age * 16_000 * rng.lognormal(0, 0.35)))
+        price = new_price * 0.87 ** age - 0.04 * (mileage - age * 16_000)
+        price = max(1_500, price * rng.lognormal(0, 0.08))
+        # Some dealers leave the year out of the title
+        title = f"{year} " if rng.random() > 0.05 else ""
+        title += f"{make} {model}{TRIMS[i % len(TRIMS)]}"
+        rows.append((int(price * 100), mileage, *parse_title(title)))
+    return rows
+
+
+class SegmentMedian:
+    """Median price per (make, model, year), with coarser fallbacks."""
+
+    MIN_COUNT = 3
+
+    def __init__(self, rows):
+        groups = defaultdict(list)
+        for price_cents, _, year, make, model in rows:
+            for key in ((make, model, year), (make, model), (make,)):
+                groups[key].append(price_cents / 100)
+        self.medians = {k: statistics.median(v) for k, v in groups.items() if len(v) >= self.MIN_COUNT}
+        self.default = statistics.median(r[0] / 100 for r in rows)
+
+    def fair_prices(self, features):
+        out = []
+        for _, year, make, model in features:
+            for key in ((make, model, year), (make, model), (make,)):
+                if key in self.medians:
+                    out.append(self.medians[key])
+                    break
+            else:
+                out.append(self.default)
+        return np.array(out)
+
+
+class MileageForest:
+    """The previous model: Random Forest on mileage alone."""
+
+    def __init__(self, rows):
+        self.estimator = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.estimator.fit(np.array([[r[1]] for r in rows], dtype=float), [r[0] / 100 for r in rows])
+
+    def fair_prices(self, features):
+        return self.estimator.predict(np.array([[f[0]] for f in features], dtype=float))
+
+
+def median_ms(fn, *args, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    train = synthetic_market(TRAIN)
+    test = synthetic_market(TEST, seed=7)
+    features = [r[1:] for r in test]
+    actual = np.array([r[0] / 100 for r in test])
+    page = features[:PAGE]
+
+    fitters = (
+        ("forest (mileage)", MileageForest),
+        ("segment median", SegmentMedian),
+        ("gradient boosting", lambda rows: fit_pricing_model(rows, data_version=1)),
+    )
+    print(f"{TRAIN:,} training / {TEST:,} held-out listings\n")
+    print(
+        f"{'model':<18} | {'MAE':>8} | {'R²':>6} | {'fit':>8} | "
+        f"{f'{PAGE}-row page':>11} | {f'{TEST:,} rows':>10} | {'size':>9}"
+    )
+    for name, fit in fitters:
+        start = time.perf_counter()
+        model = fit(train)
+        fit_s = time.perf_counter() - start
+        predicted = model.fair_prices(features)
+        mae = np.mean(np.abs(predicted - actual))
+        r2 = 1 - np.sum((predicted - actual) ** 2) / np.sum((actual - actual.mean()) ** 2)
+        page_ms = median_ms(model.fair_prices, page)
+        full_ms = median_ms(model.fair_prices, features, repeats=5)
+        size_kb = len(pickle.dumps(model)) / 1024
+        print(
+            f"{name:<18} | ${mae:>7,.0f} | {r2:>6.3f} | {fit_s:>6.2f} s | "
+            f"{page_ms:>8.2f} ms | {full_ms:>7.1f} ms | {size_kb:>6,.0f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Async PostgreSQL connection pool for the API's request path (asyncpg).
+
+The hot endpoints (/cars, /stats, /alert, /health) run as ``async def``
+handlers on the event loop instead of blocking a threadpool worker on
+psycopg2 I/O, so one uvicorn worker keeps many requests in flight.
+
+The query builders in ``queries.py`` emit psycopg2-style SQL with ``%s``
+placeholders. ``AsyncConnection`` accepts the same ``(sql, params)``
+pairs and rewrites them to asyncpg's ``$n`` form (memoized per SQL
+string), so both data layers share one set of builders.
+
+Like ``pool.ConnectionPool``, checkout waits up to a timeout for a free
+connection and raises ``PoolTimeout`` instead of queueing forever, and
+usage counters are exposed for /health.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Sequence
+
+import asyncpg
+
+from .logger import get_logger
+from .pool import PoolTimeout
+
+log = get_logger("aiopool")
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+
+
+@lru_cache(maxsize=256)
+def to_asyncpg(sql: str) -> str:
+    """Rewrite ``%s`` placeholders to ``$1, $2, ...`` and ``%%`` to ``%``."""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda m: f"${next(counter)}" if m.group() == "%s" else "%", sql)
+
+
+class AsyncConnection:
+    """A pooled asyncpg connection taking psycopg2-style ``(sql, params)``."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self.raw = conn
+
+    async def fetch(self, sql: str, params: Sequence = ()) -> list:
+        """Return every row (asyncpg Records index like tuples)."""
+        return await self.raw.fetch(to_asyncpg(sql), *params)
+
+    async def fetchrow(self, sql: str, params: Sequence = ()):
+        """Return the first row, or None."""
+        return await self.raw.fetchrow(to_asyncpg(sql), *params)
+
+    async def execute(self, sql: str, params: Sequence = ()) -> str:
+        """Run a statement (autocommitted) and return its status tag."""
+        return await self.raw.execute(to_asyncpg(sql), *params)
+
+
+class AsyncPool:
+    """asyncpg pool with a checkout timeout and diagnostics counters."""
+
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10, timeout: float = 5.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool: Optional[asyncpg.Pool] = None
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+
+    async def open(self) -> "AsyncPool":
+        """Connect ``minconn`` connections; errors propagate to the caller."""
+        self._pool = await asyncpg.create_pool(
+            self.dsn, min_size=self.minconn, max_size=self.maxconn
+        )
+        return self
+
+    async def acquire(self) -> AsyncConnection:
+        """Check out a connection, waiting up to ``timeout``."""
+        try:
+            conn = await self._pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        self._in_use += 1
+        self._checkouts += 1
+        return AsyncConnection(conn)
+
+    async def release(self, conn: AsyncConnection) -> None:
+        """Return a connection; asyncpg resets its session state."""
+        self._in_use -= 1
+        await self._pool.release(conn.raw)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        """Context manager yielding a pooled connection."""
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self) -> None:
+        """Close every connection held by the pool."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for diagnostics."""
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "in_use": self._in_use,
+            "available": self.maxconn - self._in_use,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+        }
+
+
+async def async_pool_from_env() -> Optional[AsyncPool]:
+    """
+    Open an AsyncPool from DATABASE_URL and the DB_POOL_* settings.
+
+    Returns None when DATABASE_URL is unset. Connection errors propagate
+    so the caller can decide whether to retry later.
+    """
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        return None
+    pool = await AsyncPool(
+        dsn,
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    ).open()
+    log.info("Async connection pool opened (min=%d, max=%d)", pool.minconn, pool.maxconn)
+    return pool
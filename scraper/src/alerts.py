@@ -0,0 +1,95 @@
+"""
+Set-based matching of price alerts against freshly synced listings.
+
+``price_alerts`` rows carry a ``query`` column (``plainto_tsquery`` of the
+keyword, generated by PostgreSQL with the same configuration as the
+``idx_cars_title`` index). After each ``load_data`` sync, ``match_alerts``
+runs one INSERT ... SELECT that:
+
+1. takes the listings inserted or re-priced since the sync started
+   (from ``car_price_history``) and parses their titles once;
+2. pairs each distinct alert keyword only with the listings containing
+   its rarest lexeme (keywords with a lexeme no listing has drop out),
+   then confirms the pair with ``@@``;
+3. fans the hits out to every alert with that keyword whose
+   ``target_price`` the listing is at or below.
+
+The work therefore scales with the size of the sync, not with the size of
+the cars table or with alerts x listings. Alerts sharing a keyword are
+evaluated once. The CTEs are MATERIALIZED on purpose: inlined, the
+planner tends to evaluate ``@@`` over every keyword x listing pair.
+
+Matches land in the ``alert_matches`` outbox, unique per (alert, listing,
+price): re-running the matcher is a no-op, and a listing that drops
+further matches again at its new price. Delivery is left to whatever
+drains the outbox (rows with ``notified_at IS NULL``).
+"""
+
+from .logger import get_logger
+
+log = get_logger("alerts")
+
+MATCH_ALERTS_SQL = """
+    WITH changed AS MATERIALIZED (
+        SELECT c.id, c.price_cents, to_tsvector('english', c.title) AS doc
+        FROM cars AS c
+        WHERE c.id IN (
+            SELECT listing_id FROM car_price_history WHERE observed_at >= %s
+        )
+          AND c.price_cents IS NOT NULL
+    ),
+    words AS MATERIALIZED (
+        SELECT id, unnest(tsvector_to_array(doc)) AS word FROM changed
+    ),
+    word_counts AS MATERIALIZED (
+        SELECT word, count(*) AS n FROM words GROUP BY word
+    ),
+    terms AS (
+        SELECT query, min(keyword) AS keyword, max(target_price) AS max_target
+        FROM price_alerts
+        WHERE query IS NOT NULL
+        GROUP BY query
+    ),
+    anchors AS MATERIALIZED (
+        SELECT terms.query, terms.max_target, rarest.word
+        FROM terms
+        CROSS JOIN LATERAL (
+            SELECT w.word, wc.n
+            FROM unnest(tsvector_to_array(to_tsvector('english', terms.keyword))) AS w (word)
+            LEFT JOIN word_counts AS wc ON wc.word = w.word
+            ORDER BY wc.n NULLS FIRST
+            LIMIT 1
+        ) AS rarest
+        WHERE rarest.n IS NOT NULL
+    ),
+    candidates AS MATERIALIZED (
+        SELECT anchors.query, anchors.max_target, words.id
+        FROM anchors JOIN words ON words.word = anchors.word
+    ),
+    hits AS (
+        SELECT candidates.query, changed.id, changed.price_cents
+        FROM candidates JOIN changed ON changed.id = candidates.id
+        WHERE changed.price_cents <= candidates.max_target * 100
+          AND changed.doc @@ candidates.query
+    )
+    INSERT INTO alert_matches (alert_id, car_id, price_cents)
+    SELECT a.id, hits.id, hits.price_cents
+    FROM hits
+    JOIN price_alerts AS a
+      ON a.query = hits.query AND a.target_price * 100 >= hits.price_cents
+    ON CONFLICT (alert_id, car_id, price_cents) DO NOTHING;
+"""
+
+
+def match_alerts(cur, since):
+    """
+    Queue outbox rows for listings inserted or re-priced at or after ``since``.
+
+    ``since`` is a database ``LOCALTIMESTAMP`` taken before the sync
+    wrote anything. Returns the number of new matches.
+    """
+    cur.execute(MATCH_ALERTS_SQL, (since,))
+    matched = cur.rowcount
+    if matched:
+        log.info("Queued %d alert matches", matched)
+    return matched
@@ -3,42 +3,97 @@ Sudbury Car Scout — FastAPI Backend
 
 Endpoints:
     GET  /         → Root health check
-    GET  /health   → Detailed system diagnostics (DB, model, uptime)
+    GET  /health   → Detailed system diagnostics (DB, pool, model, uptime)
     GET  /cars     → Paginated car listings with ML deal ratings
     GET  /stats    → Market analytics (avg price, median, mileage)
+    GET  /cars/{id}/price-history → A listing's observed price series
+    GET  /price-drops → Biggest recent price drops
     POST /alert    → Create price-drop alert (rate-limited)
+
+/health, /cars, /stats and /alert are async handlers on an asyncpg pool
+(``aiopool.py``); rating unscored rows runs in the threadpool and a stale
+model is retrained in a background process. The price endpoints and the
+model registry use the psycopg2 pool.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
+import threading
 import time
 from collections import defaultdict
-from typing import Optional
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
 
-import pandas as pd
+import asyncpg
 import psycopg2
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, EmailStr, Field
-from sklearn.ensemble import RandomForestRegressor
 
+from .aiopool import AsyncConnection, AsyncPool, async_pool_from_env
+from .cache import ResponseCache, SyncListener
 from .logger import get_logger
+from .model import rate_listings, registry
+from .pool import ConnectionPool, PoolTimeout, pool_from_env
+from .queries import (
+    DEAL_RATINGS,
+    MARKET_STATS_SQL,
+    SORT_MODES,
+    STATS_COLUMNS,
+    build_count_query,
+    build_keyset_query,
+    build_listings_query,
+    build_price_drops_query,
+    build_price_history_query,
+    decode_cursor,
+    encode_cursor,
+)
 
 load_dotenv()
 
 # ---------------------------------------------------------------------------
 # App & Logger
 # ---------------------------------------------------------------------------
+log = get_logger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the DB pools, load the persisted model and start the sync listener."""
+    global _sync_listener
+    try:
+        _get_pool()
+        await _get_apool()
+    except HTTPException as exc:
+        log.warning("DB pool not opened at startup (%s) — retrying on first request", exc.detail)
+    registry.warm()
+    dsn = os.getenv("DATABASE_URL")
+    if dsn:
+        # Runs even with the cache off: it also tracks the stamp behind ETags
+        _sync_listener = SyncListener(dsn, response_cache)
+        _sync_listener.start()
+    yield
+    if _sync_listener is not None:
+        _sync_listener.stop()
+        _sync_listener = None
+    registry.shutdown()
+    await close_apool()
+    close_pool()
+
+
 app = FastAPI(
     title="Sudbury Car Scout API",
     description="AI-powered car market analysis for Sudbury, Ontario",
     version="2.0.0",
+    lifespan=lifespan,
 )
-log = get_logger("api")
 
 START_TIME = time.time()
 
@@ -115,87 +170,178 @@ def _check_rate_limit(client_ip: str) -> None:
 # ---------------------------------------------------------------------------
 
 
-def get_db() -> psycopg2.extensions.connection:
-    """Open a new database connection with error handling."""
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        log.error("DATABASE_URL not configured")
-        raise HTTPException(status_code=503, detail="Database not configured.")
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """Return the process-wide pool, opening it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = pool_from_env()
+                except psycopg2.OperationalError as exc:
+                    log.error("Database connection failed: %s", exc)
+                    raise HTTPException(status_code=503, detail="Database unavailable.")
+                if _pool is None:
+                    log.error("DATABASE_URL not configured")
+                    raise HTTPException(status_code=503, detail="Database not configured.")
+    return _pool
+
+
+def close_pool() -> None:
+    """Close the process-wide pool (called on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+            log.info("Connection pool closed")
+
+
+@contextmanager
+def get_db() -> Iterator[psycopg2.extensions.connection]:
+    """Check out a pooled database connection with error handling."""
+    pool = _get_pool()
     try:
-        return psycopg2.connect(db_url)
+        conn = pool.getconn()
+    except PoolTimeout as exc:
+        log.error("Database pool exhausted: %s", exc)
+        raise HTTPException(status_code=503, detail="Database busy.")
     except psycopg2.OperationalError as exc:
         log.error("Database connection failed: %s", exc)
         raise HTTPException(status_code=503, detail="Database unavailable.")
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+_apool: Optional[AsyncPool] = None
+_apool_lock = asyncio.Lock()
+
+
+async def _get_apool() -> AsyncPool:
+    """Return the worker's async pool, opening it on first use."""
+    global _apool
+    if _apool is None:
+        async with _apool_lock:
+            if _apool is None:
+                try:
+                    _apool = await async_pool_from_env()
+                except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as exc:
+                    log.error("Database connection failed: %s", exc)
+                    raise HTTPException(status_code=503, detail="Database unavailable.")
+                if _apool is None:
+                    log.error("DATABASE_URL not configured")
+                    raise HTTPException(status_code=503, detail="Database not configured.")
+    return _apool
+
+
+async def close_apool() -> None:
+    """Close the async pool (called on app shutdown)."""
+    global _apool
+    if _apool is not None:
+        await _apool.close()
+        _apool = None
+        log.info("Async connection pool closed")
+
+
+@asynccontextmanager
+async def get_adb() -> AsyncIterator[AsyncConnection]:
+    """Check out a pooled async connection with error handling."""
+    pool = await _get_apool()
+    try:
+        conn = await pool.acquire()
+    except PoolTimeout as exc:
+        log.error("Database pool exhausted: %s", exc)
+        raise HTTPException(status_code=503, detail="Database busy.")
+    except (OSError, asyncpg.PostgresError) as exc:
+        log.error("Database connection failed: %s", exc)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
 
 
 # ---------------------------------------------------------------------------
-# Parsing Helpers
+# Response Cache  (in-memory, per worker; cleared when a sync commits)
 # ---------------------------------------------------------------------------
 
+response_cache = ResponseCache()
+_sync_listener: Optional[SyncListener] = None
 
-def _parse_price(raw: str) -> float:
-    """Extract numeric price from formatted string like '$15,900'."""
-    cleaned = raw.replace("$", "").replace(",", "").strip()
-    if not cleaned:
-        raise ValueError(f"Empty price value from: {raw!r}")
-    return float(cleaned)
-
+# Browsers revalidate every time (cheap: a 304 while the data is unchanged)
+CACHE_CONTROL = f"public, max-age={int(os.getenv('API_HTTP_MAX_AGE', '0'))}, must-revalidate"
 
-def _parse_mileage(raw: str) -> float:
-    """Extract numeric mileage from formatted string like '85,000 km'."""
-    cleaned = raw.lower().replace("km", "").replace(",", "").strip()
-    if not cleaned:
-        raise ValueError(f"Empty mileage value from: {raw!r}")
-    return float(cleaned)
 
+def _etag(key: tuple) -> Optional[str]:
+    """
+    Strong ETag for ``key`` at the current data stamp.
 
-# ---------------------------------------------------------------------------
-# ML Helpers
-# ---------------------------------------------------------------------------
+    The stamp advances with every committed sync and re-scoring (see
+    ``db.notify_data_change``), so stamp + normalized params identify
+    the response body in every worker. None while the sync listener
+    cannot vouch for the stamp.
+    """
+    stamp = response_cache.data_stamp
+    if stamp is None:
+        return None
+    digest = hashlib.sha1(repr((app.version, stamp, key)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 weak comparison, as If-None-Match requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
 
 
-def analyze_market(cars: list[dict]) -> Optional[RandomForestRegressor]:
+async def _cached_json(request: Request, key: tuple, build) -> Response:
     """
-    Train a Random Forest model on the given car listings.
+    Serve the rendered JSON for ``key``, awaiting ``build()`` on a miss.
+
+    ``build()`` returns ``(payload, stable)``. A payload that is not
+    stable (rows rated on the fly by this worker's in-memory model,
+    before the sync's scoring committed) is neither cached nor tagged.
 
-    Returns None if data is insufficient (< 5 rows or < 2 unique values).
+    A request whose If-None-Match carries the current ETag gets a 304
+    before the cache, the database or the model is touched.
     """
-    df = pd.DataFrame(cars)
-    if len(df) < 5:
-        return None
+    headers = {"Cache-Control": CACHE_CONTROL}
+    etag = _etag(key)
+    if etag is not None:
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={**headers, "ETag": etag})
 
-    try:
-        df["p_val"] = df["price"].astype(str).apply(
-            lambda v: float(v.replace("$", "").replace(",", "").strip())
-        )
-        df["m_val"] = df["mileage"].astype(str).apply(
-            lambda v: float(
-                v.lower().replace("km", "").replace(",", "").strip()
-            )
-        )
-    except (ValueError, KeyError):
-        log.warning("Failed to parse price/mileage for ML model training")
-        return None
+    body = response_cache.get(key)
+    if body is None:
+        generation = response_cache.generation
+        payload, stable = await build()
+        body = JSONResponse(payload).body
+        if not stable:
+            return Response(content=body, media_type="application/json", headers=headers)
+        response_cache.put(key, body, generation)
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    # Guard against degenerate data (model can't learn from constant values)
-    if df["m_val"].nunique() < 2 or df["p_val"].nunique() < 2:
-        log.info("Skipping ML model — insufficient unique values in data")
-        return None
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(df[["m_val"]], df["p_val"])
-    return model
+def _dollars(cents: Optional[int]) -> Optional[float]:
+    return cents / 100 if cents is not None else None
 
 
-def _deal_rating(diff: float) -> tuple[str, str]:
-    """Classify the deal based on predicted-vs-actual price difference."""
-    if diff > 3000:
-        return "GREAT DEAL", "green"
-    if diff > 500:
-        return "GOOD DEAL", "teal"
-    if diff < -3000:
-        return "OVERPRICED", "red"
-    return "FAIR PRICE", "gray"
+def _as_float(value) -> Optional[float]:
+    """Convert a NUMERIC aggregate (Decimal) to float, keeping NULL as None."""
+    return float(value) if value is not None else None
 
 
 # ---------------------------------------------------------------------------
@@ -216,30 +362,26 @@ def favicon():
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """
     Detailed health check — verifies DB connectivity, model availability,
     and reports uptime. Useful for monitoring and remote diagnostics.
     """
-    # 1. Database check
+    # 1. Database check (through the pool, so it also proves checkout works)
     db_status = "ok"
     try:
-        conn = psycopg2.connect(os.getenv("DATABASE_URL", ""))
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.close()
-        conn.close()
+        async with get_adb() as db:
+            await db.fetchrow("SELECT 1")
+    except HTTPException as exc:
+        db_status = f"error: {exc.detail}"
+        log.error("Health check — DB failed: %s", exc.detail)
     except Exception as exc:
         db_status = f"error: {str(exc)}"
         log.error("Health check — DB failed: %s", exc)
 
-    # 2. Model check (train on a quick probe to see if sklearn is functional)
-    model_status = "available"
-    try:
-        # Just verify sklearn is importable and functional
-        from sklearn.ensemble import RandomForestRegressor as _RF  # noqa: F401
-    except ImportError:
-        model_status = "unavailable — sklearn not installed"
+    # 2. Model check — report the cached pricing model, if any
+    model_info = registry.status()
+    model_status = "available" if model_info["trained"] else "not trained"
 
     # 3. Uptime
     uptime_seconds = int(time.time() - START_TIME)
@@ -255,38 +397,120 @@ def health_check():
         "db": db_status,
         "model": model_status,
         "uptime_seconds": uptime_seconds,
+        "model_info": model_info,
+        "db_pool": _pool.stats() if _pool else None,
+        "db_pool_async": _apool.stats() if _apool else None,
+        "response_cache": response_cache.stats(),
         "version": "2.0.0",
     }
 
 
 @app.get("/cars")
-def get_listings(
+async def get_listings(
+    request: Request,
     keyword: str = Query(default="", max_length=100),
     min_price: int = Query(default=0, ge=0),
     max_price: int = Query(default=0, ge=0),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    deal: str = Query(default="", max_length=20),
+    sort: str = Query(default="newest", max_length=20),
+    cursor: str = Query(default="", max_length=200),
+    with_total: bool = False,
 ):
     """
     Get paginated car listings with optional filters and ML deal ratings.
 
+    Filtering, ordering and pagination run in PostgreSQL, so only the
+    requested page is transferred. Deal ratings are precomputed after
+    each sync; only listings not yet scored are rated on the fly.
+
+    The keyword is a full-text search on the title (GIN-indexed). When it
+    matches nothing — typically a fragment such as "civ" — the search is
+    repeated as a substring match (trigram-indexed where available) and
+    the response reports ``"search": "partial"``.
+
+    In "newest" order every response carries ``next_cursor`` (null on the
+    last page). Passing it back as ``cursor`` — with the same filters —
+    fetches the following page by keyset on ``(created_at, id)``: deep
+    pages cost the same as the first, and listings synced in between do
+    not shift results. Cursor pages skip the total count unless
+    ``with_total`` is set.
+
+    Responses are cached per normalized query until the next sync, and
+    carry an ETag so unchanged pages can be revalidated with a 304.
+
     Query params:
-        keyword   — filter by title (case-insensitive substring match)
-        min_price — minimum price filter
-        max_price — maximum price filter
-        page      — page number (1-indexed)
-        limit     — results per page (max 100)
+        keyword    — full-text title search (words, "phrases", -exclusions)
+        min_price  — minimum price filter
+        max_price  — maximum price filter
+        page       — page number (1-indexed; ignored with cursor)
+        limit      — results per page (max 100)
+        deal       — only listings with this rating (e.g. "GREAT DEAL")
+        sort       — "newest" (default), "deal" (biggest savings first) or
+                     "relevance" (best keyword match first)
+        cursor     — next_cursor from the previous page (sort=newest only)
+        with_total — also count matching listings in cursor mode
     """
-    conn = get_db()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, title, price, mileage, link "
-            "FROM cars ORDER BY created_at DESC;"
-        )
-        rows = cur.fetchall()
-    finally:
-        conn.close()
+    deal = deal.strip().upper()
+    if deal and deal not in DEAL_RATINGS:
+        raise HTTPException(status_code=422, detail=f"deal must be one of {list(DEAL_RATINGS)}")
+    if sort not in SORT_MODES:
+        raise HTTPException(status_code=422, detail=f"sort must be one of {list(SORT_MODES)}")
+    after, partial = None, False
+    if cursor:
+        if sort != "newest":
+            raise HTTPException(status_code=422, detail="cursor requires sort=newest")
+        try:
+            after, partial = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid cursor")
+
+    # Title search ignores case and spacing, so neither splits the cache
+    keyword = " ".join(keyword.split())
+    key = ("cars", keyword.lower(), min_price, max_price, page, limit, deal, sort, cursor, with_total)
+    return await _cached_json(request, key, lambda: _listings_page(
+        keyword, min_price, max_price, page, limit, deal, sort, after, partial, with_total
+    ))
+
+
+async def _listings_page(keyword, min_price, max_price, page, limit, deal, sort, after, partial, with_total):
+    """Query, rate and shape one /cars response; returns ``(response, stable)``."""
+
+    async def fetch_page(db, partial):
+        rows = await db.fetch(*build_listings_query(
+            keyword, min_price, max_price, page, limit, deal=deal, sort=sort, partial=partial
+        ))
+        if rows:
+            return rows, rows[0][-1]
+        if page > 1:
+            # Page past the end — no row to carry the window count
+            row = await db.fetchrow(*build_count_query(keyword, min_price, max_price, deal, partial))
+            return rows, row[0]
+        return rows, 0
+
+    total = None
+    async with get_adb() as db:
+        if after is not None:
+            # Keyset page: the cursor pins the search mode of page one
+            rows = await db.fetch(*build_keyset_query(
+                keyword, min_price, max_price, limit, deal=deal, after=after, partial=partial
+            ))
+            more = len(rows) > limit
+            rows = rows[:limit]
+            if with_total:
+                row = await db.fetchrow(*build_count_query(keyword, min_price, max_price, deal, partial))
+                total = row[0]
+        else:
+            rows, total = await fetch_page(db, partial)
+            if keyword and total == 0:
+                # No whole-word match: retry as a substring ("civ" → Civic)
+                partial = True
+                rows, total = await fetch_page(db, partial)
+            more = (page - 1) * limit + len(rows) < total
+
+    # Rows ingested since the last scoring run have no stored rating
+    unscored = [i for i, r in enumerate(rows) if r[7] is None]
 
     cars = [
         {
@@ -295,88 +519,75 @@ def get_listings(
             "price": r[2],
             "mileage": r[3],
             "link": r[4],
+            "deal_rating": r[7],
+            "deal_color": r[8],
         }
         for r in rows
     ]
 
-    # --- Keyword filter (case-insensitive) ---
-    if keyword:
-        kw_lower = keyword.lower()
-        cars = [c for c in cars if kw_lower in c["title"].lower()]
-
-    # --- Price filter ---
-    if min_price > 0 or max_price > 0:
-        filtered = []
-        for car in cars:
-            try:
-                p = _parse_price(car["price"])
-                if min_price > 0 and p < min_price:
-                    continue
-                if max_price > 0 and p > max_price:
-                    continue
-                filtered.append(car)
-            except (ValueError, AttributeError):
-                # Skip cars with unparseable prices
-                pass
-        cars = filtered
-
-    total = len(cars)
-
-    # --- Pagination ---
-    offset = (page - 1) * limit
-    cars = cars[offset: offset + limit]
-
-    # --- ML deal rating ---
-    model = analyze_market(cars)
-    if model:
-        for car in cars:
-            try:
-                m_val = _parse_mileage(car["mileage"])
-                p_val = _parse_price(car["price"])
-                fair_price = model.predict(
-                    pd.DataFrame([[m_val]], columns=["m_val"])
-                )[0]
-                diff = fair_price - p_val
-                car["deal_rating"], car["deal_color"] = _deal_rating(diff)
-            except (ValueError, KeyError, TypeError) as exc:
-                log.warning(
-                    "Skipping deal analysis for '%s': %s",
-                    car.get("title", "unknown"),
-                    exc,
-                )
-                car.setdefault("deal_rating", "N/A")
-                car.setdefault("deal_color", "gray")
-    else:
-        # No model available — mark all as N/A
-        for car in cars:
-            car.setdefault("deal_rating", "N/A")
-            car.setdefault("deal_color", "gray")
+    # --- Fallback ML deal rating (one batched predict for unscored rows) ---
+    if unscored:
+        values = [(rows[i][5], rows[i][6], *rows[i][10:13]) for i in unscored]
+        ratings = await run_in_threadpool(_rate_unscored, values)
+        for i, (rating, color) in zip(unscored, ratings):
+            cars[i]["deal_rating"], cars[i]["deal_color"] = rating, color
+
+    next_cursor = None
+    if sort == "newest" and rows and more:
+        next_cursor = encode_cursor(rows[-1][9], rows[-1][0], partial)
+    search = ("partial" if partial else "fulltext") if keyword else None
 
     log.info(
-        "GET /cars — page=%d limit=%d keyword=%r total=%d returned=%d",
-        page, limit, keyword, total, len(cars),
+        "GET /cars — %s limit=%d keyword=%r search=%s total=%s returned=%d",
+        "cursor" if after else f"page={page}", limit, keyword, search, total, len(cars),
     )
 
-    return {"cars": cars, "total": total, "page": page, "limit": limit}
+    if after is not None:
+        response = {"cars": cars, "limit": limit, "next_cursor": next_cursor}
+        if total is not None:
+            response["total"] = total
+    else:
+        response = {"cars": cars, "total": total, "page": page, "limit": limit, "next_cursor": next_cursor}
+    if search:
+        response["search"] = search
+    return response, not unscored
+
+
+def _rate_unscored(values: list[tuple]) -> list[tuple[str, str]]:
+    """Rate listings with the current model; blocking, so run off the event loop."""
+    with get_db() as conn:
+        # Never fit on a request thread; serve the current model meanwhile
+        model = registry.get(conn, block=False)
+    return rate_listings(model, values)
 
 
 @app.get("/stats")
-def get_stats():
+async def get_stats(request: Request):
     """
     Market analytics — aggregate statistics across all listings.
 
     Returns total count, average price, median price, average mileage,
-    and price range (min/max).
+    and price range (min/max). Reads the single-row ``market_stats``
+    materialized view refreshed by each sync, so cost does not grow with
+    the table; falls back to a live aggregate if the view is missing.
+    Served from the response cache between syncs, with an ETag.
     """
-    conn = get_db()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT price, mileage FROM cars;")
-        rows = cur.fetchall()
-    finally:
-        conn.close()
+    async def build():
+        return await _market_stats(), True
+
+    return await _cached_json(request, ("stats",), build)
 
-    if not rows:
+
+async def _market_stats():
+    """Read the market aggregates (see ``get_stats``)."""
+    async with get_adb() as db:
+        try:
+            row = await db.fetchrow(f"SELECT {STATS_COLUMNS} FROM market_stats;")
+        except asyncpg.UndefinedTableError:
+            log.warning("market_stats view missing — run init_db; computing live")
+            row = await db.fetchrow(f"SELECT {STATS_COLUMNS} FROM ({MARKET_STATS_SQL}) AS live;")
+
+    if not row or not row[0]:
         return {
             "total_listings": 0,
             "avg_price": None,
@@ -385,39 +596,83 @@ def get_stats():
             "price_range": {"min": None, "max": None},
         }
 
-    prices: list[float] = []
-    mileages: list[float] = []
-
-    for price_raw, mileage_raw in rows:
-        try:
-            prices.append(_parse_price(str(price_raw)))
-        except (ValueError, AttributeError):
-            pass
-        try:
-            mileages.append(_parse_mileage(str(mileage_raw)))
-        except (ValueError, AttributeError):
-            pass
-
-    df_p = pd.Series(prices) if prices else pd.Series(dtype=float)
-    df_m = pd.Series(mileages) if mileages else pd.Series(dtype=float)
-
+    total, avg_price, median_price, avg_mileage, min_price, max_price = row
     stats = {
-        "total_listings": len(rows),
-        "avg_price": round(df_p.mean(), 2) if not df_p.empty else None,
-        "median_price": round(df_p.median(), 2) if not df_p.empty else None,
-        "avg_mileage": round(df_m.mean(), 2) if not df_m.empty else None,
+        "total_listings": total,
+        "avg_price": _as_float(avg_price),
+        "median_price": _as_float(median_price),
+        "avg_mileage": _as_float(avg_mileage),
         "price_range": {
-            "min": int(df_p.min()) if not df_p.empty else None,
-            "max": int(df_p.max()) if not df_p.empty else None,
+            "min": int(min_price) if min_price is not None else None,
+            "max": int(max_price) if max_price is not None else None,
         },
     }
 
-    log.info("GET /stats — %d listings, avg=$%.0f", len(rows), stats["avg_price"] or 0)
+    log.info("GET /stats — %d listings, avg=$%.0f", total, stats["avg_price"] or 0)
     return stats
 
 
+@app.get("/cars/{car_id}/price-history")
+def get_price_history(car_id: int):
+    """
+    Price series of one listing, oldest observation first.
+
+    A point is recorded when a listing is first ingested and whenever a
+    later sync sees a different price.
+    """
+    with get_db() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT title, link FROM cars WHERE id = %s;", (car_id,))
+        car = cur.fetchone()
+        if car is None:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        cur.execute(*build_price_history_query(car_id))
+        rows = cur.fetchall()
+
+    history = [
+        {"observed_at": observed_at.isoformat(), "price": _dollars(price_cents)}
+        for observed_at, price_cents in rows
+    ]
+    log.info("GET /cars/%d/price-history — %d points", car_id, len(history))
+    return {"id": car_id, "title": car[0], "link": car[1], "history": history}
+
+
+@app.get("/price-drops")
+def get_price_drops(
+    days: int = Query(default=7, ge=1, le=365),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """
+    Listings whose price went down in the last ``days`` days, biggest drop first.
+
+    Each entry compares a listing's latest price with the one observed
+    just before it.
+    """
+    with get_db() as conn:
+        cur = conn.cursor()
+        cur.execute(*build_price_drops_query(days, limit))
+        rows = cur.fetchall()
+
+    drops = [
+        {
+            "id": r[0],
+            "title": r[1],
+            "link": r[2],
+            "mileage_km": r[3],
+            "old_price": _dollars(r[4]),
+            "new_price": _dollars(r[5]),
+            "changed_at": r[6].isoformat(),
+            "drop": _dollars(r[7]),
+            "drop_pct": round(100 * r[7] / r[4], 1),
+        }
+        for r in rows
+    ]
+    log.info("GET /price-drops — days=%d returned=%d", days, len(drops))
+    return {"drops": drops, "days": days}
+
+
 @app.post("/alert", status_code=201)
-def create_alert(alert: Alert, request: Request):
+async def create_alert(alert: Alert, request: Request):
     """
     Create a price-drop alert. Rate limited to 5 per hour per IP.
 
@@ -432,25 +687,20 @@ def create_alert(alert: Alert, request: Request):
     )
     _check_rate_limit(client_ip)
 
-    conn = get_db()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO price_alerts (email, target_price, keyword) "
-            "VALUES (%s, %s, %s)",
-            (alert.email, alert.target_price, alert.keyword),
-        )
-        conn.commit()
-        log.info(
-            "Alert created — email=%s price=%d keyword=%s ip=%s",
-            alert.email, alert.target_price, alert.keyword, client_ip,
-        )
-    except psycopg2.Error as exc:
-        conn.rollback()
-        log.error("Failed to create alert: %s", exc)
-        raise HTTPException(status_code=500, detail="Failed to save alert.")
-    finally:
-        conn.close()
+    async with get_adb() as db:
+        try:
+            await db.execute(
+                "INSERT INTO price_alerts (email, target_price, keyword) "
+                "VALUES (%s, %s, %s)",
+                (alert.email, alert.target_price, alert.keyword),
+            )
+            log.info(
+                "Alert created — email=%s price=%d keyword=%s ip=%s",
+                alert.email, alert.target_price, alert.keyword, client_ip,
+            )
+        except asyncpg.PostgresError as exc:
+            log.error("Failed to create alert: %s", exc)
+            raise HTTPException(status_code=500, detail="Failed to save alert.")
 
     return {
         "status": "success",
@@ -0,0 +1,213 @@
+"""
+In-process response cache for the read-only API endpoints.
+
+Listings only change when ``load_data`` syncs (or a new model re-scores
+them), so ``/cars`` and ``/stats`` responses are cached per worker as
+rendered JSON, keyed by their normalized query parameters:
+
+- ``ResponseCache`` — an LRU bounded by entry count and total bytes,
+  with a TTL as a safety net. Every entry is dropped on invalidation.
+- ``SyncListener`` — a daemon thread that LISTENs on ``SYNC_CHANNEL``.
+  ``db.notify_data_change`` advances the data stamp and sends it in a
+  NOTIFY, in the same transaction as every data-version bump and
+  re-scoring, so the cache is cleared as soon as new data is committed.
+
+The cache only serves while the listener is connected: until it is (and
+whenever its connection drops) every request goes to the database, so a
+missed notification can never leave stale pages behind. The same holds
+for ``data_stamp``, which the API puts into its ETags: it is None
+whenever the listener cannot vouch for it. With ``max_entries=0`` no
+body is stored, but the listener still tracks the stamp, so ETags and
+304s keep working without the cache.
+"""
+
+from __future__ import annotations
+
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import psycopg2
+
+from .db import SYNC_CHANNEL, get_data_stamp
+from .logger import get_logger
+
+log = get_logger("cache")
+
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "512"))
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "300"))  # seconds
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses with TTL and size bounds."""
+
+    def __init__(
+        self,
+        max_entries: int = API_CACHE_MAX_ENTRIES,
+        max_bytes: int = API_CACHE_MAX_BYTES,
+        ttl: float = API_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._enabled = False
+        # Bumped on every invalidation, so a response computed before a
+        # sync committed is not stored after the cache was cleared
+        self._generation = 0
+        self.data_stamp: Optional[str] = None
+        self._hits = self._misses = self._evictions = 0
+        self._expired = self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Token to pass to ``put`` for a response computed from now on."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached body for ``key``, or None on a miss."""
+        with self._lock:
+            if not self._enabled or self.max_entries <= 0:
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            stored_at, body = entry
+            if self._clock() - stored_at > self.ttl:
+                self._drop(key)
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes, generation: int) -> None:
+        """Store ``body`` unless the cache was invalidated since ``generation``."""
+        if len(body) > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if not self._enabled or generation != self._generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self._clock(), body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, data_stamp: Optional[str] = None) -> None:
+        """Drop every entry (new data was committed)."""
+        with self._lock:
+            self._clear()
+            self._invalidations += 1
+            if data_stamp is not None:
+                self.data_stamp = data_stamp
+
+    def enable(self, data_stamp: Optional[str] = None) -> None:
+        """Start serving from an empty cache."""
+        with self._lock:
+            self._clear()
+            self._enabled = True
+            self.data_stamp = data_stamp
+
+    def disable(self) -> None:
+        """Stop serving and drop every entry; the data stamp is unknown until re-enabled."""
+        with self._lock:
+            self._clear()
+            self._enabled = False
+            self.data_stamp = None
+
+    def stats(self) -> dict:
+        """Counters for the /health endpoint."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self._enabled and self.max_entries > 0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "evictions": self._evictions,
+                "expired": self._expired,
+                "invalidations": self._invalidations,
+                "data_stamp": self.data_stamp,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+
+
+class SyncListener(threading.Thread):
+    """Invalidate a ResponseCache whenever a sync is committed."""
+
+    def __init__(
+        self,
+        dsn: str,
+        cache: ResponseCache,
+        retry_interval: float = 5.0,
+        poll_interval: float = 1.0,
+    ):
+        super().__init__(name="sync-listener", daemon=True)
+        self.dsn = dsn
+        self.cache = cache
+        self.retry_interval = retry_interval
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                conn = psycopg2.connect(self.dsn)
+            except psycopg2.Error as exc:
+                log.warning("Sync listener could not connect, caching and ETags off: %s", exc)
+                self._stop_event.wait(self.retry_interval)
+                continue
+            try:
+                self._listen(conn)
+            except (psycopg2.Error, OSError) as exc:
+                log.warning("Sync listener connection lost, caching and ETags off: %s", exc)
+            finally:
+                self.cache.disable()
+                conn.close()
+            self._stop_event.wait(self.retry_interval)
+
+    def _listen(self, conn) -> None:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {SYNC_CHANNEL};")
+        # Anything cached before this point may predate a missed sync
+        stamp = get_data_stamp(cur)
+        self.cache.enable(stamp)
+        log.info("Response cache enabled (data stamp %s) — listening on %s", stamp, SYNC_CHANNEL)
+        while not self._stop_event.is_set():
+            if not select.select([conn], [], [], self.poll_interval)[0]:
+                continue
+            conn.poll()
+            if conn.notifies:
+                stamp = conn.notifies[-1].payload
+                conn.notifies.clear()
+                self.cache.invalidate(stamp)
+                log.info("Response cache invalidated (data stamp %s)", stamp)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop listening and wait for the thread to exit."""
+        self._stop_event.set()
+        self.join(timeout)
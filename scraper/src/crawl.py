@@ -0,0 +1,263 @@
+"""
+Concurrent multi-page crawl of AutoTrader result pages.
+
+``run_scraper`` in ``main.py`` loads a single results page (about 15
+listings) and waits for a human to clear the captcha. Crawl mode instead
+walks the ``rcs`` offsets of the result set with a small pool of headless
+browsers:
+
+- Each worker thread owns one driver for the whole crawl; a driver that
+  errors is quit and replaced before the page is retried.
+- A shared ``RateLimiter`` spaces page loads across all workers, so adding
+  workers never raises the request rate above the politeness limit.
+- Listings from every page go through one ``DedupWriter``, the same
+  de-duplicating stream the single-page scraper writes to.
+
+With ``fetch="http"`` pages are pulled over a pooled HTTP session (see
+``fetch.py``) and a browser is only started for pages that come back as
+a bot challenge.
+
+The driver factory is injectable, which lets the tests crawl saved result
+pages from a local fixture server without launching Chrome.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .fetch import ChallengeDetected, HttpFetcher
+from .logger import get_logger
+from .state import DeltaWriter, page_digest
+from .main import (
+    OUTPUT_FILE,
+    PAGE_SIZE,
+    PAGE_TIMEOUT,
+    TARGET_URL,
+    DedupWriter,
+    extract_listings,
+    get_driver,
+    open_sink,
+    page_url,
+    wait_for_listings,
+)
+
+log = get_logger("crawl")
+
+# Minimum seconds between page loads across all workers
+MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "2"))
+PAGE_RETRIES = int(os.getenv("SCRAPER_PAGE_RETRIES", "2"))
+FETCH_MODES = ("browser", "http")
+
+
+class NoListingsRendered(Exception):
+    """A browser page showed no listing cards (challenge, error or empty page)."""
+
+
+class RateLimiter:
+    """Global politeness limit: at most one call per ``interval`` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        """Block until this caller's slot comes up."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Crawler:
+    """Fetch result pages in parallel, one browser per worker thread."""
+
+    def __init__(
+        self,
+        driver_factory=None,
+        workers=3,
+        retries=PAGE_RETRIES,
+        min_interval=MIN_INTERVAL,
+        backoff=2.0,
+        page_timeout=PAGE_TIMEOUT,
+        http=None,
+    ):
+        self.driver_factory = driver_factory or (lambda: get_driver(headless=True))
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.page_timeout = page_timeout
+        self.http = http
+        self.fallbacks = 0
+        self.limiter = RateLimiter(min_interval)
+        self._local = threading.local()
+        self._drivers = []
+        self._drivers_lock = threading.Lock()
+
+    # --- Drivers ------------------------------------------------------------
+
+    def _driver(self):
+        """Return this worker thread's driver, starting it on first use."""
+        driver = getattr(self._local, "driver", None)
+        if driver is None:
+            driver = self.driver_factory()
+            self._local.driver = driver
+            with self._drivers_lock:
+                self._drivers.append(driver)
+        return driver
+
+    def _reset_driver(self):
+        """Quit this thread's driver so the next attempt starts a fresh one."""
+        driver = getattr(self._local, "driver", None)
+        self._local.driver = None
+        if driver is None:
+            return
+        with self._drivers_lock:
+            self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Quit every browser started by the crawl."""
+        with self._drivers_lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                log.warning("Failed to quit browser: %s", e)
+
+    # --- Pages --------------------------------------------------------------
+
+    def fetch(self, url):
+        """
+        Load one results page and return its HTML.
+
+        Goes over HTTP when a fetcher is configured, falling back to this
+        worker's browser if a challenge page comes back.
+        """
+        self.limiter.wait()
+        if self.http is not None:
+            try:
+                return self.http.fetch(url)
+            except ChallengeDetected as e:
+                log.warning("%s — falling back to the browser", e)
+                with self._drivers_lock:
+                    self.fallbacks += 1
+                self.limiter.wait()
+        return self._browser_fetch(url)
+
+    def _browser_fetch(self, url):
+        driver = self._driver()
+        driver.get(url)
+        if self.page_timeout and not wait_for_listings(driver, self.page_timeout):
+            # Retried, then counted as failed: an empty parse must never
+            # read as "every listing on this page is gone"
+            raise NoListingsRendered(f"No listing cards rendered on {url}")
+        if self.http is not None:
+            # Let later pages reuse the cookies that cleared the challenge
+            self.http.adopt_cookies(driver)
+        return driver.page_source
+
+    def crawl_page(self, url, writer):
+        """
+        Fetch and parse one page, retrying with backoff on browser errors.
+
+        Returns ``(digest, listings)``; ``listings`` is None when ``writer``
+        reports the page unchanged since the last run, so it is not parsed.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                html = self.fetch(url)
+                digest = page_digest(html)
+                if writer.page_unchanged(url, digest):
+                    return digest, None
+                return digest, extract_listings(html)
+            except Exception as e:
+                self._reset_driver()
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                log.warning(
+                    "Page %s failed (attempt %d/%d): %s — retrying in %.1fs",
+                    url, attempt + 1, self.retries + 1, e, delay,
+                )
+                time.sleep(delay)
+
+    def run(self, urls, writer):
+        """
+        Crawl ``urls`` concurrently, writing listings through ``writer``.
+
+        Returns a summary dict: pages crawled, failed and skipped as
+        unchanged, listings parsed, how many of them were written, and
+        browser fallbacks after challenges.
+        """
+        stats = {"pages": 0, "failed": 0, "unchanged": 0, "listings": 0, "new": 0}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.crawl_page, url, writer): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    digest, listings = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    log.error("Giving up on %s: %s", url, e)
+                    continue
+                stats["pages"] += 1
+                if listings is None:
+                    stats["unchanged"] += 1
+                    continue
+                stats["listings"] += len(listings)
+                if not listings:
+                    log.warning("No listings parsed from %s", url)
+                stats["new"] += writer.write_page(url, digest, listings)
+        stats["fallbacks"] = self.fallbacks
+        return stats
+
+
+def run_crawl(
+    pages,
+    workers=3,
+    driver_factory=None,
+    output_file=OUTPUT_FILE,
+    fetch="browser",
+    base_url=TARGET_URL,
+    state=None,
+    **options,
+):
+    """
+    Crawl the first ``pages`` result pages into ``output_file``.
+
+    ``fetch`` is one of ``FETCH_MODES``. With a ``ScrapeState`` the output
+    is only the delta since the last run. Extra keyword arguments
+    (``retries``, ``min_interval``, ...) are passed to ``Crawler``.
+    """
+    if fetch not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode {fetch!r} — expected one of {FETCH_MODES}")
+    urls = [page_url(i * PAGE_SIZE, base_url=base_url) for i in range(pages)]
+    http = HttpFetcher(pool_size=workers) if fetch == "http" else None
+    crawler = Crawler(driver_factory, workers=workers, http=http, **options)
+    sink = open_sink(output_file)
+    try:
+        log.info("Crawling %d result pages with %d browsers", pages, workers)
+        writer = DeltaWriter(sink, state) if state is not None else DedupWriter(sink)
+        stats = crawler.run(urls, writer)
+        stats["removed"] = writer.finish()
+        log.info(
+            "Crawl complete — %d pages ok (%d unchanged), %d failed, %d listings "
+            "(%d new), %d browser fallbacks",
+            stats["pages"], stats["unchanged"], stats["failed"], stats["listings"],
+            stats["new"], stats["fallbacks"],
+        )
+        return stats
+    finally:
+        sink.close()
+        crawler.close()
+        if http is not None:
+            http.close()
+        log.info("Saved %d cars to %s", sink.count, output_file)
@@ -1,21 +1,65 @@
 """
 Database initialization and data loading for Car Scout.
 
-Creates tables (cars, price_alerts), performance indexes,
-and syncs scraped data from cars.json into PostgreSQL.
+Creates tables (cars, price_alerts, ...), performance indexes,
+and syncs scraped data (cars.ndjson or cars.json) into PostgreSQL.
+Each sync ends by matching price alerts against the listings it
+inserted or re-priced (see ``alerts.py``).
+
+Price and mileage are stored twice: the scraped display strings
+(``price``, ``mileage``) and typed integers (``price_cents``,
+``mileage_km``) normalized once at ingest, which the API filters,
+aggregates and trains on. Titles are likewise parsed once into
+``model_year``, ``make`` and ``model`` for the pricing model.
+
+Listings are identified by ``listing_key``: the listing URL when the
+scraper captured a real one, otherwise a hash of title + mileage, or of
+title + price when the mileage is unknown (the scraped link is often
+just "#" or a Google search fallback). Ingest
+COPYs each batch into a staging table and upserts on that key.
 """
 
+import argparse
+import io
 import json
 import os
+import time
 
 import psycopg2
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
 
+from .alerts import match_alerts
 from .logger import get_logger
+from .normalize import parse_mileage_km, parse_price_cents, parse_title
+from .queries import MARKET_STATS_SQL, TITLE_TSVECTOR
 
 load_dotenv()
 log = get_logger("db")
 
+# Listings per upsert batch (and per commit) during load_data
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+# NOTIFY channel announcing committed data changes (see cache.SyncListener)
+SYNC_CHANNEL = "car_scout_sync"
+
+# Stable identity of a listing, usable on both cars and the staging table.
+# Real listing URLs are kept as-is; "#" and Google-search fallback links
+# (whose ref hashes the price) fall back to title + mileage. Without a
+# mileage (often "N/A" on new vehicles) same-title listings are told
+# apart by price instead.
+_LISTING_KEY_SQL = r"""
+    CASE
+        WHEN link ~ '^https?://'
+             AND link !~ '^https?://(www\.)?google\.[a-z.]+/search'
+        THEN link
+        ELSE 'md5:' || md5(lower(btrim(title)) || '|' || coalesce(
+            mileage_km::text,
+            '$' || coalesce(price_cents::text, lower(btrim(price)), '')
+        ))
+    END
+"""
+
 
 def get_db():
     """Open a PostgreSQL connection using DATABASE_URL."""
@@ -38,8 +82,30 @@ def init_db():
             title TEXT NOT NULL,
             price TEXT NOT NULL,
             mileage TEXT NOT NULL,
-            link TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            link TEXT NOT NULL,
+            listing_key TEXT,
+            price_cents INTEGER,
+            mileage_km INTEGER,
+            model_year SMALLINT,
+            make TEXT,
+            model TEXT,
+            fair_price_cents INTEGER,
+            deal_rating TEXT,
+            deal_color TEXT,
+            scored_version BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP
+        );
+    """)
+
+    # One row per observed price: a listing's first price and every
+    # change after it (written by upsert_listings)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS car_price_history (
+            listing_id INTEGER NOT NULL REFERENCES cars (id) ON DELETE CASCADE,
+            observed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            price_cents INTEGER NOT NULL,
+            PRIMARY KEY (listing_id, observed_at)
         );
     """)
 
@@ -53,89 +119,749 @@ def init_db():
         );
     """)
 
+    # Outbox of alert hits, filled by alerts.match_alerts after each sync
+    # and drained by notification delivery (notified_at IS NULL = pending)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_matches (
+            id BIGSERIAL PRIMARY KEY,
+            alert_id INTEGER NOT NULL REFERENCES price_alerts (id) ON DELETE CASCADE,
+            car_id INTEGER NOT NULL REFERENCES cars (id) ON DELETE CASCADE,
+            price_cents INTEGER NOT NULL,
+            matched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            notified_at TIMESTAMP,
+            UNIQUE (alert_id, car_id, price_cents)
+        );
+    """)
+
+    # Single-row data version, bumped by every load_data sync. Caches
+    # (e.g. the fitted pricing model) key off it to know when to refresh.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0,
+            change_seq BIGINT NOT NULL DEFAULT 0,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute(
+        "INSERT INTO sync_version (id, version) VALUES (TRUE, 0) "
+        "ON CONFLICT (id) DO NOTHING;"
+    )
+
+    # --- Migrations ---
+    migrate_typed_columns(cur)
+    migrate_title_features(cur)
+    migrate_score_columns(cur)
+    migrate_listing_key(cur)
+    migrate_priced_listing_key(cur)
+    migrate_price_history(cur)
+    migrate_alert_query(cur)
+    migrate_change_seq(cur)
+
+    # --- Materialized aggregates (refreshed by load_data) ---
+    cur.execute(
+        f"CREATE MATERIALIZED VIEW IF NOT EXISTS market_stats AS {MARKET_STATS_SQL};"
+    )
+    # A unique index lets REFRESH ... CONCURRENTLY run without blocking /stats
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_market_stats_singleton "
+        "ON market_stats (singleton);"
+    )
+
     # --- Performance indexes ---
+    migrate_created_at_index(cur)
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_cars_created_at "
-        "ON cars (created_at DESC);"
+        "ON cars (created_at DESC, id DESC);"
     )
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_cars_title "
-        "ON cars USING gin(to_tsvector('english', title));"
+        f"ON cars USING gin({TITLE_TSVECTOR});"
+    )
+    create_trigram_index(cur)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cars_price_cents "
+        "ON cars (price_cents);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cars_mileage_km "
+        "ON cars (mileage_km);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cars_deal_rating "
+        "ON cars (deal_rating, created_at DESC);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cars_deal_margin "
+        "ON cars ((fair_price_cents - price_cents) DESC NULLS LAST, id DESC);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_price_history_observed_at "
+        "ON car_price_history (observed_at);"
     )
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_alerts_email "
         "ON price_alerts (email);"
     )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_alerts_query "
+        "ON price_alerts (query, target_price);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_alert_matches_pending "
+        "ON alert_matches (alert_id) WHERE notified_at IS NULL;"
+    )
 
     conn.commit()
     conn.close()
     log.info("Database tables and indexes initialized successfully")
 
 
-def load_data():
-    """Load scraped cars from cars.json into the database."""
-    conn = get_db()
-    cur = conn.cursor()
+def create_trigram_index(cur):
+    """
+    Index titles by trigram for substring keyword searches ("civ").
+
+    Needs the pg_trgm extension; where it cannot be installed the
+    substring fallback of /cars still works, it just scans.
+    """
+    cur.execute("SAVEPOINT trigram_index;")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cars_title_trgm "
+            "ON cars USING gin (title gin_trgm_ops);"
+        )
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT trigram_index;")
+        log.warning(
+            "pg_trgm unavailable, partial keyword searches will scan: %s",
+            str(e).strip().splitlines()[0],
+        )
+    cur.execute("RELEASE SAVEPOINT trigram_index;")
+
+
+def migrate_typed_columns(cur):
+    """
+    Add price_cents / mileage_km to older tables and backfill them.
+
+    The regexes mirror ``normalize.parse_price_cents`` and
+    ``normalize.parse_mileage_km``; values they reject stay NULL.
+    Only rows that have not been normalized yet are touched, so this is
+    cheap to run on every startup.
+    """
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS price_cents INTEGER;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS mileage_km INTEGER;")
+    cur.execute(r"""
+        UPDATE cars SET price_cents = round(
+            regexp_replace(price, '[^0-9.]', '', 'g')::numeric * 100
+        )::integer
+        WHERE price_cents IS NULL
+          AND price ~ '^\s*\$?\s*[0-9][0-9,]*(\.[0-9]{1,2})?\s*$';
+    """)
+    priced = cur.rowcount
+    cur.execute(r"""
+        UPDATE cars SET mileage_km = regexp_replace(mileage, '[^0-9]', '', 'g')::integer
+        WHERE mileage_km IS NULL
+          AND mileage ~* '^\s*[0-9][0-9,]*\s*(km)?\s*$';
+    """)
+    if priced or cur.rowcount:
+        log.info(
+            "Backfilled typed columns — %d prices, %d mileages",
+            priced,
+            cur.rowcount,
+        )
+
+
+def migrate_title_features(cur):
+    """
+    Add model_year / make / model to older tables and backfill them.
+
+    ``normalize.parse_title`` is not mirrored in SQL, so rows are parsed
+    here. Only rows with neither a year nor a make are read; titles that
+    yield nothing are re-read on each run, which stays cheap.
+    """
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS model_year SMALLINT;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS make TEXT;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS model TEXT;")
+    cur.execute("SELECT id, title FROM cars WHERE model_year IS NULL AND make IS NULL;")
+    parsed = [(car_id, *parse_title(title)) for car_id, title in cur.fetchall()]
+    parsed = [row for row in parsed if row[1] is not None or row[2] is not None]
+    if parsed:
+        execute_values(
+            cur,
+            "UPDATE cars AS c SET model_year = v.year, make = v.make, model = v.model "
+            "FROM (VALUES %s) AS v(id, year, make, model) WHERE c.id = v.id;",
+            parsed,
+            template="(%s, %s::smallint, %s, %s)",
+            page_size=1000,
+        )
+        log.info("Backfilled year/make/model for %d listings", len(parsed))
+
+
+def migrate_score_columns(cur):
+    """
+    Add the precomputed deal-rating columns to older tables.
+
+    They are filled by ``model.score_listings`` after the next sync;
+    until then /cars rates unscored rows on the fly.
+    """
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS fair_price_cents INTEGER;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS deal_rating TEXT;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS deal_color TEXT;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS scored_version BIGINT;")
+
+
+def migrate_listing_key(cur):
+    """
+    Move older tables from UNIQUE(link) to a backfilled, unique listing_key.
+
+    Rows that collapse onto the same key (e.g. all those with link "#")
+    keep it on the oldest row and get an ``#<id>`` suffix elsewhere, so
+    the unique index can be built without deleting anything.
+    """
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS listing_key TEXT;")
+    cur.execute("ALTER TABLE cars ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;")
+    cur.execute("ALTER TABLE cars DROP CONSTRAINT IF EXISTS cars_link_key;")
+    cur.execute(f"""
+        UPDATE cars AS c
+        SET listing_key = k.key || CASE WHEN k.rn > 1 THEN '#' || c.id ELSE '' END
+        FROM (
+            SELECT id, key, row_number() OVER (PARTITION BY key ORDER BY id) AS rn
+            FROM (
+                SELECT id, {_LISTING_KEY_SQL} AS key
+                FROM cars WHERE listing_key IS NULL
+            ) AS computed
+        ) AS k
+        WHERE c.id = k.id;
+    """)
+    if cur.rowcount:
+        log.info("Backfilled listing_key for %d listings", cur.rowcount)
+    cur.execute("ALTER TABLE cars ALTER COLUMN listing_key SET NOT NULL;")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_listing_key "
+        "ON cars (listing_key);"
+    )
+
+
+def migrate_priced_listing_key(cur):
+    """
+    Re-key fallback listings without a mileage on title + price.
+
+    Their keys used to hash the title alone, so same-title listings
+    (e.g. new vehicles listed with "N/A" km) shared one row. Rows that
+    still collide keep the key on the oldest row and an ``#<id>``
+    suffix elsewhere, as in ``migrate_listing_key``.
+    """
+    cur.execute(f"""
+        UPDATE cars AS c
+        SET listing_key = k.key || CASE WHEN k.rn > 1 THEN '#' || c.id ELSE '' END
+        FROM (
+            SELECT id, key, row_number() OVER (PARTITION BY key ORDER BY id) AS rn
+            FROM (
+                SELECT id, {_LISTING_KEY_SQL} AS key
+                FROM cars WHERE mileage_km IS NULL AND listing_key LIKE 'md5:%'
+            ) AS computed
+        ) AS k
+        WHERE c.id = k.id
+          AND c.listing_key <> k.key || CASE WHEN k.rn > 1 THEN '#' || c.id ELSE '' END;
+    """)
+    if cur.rowcount:
+        log.info("Re-keyed %d listings without mileage on title + price", cur.rowcount)
+
+
+def migrate_price_history(cur):
+    """Seed car_price_history with the current price of listings that have none."""
+    cur.execute("""
+        INSERT INTO car_price_history (listing_id, observed_at, price_cents)
+        SELECT c.id, coalesce(c.updated_at, c.created_at, CURRENT_TIMESTAMP), c.price_cents
+        FROM cars AS c
+        WHERE c.price_cents IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM car_price_history AS h WHERE h.listing_id = c.id
+          );
+    """)
+    if cur.rowcount:
+        log.info("Seeded price history for %d listings", cur.rowcount)
+
+
+def migrate_alert_query(cur):
+    """
+    Add the generated full-text ``query`` column to price_alerts.
+
+    Computed by PostgreSQL from ``keyword`` with the same text search
+    configuration as the ``idx_cars_title`` index, so the alert matcher
+    never re-parses keywords.
+    """
+    cur.execute("""
+        ALTER TABLE price_alerts ADD COLUMN IF NOT EXISTS query tsquery
+            GENERATED ALWAYS AS (plainto_tsquery('english', keyword)) STORED;
+    """)
+
+
+def migrate_change_seq(cur):
+    """Add the change counter behind data stamps (see ``notify_data_change``)."""
+    cur.execute(
+        "ALTER TABLE sync_version ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;"
+    )
+
+
+def migrate_created_at_index(cur):
+    """
+    Drop an older single-column idx_cars_created_at so it is rebuilt.
+
+    /cars orders and seeks its cursor pages on ``(created_at, id)``; an
+    index on created_at alone still needs a sort to break ties.
+    """
+    cur.execute("""
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND indexname = 'idx_cars_created_at';
+    """)
+    row = cur.fetchone()
+    if row and "id DESC" not in row[0]:
+        cur.execute("DROP INDEX idx_cars_created_at;")
+        log.info("Rebuilding idx_cars_created_at on (created_at, id)")
+
+
+def _copy_field(value):
+    """Encode one value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def upsert_listings(cur, cars):
+    """
+    Bulk insert-or-update one batch of validated listings.
+
+    The batch is COPYed into a temp staging table, de-duplicated on
+    listing_key (last occurrence wins), then merged with a single
+    ``INSERT ... ON CONFLICT (listing_key) DO UPDATE``. Only rows whose
+    scraped fields actually changed are updated; their stored deal rating
+    is cleared so /cars re-rates them until the next scoring run. The same
+    statement appends to car_price_history for new listings and for
+    listings whose price changed.
+
+    Returns ``(inserted, updated, unchanged)``, where ``unchanged`` also
+    counts in-batch duplicates.
+    """
+    if not cars:
+        return 0, 0, 0
+
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS cars_staging (
+            seq SERIAL,
+            title TEXT,
+            price TEXT,
+            mileage TEXT,
+            link TEXT,
+            price_cents INTEGER,
+            mileage_km INTEGER,
+            model_year SMALLINT,
+            make TEXT,
+            model TEXT
+        ) ON COMMIT DROP;
+    """)
+    cur.execute("TRUNCATE cars_staging;")
+
+    buf = io.StringIO()
+    for car in cars:
+        row = (
+            car["title"],
+            car["price"],
+            car["mileage"],
+            car["link"],
+            parse_price_cents(car["price"]),
+            parse_mileage_km(car["mileage"]),
+            *parse_title(car["title"]),
+        )
+        buf.write("\t".join(_copy_field(v) for v in row) + "\n")
+    buf.seek(0)
+    cur.copy_expert(
+        "COPY cars_staging "
+        "(title, price, mileage, link, price_cents, mileage_km, model_year, make, model) "
+        "FROM STDIN",
+        buf,
+    )
+
+    # "prior" reads the pre-upsert prices: every CTE sees the same snapshot
+    cur.execute(f"""
+        WITH staged AS (
+            SELECT DISTINCT ON (key)
+                key, title, price, mileage, link, price_cents, mileage_km,
+                model_year, make, model
+            FROM (SELECT s.*, {_LISTING_KEY_SQL} AS key FROM cars_staging AS s) AS s
+            ORDER BY key, seq DESC
+        ),
+        prior AS (
+            SELECT c.id, c.price_cents
+            FROM cars AS c JOIN staged ON c.listing_key = staged.key
+        ),
+        upserted AS (
+        INSERT INTO cars
+            (listing_key, title, price, mileage, link, price_cents, mileage_km,
+             model_year, make, model)
+        SELECT key, title, price, mileage, link, price_cents, mileage_km,
+               model_year, make, model
+        FROM staged
+        ON CONFLICT (listing_key) DO UPDATE SET
+            title = EXCLUDED.title,
+            price = EXCLUDED.price,
+            mileage = EXCLUDED.mileage,
+            link = EXCLUDED.link,
+            price_cents = EXCLUDED.price_cents,
+            mileage_km = EXCLUDED.mileage_km,
+            model_year = EXCLUDED.model_year,
+            make = EXCLUDED.make,
+            model = EXCLUDED.model,
+            fair_price_cents = NULL,
+            deal_rating = NULL,
+            deal_color = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (cars.title, cars.price, cars.mileage, cars.link)
+            IS DISTINCT FROM
+              (EXCLUDED.title, EXCLUDED.price, EXCLUDED.mileage, EXCLUDED.link)
+        RETURNING id, price_cents, (xmax = 0) AS inserted
+        ),
+        history AS (
+            INSERT INTO car_price_history (listing_id, price_cents)
+            SELECT u.id, u.price_cents
+            FROM upserted AS u LEFT JOIN prior AS p ON p.id = u.id
+            WHERE u.price_cents IS NOT NULL
+              AND p.price_cents IS DISTINCT FROM u.price_cents
+            ON CONFLICT (listing_id, observed_at) DO UPDATE
+                SET price_cents = EXCLUDED.price_cents
+        )
+        SELECT inserted FROM upserted;
+    """)
+    results = cur.fetchall()
+    inserted = sum(1 for (is_new,) in results if is_new)
+    updated = len(results) - inserted
+    return inserted, updated, len(cars) - inserted - updated
+
+
+def delete_listings(cur, keys):
+    """Delete listings by listing_key; returns how many rows went away."""
+    if not keys:
+        return 0
+    cur.execute("DELETE FROM cars WHERE listing_key = ANY(%s);", (list(keys),))
+    return cur.rowcount
+
+
+def refresh_market_stats(cur):
+    """Recompute the market_stats aggregates without blocking readers."""
+    cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY market_stats;")
+
+
+def get_data_version(cur):
+    """Return the current data version (0 if nothing was ever synced)."""
+    cur.execute("SELECT version FROM sync_version;")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(cur):
+    """Advance the data version; call inside the sync transaction."""
+    cur.execute(
+        "UPDATE sync_version SET version = version + 1, "
+        "synced_at = CURRENT_TIMESTAMP RETURNING version;"
+    )
+    row = cur.fetchone()
+    version = row[0] if row else 0
+    notify_data_change(cur)
+    return version
+
+
+def data_stamp(version, change_seq):
+    """Identify one committed state of the listings, e.g. "18.41"."""
+    return f"{version}.{change_seq}"
+
+
+def get_data_stamp(cur):
+    """Return the stamp of the last committed data change."""
+    cur.execute("SELECT version, change_seq FROM sync_version;")
+    row = cur.fetchone()
+    return data_stamp(*row) if row else data_stamp(0, 0)
 
-    # Try multiple possible paths for cars.json
-    possible_paths = [
-        os.path.join(os.path.dirname(__file__), "..", "cars.json"),  # scraper/cars.json
-        os.path.join(os.path.dirname(__file__), "..", "..", "cars.json"),  # root/cars.json
-        "cars.json",  # current directory
-    ]
 
-    cars_file = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            cars_file = path
-            break
+def notify_data_change(cur):
+    """
+    Advance the data stamp and announce it on SYNC_CHANNEL; returns it.
 
+    Every change to what /cars or /stats return goes through here: data
+    version bumps and every (re-)scoring, which can change ratings
+    within one data version. The stamp therefore identifies response
+    bodies, so the API builds its ETags from it.
+
+    The counter update and the notification both take effect when the
+    surrounding transaction commits, so listeners never see a stamp
+    before its data. The update locks the ``sync_version`` row until
+    then, so call it last in long transactions.
+    """
+    cur.execute(
+        "UPDATE sync_version SET change_seq = change_seq + 1 "
+        "RETURNING version, change_seq;"
+    )
+    row = cur.fetchone()
+    stamp = data_stamp(*row) if row else data_stamp(0, 0)
+    cur.execute("SELECT pg_notify(%s, %s);", (SYNC_CHANNEL, stamp))
+    return stamp
+
+
+def find_cars_file():
+    """Locate scraper output, preferring the streaming NDJSON format."""
+    here = os.path.dirname(__file__)
+    for name in ("cars.ndjson", "cars.json"):
+        for path in (
+            os.path.join(here, "..", name),  # scraper/
+            os.path.join(here, "..", "..", name),  # project root
+            name,  # current directory
+        ):
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def iter_ndjson(path, follow=False, poll_interval=1.0, idle_timeout=300.0):
+    """
+    Yield one parsed listing per line of an NDJSON file.
+
+    Lines that are not valid JSON yield None (counted as skipped by the
+    caller). With ``follow=True`` the file is tailed while the scraper is
+    still writing it: reading stops once ``<path>.done`` exists and the
+    file is drained, or after ``idle_timeout`` seconds without new data.
+    Following waits for the scraper's run to start (see
+    ``_wait_for_scraper_run``) and starts over if the file is truncated.
+    """
+    done_path = f"{path}.done"
+    if follow and not _wait_for_scraper_run(path, done_path, poll_interval, idle_timeout):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        partial = ""
+        finished = False
+        idle_since = time.monotonic()
+        while True:
+            line = f.readline()
+            if line:
+                partial += line
+                idle_since = time.monotonic()
+                if partial.endswith("\n"):
+                    yield _parse_ndjson_line(partial)
+                    partial = ""
+                continue
+            # At EOF: stop, or wait for the scraper to append more
+            if not follow or finished:
+                break
+            if time.monotonic() - idle_since > idle_timeout:
+                log.warning("No new data in %s for %.0fs — stopping", path, idle_timeout)
+                break
+            if os.fstat(f.fileno()).st_size < f.tell():
+                log.warning("%s was truncated by a new scraper run — reading it from the start", path)
+                f.seek(0)
+                partial = ""
+                continue
+            # One more drain pass after the done marker appears
+            finished = os.path.exists(done_path)
+            if not finished:
+                time.sleep(poll_interval)
+        if partial.strip():
+            yield _parse_ndjson_line(partial)
+
+
+def _wait_for_scraper_run(path, done_path, poll_interval, idle_timeout):
+    """
+    Wait until ``path`` holds a scraper run that is live or newer than us.
+
+    A ``.done`` marker older than the loader belongs to the previous run:
+    the scraper truncates the file and removes the marker when it opens
+    its output, so wait for that rather than load stale listings. Returns
+    False if no file shows up within ``idle_timeout``; a finished older
+    run is loaded then, with a warning.
+    """
+    started = time.time()
+    while True:
+        try:
+            stale = os.path.getmtime(done_path) < started
+        except OSError:
+            stale = False  # no marker: the scraper is still writing
+        exists = os.path.exists(path)
+        if exists and not stale:
+            return True
+        if time.time() - started > idle_timeout:
+            if exists:
+                log.warning("No new scraper run on %s within %.0fs — loading the last one", path, idle_timeout)
+                return True
+            log.warning("%s did not appear within %.0fs — nothing to load", path, idle_timeout)
+            return False
+        time.sleep(poll_interval)
+
+
+def _parse_ndjson_line(line):
+    """Parse one NDJSON record, returning None for blank or corrupt lines."""
+    if not line.strip():
+        return None
     try:
-        if not cars_file:
-            raise FileNotFoundError("cars.json not found in any expected location")
+        return json.loads(line)
+    except json.JSONDecodeError:
+        log.warning("Skipping malformed NDJSON line: %.80s", line.strip())
+        return None
+
+
+def iter_listings(path, follow=False):
+    """Yield listings from a .ndjson stream or a legacy .json array."""
+    if path.endswith(".ndjson"):
+        yield from iter_ndjson(path, follow=follow)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        cars = json.load(f)
+    if not isinstance(cars, list):
+        raise ValueError(f"{path} does not contain a list")
+    yield from cars
+
+
+def _is_valid_listing(car):
+    return isinstance(car, dict) and all(
+        k in car for k in ("title", "price", "mileage", "link")
+    )
 
-        with open(cars_file, "r", encoding="utf-8") as f:
-            cars = json.load(f)
 
-        if not isinstance(cars, list):
-            log.error("cars.json does not contain a list")
-            return
+def load_data(path=None, batch_size=INGEST_BATCH_SIZE, follow=False):
+    """
+    Load scraped cars into the database.
 
-        new_count = 0
-        skipped = 0
-        for car in cars:
-            # Validate required fields
-            if not all(k in car for k in ("title", "price", "mileage", "link")):
+    Listings are streamed from ``path`` (default: the first cars.ndjson /
+    cars.json found) and upserted in batches of ``batch_size``, each batch
+    committed on its own, so memory stays flat however large the scrape
+    is. With ``follow=True`` an NDJSON file is ingested while the scraper
+    is still appending to it.
+
+    Incremental scrapes (see ``state.py``) write only a delta: changed
+    listings upsert like any other, and ``{"listing_key": ..., "removed":
+    true}`` records delete the listing.
+
+    If the sync stops early after some batches committed, those changes
+    are still published: the data version is bumped, market_stats
+    refreshed and their alerts matched, so caches and ETags never outlive
+    rows that are already in the table.
+    """
+    cars_file = path or find_cars_file()
+    if not cars_file:
+        log.warning(
+            "cars.ndjson / cars.json not found in any expected location "
+            "— run the scraper first"
+        )
+        return
+
+    conn = get_db()
+    cur = conn.cursor()
+    totals = [0, 0, 0]  # inserted, updated, unchanged
+    skipped = removed = matched = 0
+    sync_started = None
+    committed = finished = False  # committed: a batch with changes is in the table
+
+    try:
+        # Price history written by this sync is stamped at or after this
+        cur.execute("SELECT LOCALTIMESTAMP;")
+        sync_started = cur.fetchone()[0]
+        batch, removals = [], []
+        for car in iter_listings(cars_file, follow=follow):
+            if isinstance(car, dict) and car.get("removed") and car.get("listing_key"):
+                removals.append(car["listing_key"])
+            elif _is_valid_listing(car):
+                batch.append(car)
+            else:
                 skipped += 1
                 continue
+            if len(batch) + len(removals) >= batch_size:
+                totals = [t + n for t, n in zip(totals, upsert_listings(cur, batch))]
+                removed += delete_listings(cur, removals)
+                conn.commit()
+                committed = committed or bool(totals[0] or totals[1] or removed)
+                batch, removals = [], []
+        totals = [t + n for t, n in zip(totals, upsert_listings(cur, batch))]
+        removed += delete_listings(cur, removals)
+        inserted, updated, unchanged = totals
 
-            cur.execute("SELECT id FROM cars WHERE link = %s", (car["link"],))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO cars (title, price, mileage, link) "
-                    "VALUES (%s, %s, %s, %s)",
-                    (car["title"], car["price"], car["mileage"], car["link"]),
-                )
-                new_count += 1
-
+        if inserted or updated or removed:
+            version = bump_data_version(cur)
+            refresh_market_stats(cur)
+        else:
+            version = get_data_version(cur)
+        if inserted or updated:
+            matched = match_alerts(cur, sync_started)
         conn.commit()
+        finished = True
         log.info(
-            "Database sync complete — added %d new listings, skipped %d invalid",
-            new_count,
+            "Database sync complete — inserted %d, updated %d, unchanged %d, "
+            "removed %d, skipped %d invalid, %d alert matches (data version %d)",
+            inserted,
+            updated,
+            unchanged,
+            removed,
             skipped,
+            matched,
+            version,
         )
 
-    except FileNotFoundError as e:
-        log.warning("%s — run the scraper first to generate cars.json", e)
-    except json.JSONDecodeError as e:
-        log.error("Failed to parse cars.json: %s", e)
+        # Fit the pricing model for this data version once, here, and
+        # write ratings onto every listing so /cars just selects them.
+        # Imported lazily to keep sklearn out of plain init_db() runs.
+        from .model import registry
+        registry.get(conn)
+
+    except (json.JSONDecodeError, ValueError) as e:
+        log.error("Failed to parse %s: %s", cars_file, e)
+    except OSError as e:
+        log.error("Could not read %s: %s", cars_file, e)
     except psycopg2.Error as e:
         conn.rollback()
         log.error("Database error during load: %s", e)
     finally:
+        if committed and not finished:
+            _publish_partial_sync(conn, sync_started)
         conn.close()
 
 
+def _publish_partial_sync(conn, sync_started):
+    """
+    Publish the batches an interrupted sync already committed.
+
+    The open batch is rolled back; the committed ones get the version
+    bump, market_stats refresh and alert matching the sync would have
+    done at the end.
+    """
+    try:
+        conn.rollback()
+        cur = conn.cursor()
+        version = bump_data_version(cur)
+        refresh_market_stats(cur)
+        matched = match_alerts(cur, sync_started)
+        conn.commit()
+        log.warning(
+            "Sync stopped early — published its committed batches as data version %d "
+            "(%d alert matches)",
+            version,
+            matched,
+        )
+    except psycopg2.Error as e:
+        log.error("Could not publish the partial sync: %s", e)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Initialize the database and load scraped cars.")
+    parser.add_argument("--file", help="cars.ndjson or cars.json to load (default: auto-detect)")
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="tail an NDJSON file while the scraper is still writing it",
+    )
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
     init_db()
-    load_data()
\ No newline at end of file
+    load_data(args.file, batch_size=args.batch_size, follow=args.follow)
@@ -0,0 +1,91 @@
+"""
+Browserless fetching of AutoTrader result pages.
+
+Result pages are server-rendered, so the listing cards are in the HTML a
+plain GET returns; Chrome is only needed to get past a bot challenge.
+``HttpFetcher`` pulls pages over one pooled ``requests.Session``
+(keep-alive connections, gzip, shared cookie jar) and raises
+``ChallengeDetected`` when it receives a challenge page instead, so the
+crawler can fall back to a browser for that page. Cookies the browser
+earns are copied back into the session, letting later pages go over
+plain HTTP again.
+"""
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .logger import get_logger
+
+log = get_logger("fetch")
+
+FETCH_TIMEOUT = float(os.getenv("SCRAPER_FETCH_TIMEOUT", "15"))
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Statuses and body markers of bot-protection interstitials (Imperva /
+# Incapsula fronts AutoTrader.ca; the rest cover common CDNs)
+_CHALLENGE_STATUSES = (403, 429, 503)
+_CHALLENGE_MARKERS = (
+    "_incapsula_resource",
+    "incapsula incident",
+    "pardon our interruption",
+    "cf-chl-",
+    "px-captcha",
+    "g-recaptcha",
+)
+
+
+class ChallengeDetected(Exception):
+    """Raised when a bot challenge is served instead of the requested page."""
+
+
+def is_challenge(status, html):
+    """Return True if a response looks like a bot challenge, not results."""
+    if status in _CHALLENGE_STATUSES:
+        return True
+    head = html[:20_000].lower()
+    return any(marker in head for marker in _CHALLENGE_MARKERS)
+
+
+class HttpFetcher:
+    """Fetch pages over a shared keep-alive session, detecting challenges."""
+
+    def __init__(self, pool_size=10, timeout=FETCH_TIMEOUT, session=None):
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-CA,en;q=0.9",
+            "Accept-Encoding": "gzip, deflate",
+        })
+
+    def fetch(self, url):
+        """GET ``url`` and return its HTML; raise ``ChallengeDetected`` if blocked."""
+        resp = self.session.get(url, timeout=self.timeout)
+        html = resp.text
+        if is_challenge(resp.status_code, html):
+            raise ChallengeDetected(f"Challenge page (HTTP {resp.status_code}) at {url}")
+        resp.raise_for_status()
+        return html
+
+    def adopt_cookies(self, driver):
+        """Copy cookies from a browser that passed a challenge into the session."""
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+    def close(self):
+        self.session.close()
@@ -3,21 +3,36 @@ AutoTrader Scraper for Sudbury Car Listings.
 
 Uses Selenium to navigate AutoTrader, parse car listing cards,
 and output structured JSON data.
+
+Output format follows the file extension of ``SCRAPER_OUTPUT``:
+``.json`` writes one array when the run ends; ``.ndjson`` appends each
+listing as soon as it is parsed and touches ``<file>.done`` when the run
+finishes, so ``load_data --follow`` can ingest while the crawl is running.
+
+By default a visible browser waits for a human to solve the captcha.
+``--unattended`` runs headless without prompting (cron, the compose
+``scraper`` profile), reusing one browser for every page of the run.
 """
 
+import argparse
 import hashlib
 import json
+import os
 import re
-import time
+import threading
 import urllib.parse
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
 from .logger import get_logger
+from .parsing import iter_cards, soup_card_fields
 
 log = get_logger("scraper")
 
@@ -26,12 +41,147 @@ TARGET_URL = (
     "?rcp=15&rcs=0&srt=39&prx=50&prv=Ontario&loc=Sudbury"
     "&hprc=True&wcp=True&inMarket=advancedSearch"
 )
-OUTPUT_FILE = "cars.json"
-
-
-def get_driver():
+OUTPUT_FILE = os.getenv("SCRAPER_OUTPUT", "cars.json")
+PAGE_SIZE = 15  # listings per results page (the ``rcp`` parameter)
+
+# Seconds to wait for listing cards to render on a page
+PAGE_TIMEOUT = float(os.getenv("SCRAPER_PAGE_TIMEOUT", "20"))
+_POLL_INTERVAL = 0.5
+CARD_SELECTOR = "div[class*='re-layout-inner'], div[class*='listing-details']"
+
+# Where the resolved chromedriver path is remembered between runs
+DRIVER_CACHE = os.getenv(
+    "CHROMEDRIVER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "car-scout", "chromedriver-path"),
+)
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+class JSONSink:
+    """Collect listings and write them as one JSON array on close."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._items = []
+
+    def write(self, item):
+        self._items.append(item)
+        self.count += 1
+
+    def close(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self._items, f, indent=2)
+
+
+class NDJSONSink:
+    """Append listings one per line as they are parsed (bounded memory)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done_path = f"{path}.done"
+        self.count = 0
+        # Truncate before dropping the old marker, so a following loader
+        # that sees no marker never reads the previous run's listings
+        self._file = open(path, "w", encoding="utf-8")
+        if os.path.exists(self.done_path):
+            os.remove(self.done_path)
+
+    def write(self, item):
+        self._file.write(json.dumps(item) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        # Tell a following ingest (load_data --follow) the stream is complete
+        with open(self.done_path, "w", encoding="utf-8"):
+            pass
+
+
+def open_sink(path):
+    """Pick the output writer from the file extension."""
+    if path.endswith(".ndjson"):
+        return NDJSONSink(path)
+    return JSONSink(path)
+
+
+class DedupWriter:
+    """Thread-safe front for a sink that drops repeat listings."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def write(self, item):
+        """Write ``item`` unless an identical title/price was seen; return True if new."""
+        sig = f"{item['title']}-{item['price']}"
+        with self._lock:
+            if sig in self._seen:
+                return False
+            self._seen.add(sig)
+            self.sink.write(item)
+        log.info("Found: %s | %s", item["title"], item["price"])
+        return True
+
+    def page_unchanged(self, url, digest):
+        """Full runs re-parse every page (see ``state.DeltaWriter``)."""
+        return False
+
+    def write_page(self, url, digest, listings):
+        """Write one page's listings; return how many were new."""
+        return sum(self.write(item) for item in listings)
+
+    def finish(self):
+        """Nothing to flush for full runs."""
+        return 0
+
+
+def driver_path(refresh=False):
+    """
+    Return the chromedriver binary path, resolving it at most once.
+
+    ``CHROMEDRIVER_PATH`` wins if set. Otherwise the path found by
+    webdriver-manager is kept in memory and in ``DRIVER_CACHE``, so later
+    browsers and later runs skip the version lookup. ``refresh=True``
+    forces a new lookup (e.g. after a Chrome update).
+    """
+    global _driver_path
+    explicit = os.getenv("CHROMEDRIVER_PATH")
+    if explicit:
+        return explicit
+
+    with _driver_path_lock:
+        if _driver_path and not refresh:
+            return _driver_path
+        if not refresh:
+            try:
+                with open(DRIVER_CACHE, encoding="utf-8") as f:
+                    cached = f.read().strip()
+                if cached and os.path.exists(cached):
+                    _driver_path = cached
+                    return cached
+            except OSError:
+                pass
+
+        _driver_path = ChromeDriverManager().install()
+        try:
+            os.makedirs(os.path.dirname(DRIVER_CACHE), exist_ok=True)
+            with open(DRIVER_CACHE, "w", encoding="utf-8") as f:
+                f.write(_driver_path)
+        except OSError as e:
+            log.warning("Could not cache chromedriver path in %s: %s", DRIVER_CACHE, e)
+        return _driver_path
+
+
+def get_driver(headless=False):
     """Setup Chrome with anti-detection options."""
     options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
     options.add_argument("--start-maximized")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument(
@@ -39,18 +189,68 @@ def get_driver():
         "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     )
     options.add_argument("--mute-audio")
-    return webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), options=options
-    )
+    try:
+        return webdriver.Chrome(service=Service(driver_path()), options=options)
+    except SessionNotCreatedException:
+        # A cached driver no longer matches the installed Chrome
+        log.warning("Cached chromedriver rejected — resolving a new one")
+        return webdriver.Chrome(
+            service=Service(driver_path(refresh=True)), options=options
+        )
+
+
+class _CardsSettled:
+    """Wait condition: listing cards present and their count unchanged since the last poll."""
+
+    def __init__(self):
+        self.last = -1
+
+    def __call__(self, driver):
+        count = len(driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR))
+        settled = count > 0 and count == self.last
+        self.last = count
+        return settled
+
+
+def wait_for_listings(driver, timeout=None):
+    """
+    Wait until listing cards have rendered and finished lazy-loading.
+
+    Scrolls once cards appear, then returns as soon as the card count
+    stops changing instead of sleeping a fixed time. Returns False if no
+    card shows up within ``timeout`` (default ``PAGE_TIMEOUT``), e.g. on
+    a challenge or empty page.
+    """
+    timeout = timeout or PAGE_TIMEOUT
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=_POLL_INTERVAL).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, CARD_SELECTOR))
+        )
+    except TimeoutException:
+        return False
+
+    driver.execute_script("window.scrollTo(0, 2500);")
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=_POLL_INTERVAL).until(
+            _CardsSettled()
+        )
+    except TimeoutException:
+        log.warning("Listings still loading after %.0fs — parsing what is there", timeout)
+    return True
+
+
+_PRICE_RE = re.compile(r"\$[0-9,]+")
+_MILEAGE_RE = re.compile(r"(\d{1,3}(?:,\d{3})*|\d+)\s*km", re.IGNORECASE)
+_YEAR_MAKE_RE = re.compile(r"(19|20)\d{2}\s+[A-Za-z]{3,}")
 
 
 def clean_data(text, field="price"):
     """Extract clean numbers from text."""
     if field == "price":
-        match = re.search(r"\$[0-9,]+", text)
+        match = _PRICE_RE.search(text)
         return match.group(0) if match else "N/A"
 
-    matches = re.findall(r"(\d{1,3}(?:,\d{3})*|\d+)\s*km", text, re.IGNORECASE)
+    matches = _MILEAGE_RE.findall(text)
     if not matches:
         return "N/A"
     try:
@@ -60,25 +260,20 @@ def clean_data(text, field="price"):
         return "N/A"
 
 
-def parse_card(soup):
-    """Parse a single car listing card from BeautifulSoup element."""
-    text = soup.get_text(separator=" ", strip=True)
+def build_listing(text, title=None):
+    """Build a listing from a card's visible text and title (if found)."""
     data = {}
 
     # 1. Basic Info
     data["price"] = clean_data(text, "price")
     data["mileage"] = clean_data(text, "mileage")
 
-    # 2. Find Title
-    title_tag = soup.find(
-        ["h2", "span"],
-        class_=lambda x: x and ("title" in x.lower() or "make-model" in x.lower()),
-    )
-    data["title"] = title_tag.get_text(strip=True) if title_tag else "N/A"
+    # 2. Title
+    data["title"] = title if title is not None else "N/A"
 
     # Fallback if title is missing
     if data["title"] == "N/A":
-        match = re.search(r"(19|20)\d{2}\s+[A-Za-z]{3,}", text)
+        match = _YEAR_MAKE_RE.search(text)
         if match:
             data["title"] = match.group(0)
 
@@ -94,69 +289,137 @@ def parse_card(soup):
     return data
 
 
-def run_scraper():
-    """Run the full AutoTrader scraping pipeline."""
-    driver = get_driver()
-    try:
-        log.info("Launching browser — navigating to AutoTrader")
-        driver.get(TARGET_URL)
-
-        print("\n" + "=" * 40)
-        print(" ACTION REQUIRED: Solve Captcha")
-        print(" Press ENTER in this terminal when list loads.")
-        print("=" * 40 + "\n")
-        input("Press Enter to continue...")
-
-        log.info("Scrolling page to load more listings")
-        driver.execute_script("window.scrollTo(0, 2500);")
-        time.sleep(3)
-
-        log.info("Parsing page source for car listings")
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        seeds = soup.find_all(
-            "div",
-            class_=lambda x: x
-            and ("re-layout-inner" in x or "listing-details" in x),
-        )
+def parse_card(soup):
+    """Parse a single car listing card from BeautifulSoup element."""
+    return build_listing(*soup_card_fields(soup))
 
-        results = []
-        seen = set()
-
-        for seed in seeds:
-            # Climb up HTML tree to find the full card
-            context = seed
-            found_dollar = False
-            for _ in range(4):
-                if "$" in context.get_text():
-                    found_dollar = True
-                    break
-                if context.parent:
-                    context = context.parent
-
-            if not found_dollar:
-                continue
 
-            item = parse_card(context)
+def page_url(offset, per_page=PAGE_SIZE, base_url=TARGET_URL):
+    """Return the results-page URL starting at listing ``offset``."""
+    parts = urllib.parse.urlsplit(base_url)
+    query = dict(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))
+    query.update(rcp=str(per_page), rcs=str(offset))
+    return urllib.parse.urlunsplit(
+        parts._replace(query=urllib.parse.urlencode(query))
+    )
 
-            # Save valid cars
-            if item["title"] != "N/A" and item["price"] != "N/A":
-                sig = f"{item['title']}-{item['price']}"
-                if sig not in seen:
-                    results.append(item)
-                    seen.add(sig)
-                    log.info("Found: %s | %s", item["title"], item["price"])
 
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+def extract_listings(html, parser=None):
+    """
+    Parse every valid listing card out of a results page.
+
+    ``parser`` picks the HTML backend (see ``parsing.PARSERS``); defaults
+    to ``SCRAPER_PARSER``.
+    """
+    listings = []
+    for text, title in iter_cards(html, parser):
+        item = build_listing(text, title)
+        # Keep valid cars
+        if item["title"] != "N/A" and item["price"] != "N/A":
+            listings.append(item)
+    return listings
+
+
+def run_scraper(pages=1, unattended=False, state=None):
+    """
+    Run the AutoTrader scraping pipeline over ``pages`` result pages.
+
+    One browser loads every page in turn. Interactive runs show the
+    browser and wait for the captcha to be solved on the first page;
+    unattended runs are headless and never prompt. With a
+    ``state.ScrapeState`` only the delta since the last run is written.
+    """
+    # Imported lazily: state.py builds on DedupWriter from this module
+    from .state import DeltaWriter, page_digest
+
+    # Output first: a loader following it must not wait on the browser
+    # launch while the previous run's file and .done marker are in place
+    sink = open_sink(OUTPUT_FILE)
+    writer = DeltaWriter(sink, state) if state is not None else DedupWriter(sink)
+    driver = None
+    try:
+        driver = get_driver(headless=unattended)
+        log.info("Launching browser — navigating to AutoTrader")
+        for page in range(pages):
+            url = page_url(page * PAGE_SIZE)
+            driver.get(url)
+
+            if page == 0 and not unattended:
+                print("\n" + "=" * 40)
+                print(" ACTION REQUIRED: Solve Captcha")
+                print(" Press ENTER in this terminal when list loads.")
+                print("=" * 40 + "\n")
+                input("Press Enter to continue...")
+
+            log.info("Waiting for listings on page %d", page + 1)
+            if not wait_for_listings(driver):
+                log.warning("No listings on %s within %.0fs — stopping", url, PAGE_TIMEOUT)
+                break
+
+            html = driver.page_source
+            digest = page_digest(html)
+            if writer.page_unchanged(url, digest):
+                log.info("Page %d unchanged since last run — skipping", page + 1)
+                continue
+            log.info("Parsing page source for car listings")
+            writer.write_page(url, digest, extract_listings(html))
 
-        log.info("Scrape complete — saved %d cars to %s", len(results), OUTPUT_FILE)
+        writer.finish()
+        log.info("Scrape complete — found %d cars", sink.count)
 
     except Exception as e:
         log.error("Scraper failed: %s", e, exc_info=True)
     finally:
-        driver.quit()
-        log.info("Browser closed")
+        sink.close()
+        log.info("Saved %d cars to %s", sink.count, OUTPUT_FILE)
+        if driver is not None:
+            driver.quit()
+            log.info("Browser closed")
 
 
 if __name__ == "__main__":
-    run_scraper()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Sudbury car listings from AutoTrader.")
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=int(os.getenv("SCRAPER_PAGES", "1")),
+        help="number of result pages to scrape",
+    )
+    parser.add_argument(
+        "--unattended",
+        action="store_true",
+        default=os.getenv("SCRAPER_UNATTENDED", "") == "1",
+        help="run headless without the captcha prompt (for scheduled runs)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("SCRAPER_WORKERS", "1")),
+        help="crawl with this many headless browsers in parallel",
+    )
+    parser.add_argument(
+        "--fetch",
+        choices=("browser", "http"),
+        default=os.getenv("SCRAPER_FETCH", "browser"),
+        help="crawl mode page fetcher: headless browsers, or plain HTTP with "
+        "a browser only for challenge pages",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=os.getenv("SCRAPER_INCREMENTAL", "") == "1",
+        help="write only new, changed and removed listings since the last "
+        "run (state kept in SCRAPER_STATE)",
+    )
+    args = parser.parse_args()
+
+    state = None
+    if args.incremental:
+        from .state import ScrapeState
+        state = ScrapeState.load()
+
+    if args.workers > 1 or args.fetch == "http":
+        from .crawl import run_crawl
+        run_crawl(args.pages, workers=args.workers, fetch=args.fetch, state=state)
+    else:
+        run_scraper(args.pages, unattended=args.unattended, state=state)
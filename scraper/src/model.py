@@ -0,0 +1,511 @@
+"""
+Pricing model registry for Car Scout deal ratings.
+
+The model is a compact gradient-boosted regressor over mileage, model
+year, make and model (parsed from titles at ingest, see
+``normalize.parse_title``). It is fitted once per data version (see
+``sync_version`` in ``db.py``) on the full market, not per request on the
+current page.
+The registry keeps the fitted model in memory and, when ``MODEL_PATH`` is
+set, persists it with joblib so every API worker can load it at startup
+instead of training its own copy.
+
+Whenever a model is trained, ``score_listings`` writes fair price and
+deal rating onto every row of ``cars``, so request handlers normally just
+select them; inference on the request path only covers rows ingested
+since the last scoring run.
+
+``load_data`` trains inline (it is a batch job). API workers call
+``get(conn, block=False)``: a stale model is retrained in a background
+process (``ProcessPoolExecutor``, one job at a time), so the fit never
+holds a worker's GIL, and the current model keeps serving until the new
+one is swapped in.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+from sklearn.ensemble import HistGradientBoostingRegressor
+from threadpoolctl import threadpool_limits
+
+from .db import get_data_version, notify_data_change
+from .logger import get_logger
+
+log = get_logger("model")
+
+MIN_SAMPLES = 5
+
+# Cores used to fit the model (-1 = all)
+MODEL_N_JOBS = int(os.getenv("MODEL_N_JOBS", "1"))
+
+# Bumped when the features change; persisted models of another schema are retrained
+MODEL_SCHEMA = 2
+
+# Advisory lock key serializing fits across API workers and syncs
+TRAIN_LOCK_KEY = 0x63617273  # "cars"
+
+# (mileage_km, model_year, make, model) — make and model are categorical
+FEATURES = ("mileage_km", "model_year", "make", "model")
+
+# Categories per feature the estimator can bin (max_bins=255, one kept for
+# missing); rarer makes and models are treated as unknown
+_MAX_CATEGORIES = 254
+
+# Deal thresholds on diff = predicted − actual price (dollars)
+_GREAT_DEAL_DIFF = 3000
+_GOOD_DEAL_DIFF = 500
+_OVERPRICED_DIFF = -3000
+
+
+@dataclass
+class PricingModel:
+    """A fitted price model stamped with its data version."""
+
+    estimator: HistGradientBoostingRegressor
+    data_version: int
+    n_samples: int
+    trained_at: float
+    train_seconds: float = 0.0
+    # Category codes seen in training: {"make": {...}, "model": {...}}
+    vocab: dict = field(default_factory=dict)
+    schema: int = 0
+
+    def fair_price(
+        self,
+        mileage_km: int,
+        model_year: Optional[int] = None,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> float:
+        """Predict the fair price in dollars for one listing."""
+        return self.fair_prices([(mileage_km, model_year, make, model)])[0]
+
+    def fair_prices(self, features: Sequence[tuple]) -> np.ndarray:
+        """Predict fair prices in dollars for many ``FEATURES`` rows in one call."""
+        return self.estimator.predict(encode_features(features, self.vocab))
+
+
+def _category_keys(row: tuple) -> tuple[Optional[str], Optional[str]]:
+    """Lowercased make and "make model" keys of one ``FEATURES`` row."""
+    make, model = row[2], row[3]
+    if not make:
+        return None, None
+    make = make.lower()
+    return make, f"{make} {model.lower()}" if model else None
+
+
+def encode_features(features: Sequence[tuple], vocab: dict) -> np.ndarray:
+    """
+    Turn ``FEATURES`` rows into the estimator's float matrix.
+
+    Missing years and unseen makes/models become NaN, which the
+    estimator routes like missing values. Plain dict lookups keep this
+    cheap for page-sized batches.
+    """
+    makes, models = vocab["make"], vocab["model"]
+    encoded = []
+    for row in features:
+        make, model = _category_keys(row)
+        encoded.append((row[0], row[1], makes.get(make), models.get(model)))
+    # None → NaN
+    return np.array(encoded, dtype=float).reshape(-1, len(FEATURES))
+
+
+def build_vocab(features: Sequence[tuple]) -> dict:
+    """Code the most frequent makes and models seen in training."""
+    keys = [_category_keys(row) for row in features]
+    vocab = {}
+    for name, column in (("make", 0), ("model", 1)):
+        counts = Counter(k[column] for k in keys if k[column] is not None)
+        vocab[name] = {key: code for code, (key, _) in enumerate(counts.most_common(_MAX_CATEGORIES))}
+    return vocab
+
+
+def deal_rating(diff: float) -> tuple[str, str]:
+    """Classify the deal based on predicted-vs-actual price difference."""
+    if diff > _GREAT_DEAL_DIFF:
+        return "GREAT DEAL", "green"
+    if diff > _GOOD_DEAL_DIFF:
+        return "GOOD DEAL", "teal"
+    if diff < _OVERPRICED_DIFF:
+        return "OVERPRICED", "red"
+    return "FAIR PRICE", "gray"
+
+
+def deal_ratings(diffs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized ``deal_rating`` over an array of price differences."""
+    diffs = np.asarray(diffs, dtype=float)
+    conditions = [
+        diffs > _GREAT_DEAL_DIFF,
+        diffs > _GOOD_DEAL_DIFF,
+        diffs < _OVERPRICED_DIFF,
+    ]
+    ratings = np.select(
+        conditions, ["GREAT DEAL", "GOOD DEAL", "OVERPRICED"], "FAIR PRICE"
+    )
+    colors = np.select(conditions, ["green", "teal", "red"], "gray")
+    return ratings, colors
+
+
+def rate_listings(
+    model: Optional[PricingModel],
+    values: list[tuple],
+) -> list[tuple[str, str]]:
+    """
+    Rate a page of listings with a single batched predict.
+
+    ``values`` holds (price_cents, mileage_km, model_year, make, model)
+    per listing. Listings missing a price or mileage — or every listing,
+    if there is no model — get ("N/A", "gray"); year, make and model may
+    be None.
+    """
+    result = [("N/A", "gray")] * len(values)
+    if model is None:
+        return result
+
+    idx = [i for i, v in enumerate(values) if v[0] is not None and v[1] is not None]
+    if not idx:
+        return result
+
+    prices = np.array([values[i][0] for i in idx], dtype=float) / 100
+    fair = model.fair_prices([values[i][1:] for i in idx])
+    ratings, colors = deal_ratings(fair - prices)
+    for i, rating, color in zip(idx, ratings.tolist(), colors.tolist()):
+        result[i] = (rating, color)
+    return result
+
+
+def fit_pricing_model(
+    values: list[tuple], data_version: int, n_jobs: int = MODEL_N_JOBS
+) -> Optional[PricingModel]:
+    """
+    Train a gradient-boosted model on (price_cents, *FEATURES) rows.
+
+    Returns None if data is insufficient (< 5 rows or < 2 unique values).
+    The model predicts price in dollars from mileage, model year, make
+    and model; rows may lack the last three.
+    """
+    df = pd.DataFrame(values, columns=["price_cents", *FEATURES])
+    if len(df) < MIN_SAMPLES:
+        return None
+
+    df["p_val"] = df["price_cents"] / 100
+
+    # Guard against degenerate data (model can't learn from constant values)
+    if df["mileage_km"].nunique() < 2 or df["p_val"].nunique() < 2:
+        log.info("Skipping ML model — insufficient unique values in data")
+        return None
+
+    start = time.perf_counter()
+    features = [row[1:] for row in values]
+    vocab = build_vocab(features)
+    # Small markets still get splits; big ones keep leaves statistically sound.
+    # max_iter bounds predict cost (early stopping ends >10k-row fits sooner).
+    estimator = HistGradientBoostingRegressor(
+        max_iter=100,
+        min_samples_leaf=max(1, min(20, len(df) // 10)),
+        categorical_features=[False, False, True, True],
+        random_state=42,
+    )
+    # Fit on plain arrays so batched predicts skip feature-name validation
+    with threadpool_limits(None if n_jobs == -1 else n_jobs):
+        estimator.fit(encode_features(features, vocab), df["p_val"].to_numpy())
+    return PricingModel(
+        estimator, data_version, len(df), time.time(), time.perf_counter() - start,
+        vocab, MODEL_SCHEMA,
+    )
+
+
+def fetch_training_data(cur) -> list[tuple]:
+    """Load every listing with a typed price and mileage, plus its title features."""
+    cur.execute(
+        "SELECT price_cents, mileage_km, model_year, make, model FROM cars "
+        "WHERE price_cents IS NOT NULL AND mileage_km IS NOT NULL;"
+    )
+    return cur.fetchall()
+
+
+def score_listings(conn, model: Optional[PricingModel], version: int) -> int:
+    """
+    Write fair_price_cents / deal_rating / deal_color onto every listing.
+
+    Rows are stamped with ``scored_version`` so it is clear which model
+    produced them. Listings missing typed values — or all listings, when
+    there is not enough data for a model — are marked N/A. Commits and
+    returns the number of listings rated by the model.
+    """
+    cur = conn.cursor()
+    scored = 0
+    if model is not None:
+        cur.execute(
+            "SELECT id, price_cents, mileage_km, model_year, make, model FROM cars "
+            "WHERE price_cents IS NOT NULL AND mileage_km IS NOT NULL;"
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = np.array([r[0] for r in rows])
+            prices = np.array([r[1] for r in rows], dtype=float)
+            fair = model.fair_prices([r[2:] for r in rows])
+            ratings, colors = deal_ratings(fair - prices / 100)
+            execute_values(
+                cur,
+                "UPDATE cars AS c SET fair_price_cents = v.fair, "
+                "deal_rating = v.rating, deal_color = v.color, "
+                "scored_version = v.version "
+                "FROM (VALUES %s) AS v(id, fair, rating, color, version) "
+                "WHERE c.id = v.id;",
+                zip(
+                    ids.tolist(),
+                    np.rint(fair * 100).astype(int).tolist(),
+                    ratings.tolist(),
+                    colors.tolist(),
+                    [version] * len(rows),
+                ),
+                page_size=1000,
+            )
+            scored = len(rows)
+        unrated = "price_cents IS NULL OR mileage_km IS NULL"
+    else:
+        unrated = "TRUE"
+
+    cur.execute(
+        "UPDATE cars SET fair_price_cents = NULL, deal_rating = 'N/A', "
+        f"deal_color = 'gray', scored_version = %s WHERE {unrated};",
+        (version,),
+    )
+    # Ratings are part of /cars responses: advance the stamp behind their
+    # ETags. Last, so the sync_version row lock is held only briefly.
+    notify_data_change(cur)
+    conn.commit()
+    log.info("Scored %d listings with pricing model (version %d)", scored, version)
+    return scored
+
+
+def _listings_scored(cur, version: int) -> bool:
+    """Whether every listing already carries ratings for ``version``."""
+    cur.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM cars WHERE scored_version IS DISTINCT FROM %s);",
+        (version,),
+    )
+    return cur.fetchone()[0]
+
+
+def _train_job(version: int, path: Optional[str]) -> Optional[PricingModel]:
+    """Train, persist and score in a background process on its own connection."""
+    from .db import get_db
+
+    conn = get_db()
+    try:
+        return ModelRegistry(path)._train(conn, version)
+    finally:
+        conn.close()
+
+
+class ModelRegistry:
+    """In-memory (and optionally on-disk) cache of the current model."""
+
+    def __init__(self, path: Optional[str] = None, executor: Optional[Executor] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model: Optional[PricingModel] = None
+        # Data version the cached state (model or "not enough data") is for
+        self._version: Optional[int] = None
+        self._executor = executor
+        # Data version being trained in the background, if any
+        self._pending: Optional[int] = None
+        self._failures = 0
+
+    @property
+    def model(self) -> Optional[PricingModel]:
+        """The cached model, without checking for newer data."""
+        return self._model
+
+    def get(self, conn, block: bool = True) -> Optional[PricingModel]:
+        """
+        Return the model for the database's current data version.
+
+        Loads it from disk or trains it on the full market if the cached
+        one is stale; a fresh model is also used to re-score every listing.
+        With ``block=False`` training is handed to a background process and
+        the current model is returned until the new one is swapped in.
+        Returns the last known model if the version lookup fails, and None
+        if there is not enough data to train.
+        """
+        try:
+            cur = conn.cursor()
+            version = get_data_version(cur)
+        except psycopg2.Error as exc:
+            log.warning("Could not read data version, serving cached model: %s", exc)
+            conn.rollback()
+            return self._model
+
+        if not self._needs(version, block):
+            return self._model
+
+        with self._lock:
+            if self._needs(version, block):
+                model = self.load()
+                if model is not None and model.data_version == version:
+                    self._model, self._version = model, version
+                elif block:
+                    self._model, self._version = self._train(conn, version), version
+                else:
+                    self._submit(version)
+        return self._model
+
+    def _needs(self, version: int, block: bool) -> bool:
+        """Whether ``version`` still has to be loaded or trained by this caller."""
+        return version != self._version and (block or version != self._pending)
+
+    def _submit(self, version: int) -> None:
+        """Start background training for ``version``; called with the lock held."""
+        if self._pending is not None:
+            # One job at a time; the next get after it lands picks up newer data
+            return
+        if self._executor is None:
+            # spawn: forking a threaded server process is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        self._pending = version
+        log.info("Training pricing model for version %d in the background", version)
+        future = self._executor.submit(_train_job, version, self.path)
+        future.add_done_callback(lambda f: self._swap(version, f))
+
+    def _swap(self, version: int, future: Future) -> None:
+        """Adopt a finished background model, atomically."""
+        try:
+            model = future.result()
+        except Exception as exc:
+            with self._lock:
+                self._pending = None
+                self._failures += 1
+                if isinstance(exc, BrokenExecutor):
+                    # A crashed worker breaks the pool for good; start afresh next time
+                    self._executor = None
+            log.warning("Background training failed (version %d): %s", version, exc)
+            return
+        with self._lock:
+            self._pending = None
+            if self._version is None or version > self._version:
+                # None: too little data, or the version was already scored
+                # by another process; keep rating with the model we have
+                self._model, self._version = model or self._model, version
+
+    def shutdown(self) -> None:
+        """Stop the background trainer without waiting for a running fit."""
+        if isinstance(self._executor, ProcessPoolExecutor):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _train(self, conn, version: int) -> Optional[PricingModel]:
+        """
+        Fit on the full market, persist the result and re-score listings.
+
+        Runs under a database-wide lock held until scoring commits, so of
+        the workers asking for one version only the first fits and scores.
+        The rest find every listing already rated for the version and skip
+        both, adopting the winner's persisted model if there is one
+        (without ``MODEL_PATH`` they keep rating new rows with the model
+        they have until the next version).
+        """
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (TRAIN_LOCK_KEY,))
+        model = self.load()
+        if model is not None and model.data_version != version:
+            model = None
+        if _listings_scored(cur, version):
+            conn.rollback()  # releases the lock
+            log.info("Listings already scored for version %d — skipping training", version)
+            return model if model is not None else self._model
+        if model is not None:
+            log.info("Adopted pricing model for version %d trained by another process", version)
+        else:
+            start = time.perf_counter()
+            model = fit_pricing_model(fetch_training_data(cur), version)
+            if model is None:
+                log.info("Not enough data to train pricing model (version %d)", version)
+            else:
+                log.info(
+                    "Trained pricing model — version=%d samples=%d in %.2fs",
+                    version, model.n_samples, time.perf_counter() - start,
+                )
+                self.save(model)
+        try:
+            score_listings(conn, model, version)
+        except psycopg2.Error as exc:
+            conn.rollback()
+            log.warning("Failed to store deal ratings (version %d): %s", version, exc)
+        return model
+
+    def load(self) -> Optional[PricingModel]:
+        """Load the persisted model, if any."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            model = joblib.load(self.path)
+        except Exception as exc:
+            log.warning("Failed to load pricing model from %s: %s", self.path, exc)
+            return None
+        if not isinstance(model, PricingModel) or model.schema != MODEL_SCHEMA:
+            return None
+        return model
+
+    def warm(self) -> None:
+        """Adopt the persisted model at startup (verified on first get)."""
+        model = self.load()
+        if model is not None:
+            self._model = model
+            log.info("Loaded pricing model (version %d) from %s", model.data_version, self.path)
+
+    def save(self, model: PricingModel) -> None:
+        """Persist atomically so concurrent readers never see a partial file."""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # A temp file of its own: workers training at once never share one
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".model-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    joblib.dump(model, f)
+                os.chmod(tmp_path, 0o644)  # mkstemp creates it owner-only
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as exc:
+            log.warning("Could not persist pricing model to %s: %s", self.path, exc)
+
+    def status(self) -> dict:
+        """Summary of the cached model for diagnostics."""
+        model = self._model
+        training = {"training_version": self._pending, "training_failures": self._failures}
+        if model is None:
+            return {"trained": False, **training}
+        return {
+            "trained": True,
+            "data_version": model.data_version,
+            "samples": model.n_samples,
+            "age_seconds": int(time.time() - model.trained_at),
+            "train_seconds": round(model.train_seconds, 3),
+            **training,
+        }
+
+
+registry = ModelRegistry(os.getenv("MODEL_PATH"))
@@ -0,0 +1,112 @@
+"""
+Ingest-time normalization of scraped listing fields.
+
+The scraper emits display strings ("$15,900", "85,000 km"). These helpers
+turn them into integers once, when a listing is stored, so the API and
+the pricing model can work with typed columns instead of re-parsing text
+on every request.
+
+The SQL backfill in ``db.py`` mirrors these rules for rows ingested
+before the typed columns existed. Titles ("2022 Subaru Ascent Limited")
+are split into model year, make and model by ``parse_title``; that one
+is too rich for SQL, so older rows are backfilled from Python.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import re
+from typing import Optional
+
+_PRICE_RE = re.compile(r"^\s*\$?\s*([0-9][0-9,]*)(?:\.([0-9]{1,2}))?\s*$")
+_MILEAGE_RE = re.compile(r"^\s*([0-9][0-9,]*)\s*(?:km)?\s*$", re.IGNORECASE)
+_LISTING_URL_RE = re.compile(r"^https?://")
+_SEARCH_URL_RE = re.compile(r"^https?://(www\.)?google\.[a-z.]+/search")
+_YEAR_RE = re.compile(r"\b(19[5-9][0-9]|20[0-9]{2})\b")
+_TITLE_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:[-./][A-Za-z0-9]+)*")
+
+# Lowercased title words (or word pairs) → canonical make
+_MAKES = {
+    **{name.lower(): name for name in (
+        "Acura", "Alfa Romeo", "Aston Martin", "Audi", "Bentley", "BMW", "Buick",
+        "Cadillac", "Chevrolet", "Chrysler", "Dodge", "Ferrari", "Fiat", "Ford",
+        "Genesis", "GMC", "Honda", "Hummer", "Hyundai", "Infiniti", "Jaguar", "Jeep",
+        "Kia", "Land Rover", "Lexus", "Lincoln", "Lucid", "Maserati", "Mazda",
+        "Mercedes-Benz", "MINI", "Mitsubishi", "Nissan", "Polestar", "Pontiac",
+        "Porsche", "Ram", "Rivian", "Saturn", "Scion", "Smart", "Subaru", "Suzuki",
+        "Tesla", "Toyota", "Volkswagen", "Volvo",
+    )},
+    "chevy": "Chevrolet",
+    "mercedes": "Mercedes-Benz",
+    "mercedes benz": "Mercedes-Benz",
+    "vw": "Volkswagen",
+}
+
+
+def parse_price_cents(raw: Optional[str]) -> Optional[int]:
+    """Convert a price string like '$15,900' to cents (1590000), or None."""
+    match = _PRICE_RE.match(raw or "")
+    if not match:
+        return None
+    dollars = int(match.group(1).replace(",", ""))
+    cents = int((match.group(2) or "0").ljust(2, "0"))
+    return dollars * 100 + cents
+
+
+def parse_mileage_km(raw: Optional[str]) -> Optional[int]:
+    """Convert a mileage string like '85,000 km' to an integer, or None."""
+    match = _MILEAGE_RE.match(raw or "")
+    if not match:
+        return None
+    return int(match.group(1).replace(",", ""))
+
+
+def parse_title(
+    title: Optional[str],
+) -> tuple[Optional[int], Optional[str], Optional[str]]:
+    """
+    Split a listing title into ``(model_year, make, model)``.
+
+    "2022 Subaru Ascent Limited" → (2022, "Subaru", "Ascent"). The make
+    is canonicalized ("Chevy" → "Chevrolet"); the model is the word after
+    it, as written. Parts that cannot be found are None.
+    """
+    title = title or ""
+    year = None
+    match = _YEAR_RE.search(title)
+    if match and int(match.group(1)) <= datetime.date.today().year + 1:
+        year = int(match.group(1))
+        title = title[match.end():]
+
+    words = _TITLE_WORD_RE.findall(title)
+    for i, word in enumerate(words):
+        pair = " ".join(words[i:i + 2]).lower()
+        width = 2 if pair in _MAKES else 1
+        make = _MAKES.get(pair) or _MAKES.get(word.lower())
+        if make:
+            model = words[i + width] if i + width < len(words) else None
+            return year, make, model
+    return year, None, None
+
+
+def listing_key(link: str, title: str, mileage: Optional[str], price: Optional[str]) -> str:
+    """
+    Stable identity of a listing, identical to ``cars.listing_key``.
+
+    Mirrors ``db._LISTING_KEY_SQL``: real listing URLs are used as-is,
+    while "#" and Google-search fallback links (whose ref hashes the
+    price) fall back to an md5 of title and parsed mileage — or of title
+    and price when the mileage does not parse, so same-title listings
+    without one stay apart.
+    """
+    if _LISTING_URL_RE.match(link) and not _SEARCH_URL_RE.match(link):
+        return link
+    mileage_km = parse_mileage_km(mileage)
+    if mileage_km is not None:
+        distinct = str(mileage_km)
+    else:
+        price_cents = parse_price_cents(price)
+        distinct = "$" + (str(price_cents) if price_cents is not None else (price or "").strip(" ").lower())
+    basis = f"{title.strip(' ').lower()}|{distinct}"
+    return "md5:" + hashlib.md5(basis.encode()).hexdigest()
@@ -0,0 +1,416 @@
+"""
+Notification dispatcher for alert matches.
+
+Drains the ``alert_matches`` outbox filled by ``alerts.match_alerts``:
+
+- Pending matches (``notified_at IS NULL``) are grouped per email address
+  into one digest message, so a subscriber with ten hits gets one email.
+- Digests are delivered by a small thread pool (``NOTIFY_WORKERS``), each
+  worker with its own database connection. A digest's matches are locked
+  ``FOR UPDATE SKIP LOCKED`` while it is sent, so concurrent workers or
+  dispatcher processes never pick up the same rows.
+- Transient send failures are retried with exponential backoff; a digest
+  that still fails stays pending for the next run.
+- Matches are marked delivered in the transaction that locked them, right
+  after the send. Each digest gets a ``Message-ID`` derived from its match
+  ids, so if that commit is lost and the digest is sent again, the
+  receiving side (and ``FileTransport``) can recognise the duplicate.
+
+Transports (``NOTIFY_TRANSPORT``):
+
+- ``smtp``: ``SMTPTransport``, configured by the ``SMTP_*`` variables
+- ``file``: ``FileTransport``, writes each digest as an ``.eml`` file to
+  ``NOTIFY_OUTBOX_DIR`` — a local stand-in for development and tests
+
+Each run logs and returns throughput and queue-depth metrics.
+
+Usage (from scraper/):
+    python -m src.notify --once
+"""
+
+import argparse
+import hashlib
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from email.utils import formatdate
+
+from dotenv import load_dotenv
+
+from .logger import get_logger
+
+load_dotenv()
+
+log = get_logger("notify")
+
+NOTIFY_TRANSPORT = os.getenv("NOTIFY_TRANSPORT", "smtp")
+NOTIFY_OUTBOX_DIR = os.getenv("NOTIFY_OUTBOX_DIR", "outbox")
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_BATCH = int(os.getenv("NOTIFY_BATCH", "200"))
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "3"))
+NOTIFY_BACKOFF = float(os.getenv("NOTIFY_BACKOFF", "2"))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "60"))
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+NOTIFY_FROM = os.getenv("NOTIFY_FROM", "alerts@sudbury-car-scout.local")
+
+TRANSPORTS = ("smtp", "file")
+
+
+# --- Outbox -----------------------------------------------------------------
+
+QUEUE_DEPTH_SQL = "SELECT COUNT(*) FROM alert_matches WHERE notified_at IS NULL;"
+
+# Recipients with pending matches, oldest first
+_PENDING_EMAILS_SQL = """
+    SELECT a.email
+    FROM alert_matches AS m JOIN price_alerts AS a ON a.id = m.alert_id
+    WHERE m.notified_at IS NULL
+    GROUP BY a.email
+    ORDER BY min(m.id)
+    LIMIT %s;
+"""
+
+_CLAIM_SQL = """
+    SELECT m.id, a.keyword, a.target_price, c.title, c.link, m.price_cents
+    FROM alert_matches AS m
+    JOIN price_alerts AS a ON a.id = m.alert_id
+    JOIN cars AS c ON c.id = m.car_id
+    WHERE a.email = %s AND m.notified_at IS NULL
+    ORDER BY m.id
+    FOR UPDATE OF m SKIP LOCKED;
+"""
+
+_MARK_DELIVERED_SQL = """
+    UPDATE alert_matches SET notified_at = CURRENT_TIMESTAMP
+    WHERE id = ANY(%s) AND notified_at IS NULL;
+"""
+
+
+def is_transient(exc):
+    """
+    True for send errors worth retrying.
+
+    Network errors and 4xx SMTP replies are transient; 5xx replies,
+    refused recipients with permanent codes and unsupported commands are
+    not. (``smtplib.SMTPException`` subclasses ``OSError``, so the order
+    of the checks matters.)
+    """
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return bool(codes) and all(code < 500 for code in codes)
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPNotSupportedError):
+        return False
+    return isinstance(exc, OSError)
+
+
+def queue_depth(cur):
+    """Number of matches waiting to be delivered."""
+    cur.execute(QUEUE_DEPTH_SQL)
+    return cur.fetchone()[0]
+
+
+class Digest:
+    """All pending matches for one recipient."""
+
+    def __init__(self, email, rows):
+        self.email = email
+        self.rows = rows  # (match_id, keyword, target_price, title, link, price_cents)
+
+    @property
+    def match_ids(self):
+        return [row[0] for row in self.rows]
+
+    @property
+    def message_id(self):
+        """Stable for the same set of matches, so a re-send is recognisable."""
+        basis = ",".join(str(i) for i in sorted(self.match_ids))
+        digest = hashlib.sha1(f"{self.email}|{basis}".encode()).hexdigest()[:24]
+        return f"<alert-digest-{digest}@sudbury-car-scout>"
+
+
+def render_digest(digest, sender=NOTIFY_FROM):
+    """Build the email for a digest: one line per matching listing."""
+    msg = EmailMessage()
+    count = len(digest.rows)
+    msg["Subject"] = (
+        f"{count} car{'s' if count != 1 else ''} matched your Sudbury Car Scout alerts"
+    )
+    msg["From"] = sender
+    msg["To"] = digest.email
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = digest.message_id
+
+    lines = ["New listings at or below your target price:", ""]
+    for _, keyword, target_price, title, link, price_cents in digest.rows:
+        lines.append(
+            f"- {title} — ${price_cents / 100:,.0f} "
+            f"(alert: \"{keyword}\" under ${target_price:,})"
+        )
+        lines.append(f"  {link}")
+    msg.set_content("\n".join(lines) + "\n")
+    return msg
+
+
+# --- Transports -------------------------------------------------------------
+
+
+class SMTPTransport:
+    """Send over SMTP, keeping one open connection per worker thread."""
+
+    def __init__(
+        self,
+        host=SMTP_HOST,
+        port=SMTP_PORT,
+        user=SMTP_USER,
+        password=SMTP_PASSWORD,
+        starttls=SMTP_STARTTLS,
+        timeout=SMTP_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._local = threading.local()
+        self._clients = []
+        self._clients_lock = threading.Lock()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                client.starttls()
+            if self.user:
+                client.login(self.user, self.password)
+            self._local.client = client
+            with self._clients_lock:
+                self._clients.append(client)
+        return client
+
+    def send(self, msg):
+        try:
+            self._client().send_message(msg)
+        except OSError as e:
+            if is_transient(e):
+                # Drop the connection so the retry reconnects
+                self._drop_client()
+            raise
+
+    def _drop_client(self):
+        client, self._local.client = getattr(self._local, "client", None), None
+        if client is None:
+            return
+        with self._clients_lock:
+            self._clients.remove(client)
+        try:
+            client.close()
+        except OSError:
+            pass
+
+    def close(self):
+        with self._clients_lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.quit()
+            except (smtplib.SMTPException, OSError):
+                client.close()
+
+
+class FileTransport:
+    """Write each message to ``<directory>/<message id>.eml``."""
+
+    def __init__(self, directory=NOTIFY_OUTBOX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, msg):
+        name = msg["Message-ID"].strip("<>").split("@")[0]
+        return os.path.join(self.directory, f"{name}.eml")
+
+    def send(self, msg):
+        path = self.path_for(msg)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(msg.as_bytes())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        pass
+
+
+def get_transport(name=NOTIFY_TRANSPORT):
+    """Build the transport selected by ``NOTIFY_TRANSPORT``."""
+    if name == "smtp":
+        return SMTPTransport()
+    if name == "file":
+        return FileTransport()
+    raise ValueError(f"Unknown NOTIFY_TRANSPORT {name!r} — expected one of {TRANSPORTS}")
+
+
+# --- Dispatcher -------------------------------------------------------------
+
+
+class Dispatcher:
+    """Deliver pending alert matches as per-recipient digests."""
+
+    def __init__(
+        self,
+        transport,
+        connect=None,
+        workers=NOTIFY_WORKERS,
+        batch=NOTIFY_BATCH,
+        retries=NOTIFY_RETRIES,
+        backoff=NOTIFY_BACKOFF,
+    ):
+        if connect is None:
+            from .db import get_db as connect
+        self.transport = transport
+        self.connect = connect
+        self.workers = workers
+        self.batch = batch
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _conn(self):
+        """This worker thread's database connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self):
+        """Stop the workers and close their database connections."""
+        self._pool.shutdown()
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+
+    def deliver(self, email, stats):
+        """Claim, send and mark one recipient's digest."""
+        conn = self._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(_CLAIM_SQL, (email,))
+            rows = cur.fetchall()
+            if not rows:
+                # Delivered already, or claimed by another worker
+                conn.rollback()
+                return
+            digest = Digest(email, rows)
+            self._send(render_digest(digest), stats)
+            cur.execute(_MARK_DELIVERED_SQL, (digest.match_ids,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            with self._stats_lock:
+                stats["failed"] += 1
+            log.error("Digest for %s not delivered: %s", email, e)
+            return
+        with self._stats_lock:
+            stats["digests"] += 1
+            stats["matches"] += len(rows)
+
+    def _send(self, msg, stats):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.transport.send(msg)
+            except OSError as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                delay = self.backoff * 2 ** attempt
+                with self._stats_lock:
+                    stats["retries"] += 1
+                log.warning(
+                    "Send to %s failed (attempt %d/%d): %s — retrying in %.1fs",
+                    msg["To"], attempt + 1, self.retries + 1, e, delay,
+                )
+                time.sleep(delay)
+
+    def run_once(self):
+        """
+        Drain the outbox, up to ``batch`` recipients per round.
+
+        Returns metrics: digests and matches delivered, failed digests,
+        send retries, elapsed seconds, delivery throughput and the queue
+        depth before and after.
+        """
+        stats = {"digests": 0, "matches": 0, "failed": 0, "retries": 0}
+        start = time.perf_counter()
+        cur = self._conn().cursor()
+        stats["queue_before"] = queue_depth(cur)
+        self._conn().commit()
+
+        attempted = set()
+        while True:
+            cur.execute(_PENDING_EMAILS_SQL, (self.batch,))
+            pending = [row[0] for row in cur.fetchall()]
+            self._conn().commit()
+            # Recipients that failed earlier in this run wait for the next one
+            emails = [email for email in pending if email not in attempted]
+            attempted.update(emails)
+            list(self._pool.map(lambda email: self.deliver(email, stats), emails))
+            if not emails or len(pending) < self.batch:
+                break
+
+        stats["queue_after"] = queue_depth(cur)
+        self._conn().commit()
+        stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+        stats["matches_per_s"] = (
+            round(stats["matches"] / stats["elapsed_s"], 1) if stats["elapsed_s"] else 0.0
+        )
+        log.info(
+            "Dispatched %d digests (%d matches) in %.2fs — %.1f matches/s, "
+            "%d failed, %d retries, queue %d → %d",
+            stats["digests"], stats["matches"], stats["elapsed_s"],
+            stats["matches_per_s"], stats["failed"], stats["retries"],
+            stats["queue_before"], stats["queue_after"],
+        )
+        return stats
+
+    def run(self, poll_interval=NOTIFY_POLL_INTERVAL):
+        """Keep draining the outbox every ``poll_interval`` seconds."""
+        while True:
+            self.run_once()
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver pending price-alert matches.")
+    parser.add_argument("--once", action="store_true", help="drain the outbox once and exit")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=NOTIFY_TRANSPORT)
+    parser.add_argument("--workers", type=int, default=NOTIFY_WORKERS)
+    args = parser.parse_args()
+
+    transport = get_transport(args.transport)
+    dispatcher = Dispatcher(transport, workers=args.workers)
+    try:
+        if args.once:
+            dispatcher.run_once()
+        else:
+            dispatcher.run()
+    finally:
+        dispatcher.close()
+        transport.close()
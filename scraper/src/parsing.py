@@ -0,0 +1,175 @@
+"""
+HTML parser backends for listing extraction.
+
+Card discovery and field extraction only need a handful of tree
+operations, so they are implemented once per parser library and exposed
+through ``iter_cards``, which yields ``(text, title)`` for every listing
+card on a results page. ``main.build_listing`` turns those into listings,
+so every backend produces identical output.
+
+Backends (``SCRAPER_PARSER``):
+
+- ``html.parser``: BeautifulSoup with the stdlib parser (default, no
+  extra dependencies)
+- ``lxml``: BeautifulSoup on the C lxml parser
+- ``selectolax``: the lexbor engine via selectolax, bypassing
+  BeautifulSoup entirely
+"""
+
+import os
+
+from bs4 import BeautifulSoup, CData, NavigableString
+
+PARSERS = ("html.parser", "lxml", "selectolax")
+DEFAULT_PARSER = os.getenv("SCRAPER_PARSER", "html.parser")
+
+# How many levels above a seed div the card root may be
+_CARD_CLIMB = 4
+
+# Elements whose text is not visible page text (excluded by get_text())
+_RAW_TEXT_TAGS = ("script", "style", "template")
+
+
+def _is_seed_class(classes):
+    """Seed divs sit inside (or are) a listing card."""
+    return any("re-layout-inner" in c or "listing-details" in c for c in classes)
+
+
+def _is_title_class(classes):
+    return any("title" in c.lower() or "make-model" in c.lower() for c in classes)
+
+
+def _climb_to_cards(seeds, key, parent, priced):
+    """
+    Yield each card root once, in document order.
+
+    A card root is the nearest of a seed div and its first three
+    ancestors whose text contains a price. Several seeds usually share a
+    card, so roots are de-duplicated by ``key``.
+    """
+    seen = set()
+    for seed in seeds:
+        node = seed
+        for _ in range(_CARD_CLIMB):
+            if key(node) in priced:
+                if key(node) not in seen:
+                    seen.add(key(node))
+                    yield node
+                break
+            node = parent(node) or node
+
+
+# --- BeautifulSoup (html.parser, lxml) -----------------------------------
+
+
+def _priced_tags(soup):
+    """
+    Return ids of every tag whose visible text contains a "$".
+
+    Built in one pass from the strings themselves (marking their
+    ancestors), so checking a node is a set lookup instead of a
+    ``get_text()`` over its whole subtree. Only plain text counts, as in
+    ``get_text()`` — not comments or script bodies.
+    """
+    priced = set()
+    for string in soup.find_all(string=lambda t: "$" in t):
+        if type(string) not in (NavigableString, CData):
+            continue
+        for parent in string.parents:
+            if id(parent) in priced:
+                break
+            priced.add(id(parent))
+    return priced
+
+
+def find_card_roots(soup):
+    """Locate each listing card in a BeautifulSoup tree once, in document order."""
+    seeds = soup.find_all(
+        lambda tag: tag.name == "div" and _is_seed_class(tag.get("class", ()))
+    )
+    return list(
+        _climb_to_cards(seeds, id, lambda tag: tag.parent, _priced_tags(soup))
+    )
+
+
+def soup_card_fields(card):
+    """Return ``(text, title)`` for a BeautifulSoup card element."""
+    title_tag = card.find(
+        ["h2", "span"],
+        class_=lambda x: x and _is_title_class(x.split()),
+    )
+    title = title_tag.get_text(strip=True) if title_tag else None
+    return card.get_text(separator=" ", strip=True), title
+
+
+def _iter_soup_cards(html, features):
+    soup = BeautifulSoup(html, features)
+    for card in find_card_roots(soup):
+        yield soup_card_fields(card)
+
+
+# --- selectolax (lexbor) -------------------------------------------------
+
+
+def _visible_strings(node):
+    """Text nodes under ``node`` that ``get_text()`` would include."""
+    for child in node.traverse(include_text=True):
+        if child.is_text_node and child.parent.tag not in _RAW_TEXT_TAGS:
+            yield child.text_content
+
+
+def _lexbor_text(node, separator):
+    return separator.join(
+        s for s in (t.strip() for t in _visible_strings(node)) if s
+    )
+
+
+def _iter_lexbor_cards(html):
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError as exc:
+        raise ImportError(
+            "SCRAPER_PARSER=selectolax requires the selectolax package"
+        ) from exc
+
+    tree = LexborHTMLParser(html)
+    if tree.root is None:
+        return
+
+    priced = set()
+    for text in tree.root.traverse(include_text=True):
+        if not text.is_text_node or "$" not in text.text_content:
+            continue
+        if text.parent.tag in _RAW_TEXT_TAGS:
+            continue
+        node = text.parent
+        while node is not None and node.mem_id not in priced:
+            priced.add(node.mem_id)
+            node = node.parent
+
+    seeds = (
+        div for div in tree.css("div")
+        if _is_seed_class((div.attributes.get("class") or "").split())
+    )
+    for card in _climb_to_cards(seeds, lambda n: n.mem_id, lambda n: n.parent, priced):
+        # css() also matches the node itself; find() only searches below it
+        title_tag = next(
+            (
+                tag for tag in card.css("h2, span")
+                if tag.mem_id != card.mem_id
+                and _is_title_class((tag.attributes.get("class") or "").split())
+            ),
+            None,
+        )
+        title = _lexbor_text(title_tag, "") if title_tag is not None else None
+        yield _lexbor_text(card, " "), title
+
+
+def iter_cards(html, parser=None):
+    """Yield ``(text, title)`` for each listing card using the chosen backend."""
+    parser = parser or DEFAULT_PARSER
+    if parser == "selectolax":
+        return _iter_lexbor_cards(html)
+    if parser in ("html.parser", "lxml"):
+        return _iter_soup_cards(html, parser)
+    raise ValueError(f"Unknown SCRAPER_PARSER {parser!r} — expected one of {PARSERS}")
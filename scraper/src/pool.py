@@ -0,0 +1,172 @@
+"""
+Process-wide PostgreSQL connection pool for the API.
+
+Wraps psycopg2's ``ThreadedConnectionPool`` with the pieces it lacks:
+
+- Blocking checkout: callers wait (up to a timeout) for a free slot
+  instead of failing immediately when every connection is busy.
+- Health-checked checkout: closed connections are discarded, and
+  connections idle longer than ``ping_after`` seconds are probed with
+  ``SELECT 1`` before being handed out.
+- Counters for the /health endpoint.
+
+Each uvicorn worker process owns one pool, so warm TLS connections are
+reused across requests instead of reconnecting per handler.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from .logger import get_logger
+
+log = get_logger("pool")
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe, health-checked pool of PostgreSQL connections."""
+
+    def __init__(
+        self,
+        dsn: str,
+        minconn: int = 1,
+        maxconn: int = 10,
+        timeout: float = 5.0,
+        ping_after: float = 30.0,
+    ):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used: dict[int, float] = {}
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+
+    # --- Checkout -----------------------------------------------------------
+
+    def _healthy(self, conn) -> bool:
+        """Return True if the connection is usable, probing stale ones."""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to ``timeout``."""
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(
+                f"No database connection available within {self.timeout}s"
+            )
+        try:
+            # One retry: a stale connection is replaced by a fresh one
+            for _ in range(2):
+                conn = self._pool.getconn()
+                if self._healthy(conn):
+                    break
+                self._discard(conn)
+            else:
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def putconn(self, conn) -> None:
+        """Return a connection; psycopg2 rolls back any open transaction."""
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _discard(self, conn) -> None:
+        """Drop a broken connection so the pool opens a new one."""
+        self._last_used.pop(id(conn), None)
+        with self._lock:
+            self._discarded += 1
+        log.warning("Discarding unhealthy pooled connection")
+        self._pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """Context manager yielding a pooled connection."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # --- Lifecycle & metrics ------------------------------------------------
+
+    def close(self) -> None:
+        """Close every connection held by the pool."""
+        self._pool.closeall()
+        self._last_used.clear()
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for diagnostics."""
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "available": self.maxconn - self._in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+            }
+
+
+def pool_from_env() -> Optional[ConnectionPool]:
+    """
+    Build a pool from DATABASE_URL and the DB_POOL_* settings.
+
+    Returns None when DATABASE_URL is unset. Connection errors propagate
+    so the caller can decide whether to retry later.
+    """
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        return None
+    pool = ConnectionPool(
+        dsn,
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+    )
+    log.info("Connection pool opened (min=%d, max=%d)", pool.minconn, pool.maxconn)
+    return pool
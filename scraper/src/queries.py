@@ -0,0 +1,276 @@
+"""
+SQL query builders for Car Scout.
+
+Keeps filtering, ordering and pagination inside PostgreSQL so the API
+only transfers the rows it actually returns. Builders are pure functions
+returning ``(sql, params)`` tuples, which keeps them easy to unit test
+without a live database.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+
+DEAL_RATINGS = ("GREAT DEAL", "GOOD DEAL", "FAIR PRICE", "OVERPRICED")
+
+# Indexed title expressions — db.init_db builds idx_cars_title on
+# TITLE_TSVECTOR, and the planner only uses it for this exact expression
+TITLE_TSVECTOR = "to_tsvector('english', title)"
+_KEYWORD_TSQUERY = "websearch_to_tsquery('english', %s)"
+
+# Sort modes → ORDER BY clauses (each backed by an index in db.init_db)
+_ORDER_BY = {
+    "newest": "created_at DESC, id DESC",
+    "deal": "(fair_price_cents - price_cents) DESC NULLS LAST, id DESC",
+}
+# "relevance" ranks full-text matches by ts_rank; it needs a keyword
+SORT_MODES = tuple(_ORDER_BY) + ("relevance",)
+
+# Leading columns of every /cars row
+_LISTING_COLUMNS = (
+    "id, title, price, mileage, link, price_cents, mileage_km, "
+    "deal_rating, deal_color, created_at, model_year, make, model"
+)
+
+
+# Market-wide aggregates over the typed columns. Backs the market_stats
+# materialized view (refreshed by load_data) and the live fallback query.
+MARKET_STATS_SQL = """
+    SELECT
+        TRUE AS singleton,
+        COUNT(*) AS total_listings,
+        round(avg(price_cents) / 100.0, 2) AS avg_price,
+        round((percentile_cont(0.5) WITHIN GROUP (ORDER BY price_cents) / 100.0)::numeric, 2)
+            AS median_price,
+        round(avg(mileage_km), 2) AS avg_mileage,
+        min(price_cents) / 100 AS min_price,
+        max(price_cents) / 100 AS max_price,
+        CURRENT_TIMESTAMP AS refreshed_at
+    FROM cars
+"""
+
+STATS_COLUMNS = (
+    "total_listings, avg_price, median_price, avg_mileage, min_price, max_price"
+)
+
+
+def _escape_like(term: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _listing_filters(
+    keyword: str, min_price: int, max_price: int, deal: str = "", partial: bool = False
+) -> tuple[str, list]:
+    """
+    Build the shared WHERE clause for listing queries.
+
+    ``keyword`` is a full-text search (``websearch_to_tsquery`` syntax:
+    whole words, "quoted phrases", ``-excluded``) served by the
+    ``idx_cars_title`` GIN index. With ``partial=True`` it is instead a
+    case-insensitive substring match, for fragments such as "civ" that
+    are not whole words; ``idx_cars_title_trgm`` serves that where
+    pg_trgm is installed.
+
+    Price bounds are given in dollars and compared against the indexed
+    ``price_cents`` column; listings without a parseable price (NULL)
+    never match a bound. ``deal`` matches the precomputed deal_rating.
+    """
+    clauses: list[str] = []
+    params: list = []
+
+    if keyword and partial:
+        clauses.append("title ILIKE %s")
+        params.append(f"%{_escape_like(keyword)}%")
+    elif keyword:
+        clauses.append(f"{TITLE_TSVECTOR} @@ {_KEYWORD_TSQUERY}")
+        params.append(keyword)
+    if min_price > 0:
+        clauses.append("price_cents >= %s")
+        params.append(min_price * 100)
+    if max_price > 0:
+        clauses.append("price_cents <= %s")
+        params.append(max_price * 100)
+    if deal:
+        clauses.append("deal_rating = %s")
+        params.append(deal)
+
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def build_listings_query(
+    keyword: str = "",
+    min_price: int = 0,
+    max_price: int = 0,
+    page: int = 1,
+    limit: int = 20,
+    deal: str = "",
+    sort: str = "newest",
+    partial: bool = False,
+) -> tuple[str, list]:
+    """
+    Build the paginated /cars query.
+
+    Each returned row is ``(id, title, price, mileage, link, price_cents,
+    mileage_km, deal_rating, deal_color, created_at, model_year, make,
+    model, total_count)`` where
+    ``total_count`` is the number of rows matching the filters (computed
+    with ``COUNT(*) OVER ()`` before LIMIT/OFFSET apply). ``sort`` is one
+    of ``SORT_MODES``; "relevance" orders full-text matches by
+    ``ts_rank`` and falls back to "newest" without a full-text keyword.
+
+    With a keyword the matches are collected first (MATERIALIZED), since
+    all of them are counted anyway: left inlined, the planner may walk
+    ``idx_cars_created_at`` to skip the sort and parse every title in
+    the table instead of probing the title index.
+    """
+    where, params = _listing_filters(keyword, min_price, max_price, deal, partial)
+    if sort == "relevance" and keyword and not partial:
+        order_by = f"ts_rank({TITLE_TSVECTOR}, {_KEYWORD_TSQUERY}) DESC, id DESC"
+        params.append(keyword)
+    else:
+        order_by = _ORDER_BY.get(sort, _ORDER_BY["newest"])
+    prefix, source = "", f"cars{where}"
+    if keyword:
+        prefix, source = f"WITH matches AS MATERIALIZED (SELECT * FROM cars{where}) ", "matches"
+    sql = (
+        f"{prefix}SELECT {_LISTING_COLUMNS}, COUNT(*) OVER () AS total_count "
+        f"FROM {source} "
+        f"ORDER BY {order_by} "
+        "LIMIT %s OFFSET %s;"
+    )
+    return sql, params + [limit, (page - 1) * limit]
+
+
+def build_keyset_query(
+    keyword: str = "",
+    min_price: int = 0,
+    max_price: int = 0,
+    limit: int = 20,
+    deal: str = "",
+    after: tuple[datetime, int] | None = None,
+    partial: bool = False,
+) -> tuple[str, list]:
+    """
+    Build a cursor-paginated /cars query in "newest" order.
+
+    Rows have the same leading columns as ``build_listings_query`` but no
+    ``total_count``. ``after`` is the ``(created_at, id)`` of the last
+    row already returned; the next page starts right below it in the
+    ``(created_at DESC, id DESC)`` index, so a deep page costs the same
+    as the first and rows inserted meanwhile do not shift it. Fetches
+    ``limit + 1`` rows so the caller can tell whether another page
+    follows.
+    """
+    where, params = _listing_filters(keyword, min_price, max_price, deal, partial)
+    if after is not None:
+        where += " AND " if where else " WHERE "
+        where += "(created_at, id) < (%s::timestamp, %s)"
+        params += list(after)
+    sql = (
+        f"SELECT {_LISTING_COLUMNS} "
+        f"FROM cars{where} "
+        f"ORDER BY {_ORDER_BY['newest']} "
+        "LIMIT %s;"
+    )
+    return sql, params + [limit + 1]
+
+
+def encode_cursor(created_at: datetime, car_id: int, partial: bool = False) -> str:
+    """Opaque token for the position after ``(created_at, car_id)``."""
+    payload = json.dumps(["p" if partial else "f", created_at.isoformat(), car_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[tuple[datetime, int], bool]:
+    """
+    Decode an ``encode_cursor`` token into ``((created_at, id), partial)``.
+
+    ``partial`` records which keyword search produced the first page, so
+    later pages keep using it. Raises ValueError for a malformed token.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        mode, created_at, car_id = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if mode not in ("f", "p") or type(car_id) is not int:
+        raise ValueError("invalid cursor")
+    return (created_at, car_id), mode == "p"
+
+
+def build_count_query(
+    keyword: str = "",
+    min_price: int = 0,
+    max_price: int = 0,
+    deal: str = "",
+    partial: bool = False,
+) -> tuple[str, list]:
+    """
+    Build a COUNT(*) query with the same filters as the listings query.
+
+    Only needed when a page lands past the end of the result set, where
+    the window count has no rows to ride along on.
+    """
+    where, params = _listing_filters(keyword, min_price, max_price, deal, partial)
+    return f"SELECT COUNT(*) FROM cars{where};", params
+
+
+def build_price_history_query(car_id: int) -> tuple[str, list]:
+    """
+    Build the price series query for one listing, oldest first.
+
+    Rows are ``(observed_at, price_cents)``; served by the
+    ``(listing_id, observed_at)`` primary key of car_price_history.
+    """
+    sql = (
+        "SELECT observed_at, price_cents FROM car_price_history "
+        "WHERE listing_id = %s ORDER BY observed_at;"
+    )
+    return sql, [car_id]
+
+
+def build_price_drops_query(days: int = 7, limit: int = 20) -> tuple[str, list]:
+    """
+    Build the biggest-recent-price-drops query.
+
+    For every listing whose latest price observation falls within the
+    last ``days`` days, compares it with the observation just before it
+    and keeps the ones that went down, largest drop first. Rows are
+    ``(id, title, link, mileage_km, old_price_cents, new_price_cents,
+    changed_at, drop_cents)``.
+
+    The window is found through the ``observed_at`` index and each
+    previous price with one probe of the primary key, so the cost grows
+    with the number of recent changes, not the size of the history.
+    """
+    sql = """
+        WITH latest AS (
+            SELECT DISTINCT ON (listing_id) listing_id, observed_at, price_cents
+            FROM car_price_history
+            WHERE observed_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+            ORDER BY listing_id, observed_at DESC
+        )
+        SELECT c.id, c.title, c.link, c.mileage_km,
+               prev.price_cents AS old_price_cents,
+               latest.price_cents AS new_price_cents,
+               latest.observed_at AS changed_at,
+               prev.price_cents - latest.price_cents AS drop_cents
+        FROM latest
+        JOIN cars AS c ON c.id = latest.listing_id
+        CROSS JOIN LATERAL (
+            SELECT h.price_cents FROM car_price_history AS h
+            WHERE h.listing_id = latest.listing_id
+              AND h.observed_at < latest.observed_at
+            ORDER BY h.observed_at DESC
+            LIMIT 1
+        ) AS prev
+        WHERE prev.price_cents > latest.price_cents
+        ORDER BY drop_cents DESC, c.id
+        LIMIT %s;
+    """
+    return sql, [days, limit]
@@ -0,0 +1,164 @@
+"""
+Local scrape state for incremental runs.
+
+``ScrapeState`` remembers, between runs, a content hash of every result
+page and a fingerprint of every listing (keyed like ``cars.listing_key``)
+along with the page it was last seen on. ``DeltaWriter`` uses it to:
+
+- skip parsing pages whose HTML is byte-for-byte unchanged, treating all
+  of their known listings as seen;
+- emit only listings that are new or whose title / price / mileage
+  changed;
+- emit a ``{"listing_key": ..., "removed": true}`` record for listings
+  that are gone from a page crawled this run. Listings last seen on pages
+  that were not crawled, failed or parsed no listings at all (a challenge
+  or error page) are left alone.
+
+The output is therefore a delta that ``db.load_data`` applies as-is.
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+from .logger import get_logger
+from .main import DedupWriter
+from .normalize import listing_key
+
+log = get_logger("state")
+
+STATE_FILE = os.getenv("SCRAPER_STATE", ".scraper-state.json")
+_STATE_FORMAT = 1
+
+
+def page_digest(html):
+    """Content hash of a result page."""
+    return hashlib.blake2b(html.encode(), digest_size=16).hexdigest()
+
+
+def listing_fingerprint(item):
+    """Hash of the scraped fields that make a listing "changed"."""
+    basis = "\x1f".join((item["title"], item["price"], item["mileage"], item["link"]))
+    return hashlib.md5(basis.encode()).hexdigest()
+
+
+class ScrapeState:
+    """Page hashes and listing fingerprints persisted as JSON."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.pages = {}  # url -> page digest
+        self.listings = {}  # listing_key -> {"fp": fingerprint, "page": url}
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        """Read state from ``path``; a missing or unreadable file starts fresh."""
+        state = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return state
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Ignoring unreadable scrape state %s: %s", path, e)
+            return state
+        if data.get("format") == _STATE_FORMAT:
+            state.pages = data.get("pages", {})
+            state.listings = data.get("listings", {})
+        return state
+
+    def save(self):
+        """Persist atomically so an interrupted run never leaves a partial file."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"format": _STATE_FORMAT, "pages": self.pages, "listings": self.listings},
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+
+class DeltaWriter(DedupWriter):
+    """
+    Writer that passes only new, changed and removed listings to the sink.
+
+    Thread-safe, like ``DedupWriter``, so crawl workers can share it.
+    Call ``finish()`` once the run is over to emit removals and save the
+    state.
+    """
+
+    def __init__(self, sink, state):
+        super().__init__(sink)
+        self.state = state
+        self._seen_keys = set()
+        self._crawled_pages = set()
+        self._by_page = defaultdict(list)
+        for key, entry in state.listings.items():
+            self._by_page[entry["page"]].append(key)
+        self.unchanged = 0
+        self.skipped_pages = 0
+
+    def page_unchanged(self, url, digest):
+        """If the page is identical to last run, mark its listings seen and return True."""
+        with self._lock:
+            if self.state.pages.get(url) != digest:
+                return False
+            self._crawled_pages.add(url)
+            self.skipped_pages += 1
+            for key in self._by_page[url]:
+                if key not in self._seen_keys:
+                    self._seen_keys.add(key)
+                    self.unchanged += 1
+        return True
+
+    def write_page(self, url, digest, listings):
+        new = 0
+        for item in listings:
+            new += self._write_from(url, item)
+        if not listings:
+            # Not evidence of removals; keep the old digest so the page is re-parsed
+            return new
+        with self._lock:
+            self._crawled_pages.add(url)
+            self.state.pages[url] = digest
+        return new
+
+    def write(self, item):
+        return self._write_from(None, item)
+
+    def _write_from(self, url, item):
+        key = listing_key(item["link"], item["title"], item["mileage"], item["price"])
+        fp = listing_fingerprint(item)
+        with self._lock:
+            if key in self._seen_keys:
+                return False
+            self._seen_keys.add(key)
+            known = self.state.listings.get(key)
+            self.state.listings[key] = {"fp": fp, "page": url}
+            if known is not None and known["fp"] == fp:
+                self.unchanged += 1
+                return False
+            self.sink.write(item)
+        log.info(
+            "%s: %s | %s", "Changed" if known else "Found", item["title"], item["price"]
+        )
+        return True
+
+    def finish(self):
+        """Emit removals for listings gone from crawled pages; save the state."""
+        removed = [
+            key for key, entry in self.state.listings.items()
+            if entry["page"] in self._crawled_pages and key not in self._seen_keys
+        ]
+        for key in removed:
+            self.sink.write({"listing_key": key, "removed": True})
+            del self.state.listings[key]
+        self.state.save()
+        log.info(
+            "Delta: %d new/changed, %d unchanged, %d removed "
+            "(%d pages skipped as unchanged)",
+            self.sink.count - len(removed), self.unchanged, len(removed),
+            self.skipped_pages,
+        )
+        return len(removed)
@@ -0,0 +1,79 @@
+"""
+Shared fixtures: a local HTTP server for saved AutoTrader result pages.
+"""
+
+import gzip
+import os
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "autotrader")
+
+# Cookie a browser "earns" by passing the fixture server's challenge
+CHALLENGE_COOKIE = "incap_ses_fixture=ok"
+CHALLENGE_PAGE = (
+    b"<html><head><title>Pardon Our Interruption</title></head>"
+    b"<body><script src='/_Incapsula_Resource?SWJIYLWA=1'></script></body></html>"
+)
+
+
+class _ResultsHandler(BaseHTTPRequestHandler):
+    """
+    Serve ``results_<rcs>.html`` for any path with an ``rcs`` offset.
+
+    Speaks keep-alive HTTP/1.1 and gzips when asked. Offsets listed in
+    ``server.challenged`` get a 403 challenge page unless the request
+    carries ``CHALLENGE_COOKIE``.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        offset = query.get("rcs", ["0"])[0]
+        path = os.path.join(FIXTURE_DIR, f"results_{offset}.html")
+        self.server.requests.append(self.path)
+        self.server.connections.add(self.client_address)
+
+        if offset in self.server.challenged and CHALLENGE_COOKIE not in self.headers.get("Cookie", ""):
+            status, body = 403, CHALLENGE_PAGE
+        elif os.path.exists(path):
+            with open(path, "rb") as f:
+                status, body = 200, f.read()
+        else:
+            status, body = 404, b"<html><body>Not found</body></html>"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+            self.server.gzipped += 1
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    """A local server serving the saved result pages."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ResultsHandler)
+    server.requests = []
+    server.connections = set()
+    server.challenged = set()
+    server.gzipped = 0
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    server.challenge_cookie = CHALLENGE_COOKIE
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,67 @@
+"""
+Tests for the async API connection pool (asyncpg mocked out).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from scraper.src.aiopool import AsyncConnection, AsyncPool, to_asyncpg
+from scraper.src.pool import PoolTimeout
+from scraper.src.queries import build_listings_query
+
+
+def _make_pool(**kwargs):
+    """Build an AsyncPool around a mocked asyncpg pool."""
+    pool = AsyncPool("postgresql://test", **kwargs)
+    pool._pool = MagicMock()
+    pool._pool.acquire = AsyncMock(return_value=MagicMock())
+    pool._pool.release = AsyncMock()
+    return pool
+
+
+def test_to_asyncpg_numbers_placeholders():
+    assert to_asyncpg("SELECT * FROM cars WHERE a = %s AND b ILIKE %s LIMIT %s") == (
+        "SELECT * FROM cars WHERE a = $1 AND b ILIKE $2 LIMIT $3"
+    )
+    assert to_asyncpg("SELECT '100%%' || %s") == "SELECT '100%' || $1"
+
+
+def test_to_asyncpg_matches_builder_params():
+    """Every builder parameter gets its own $n, in order."""
+    sql, params = build_listings_query("civic", 5000, 20000, page=2, sort="relevance")
+    converted = to_asyncpg(sql)
+    assert "%s" not in converted
+    assert f"${len(params)}" in converted and f"${len(params) + 1}" not in converted
+
+
+def test_connection_passes_params_positionally():
+    raw = MagicMock()
+    raw.fetch = AsyncMock(return_value=[(1,)])
+    conn = AsyncConnection(raw)
+    assert asyncio.run(conn.fetch("SELECT %s, %s", [1, "a"])) == [(1,)]
+    raw.fetch.assert_awaited_once_with("SELECT $1, $2", 1, "a")
+
+
+def test_checkout_and_return_updates_stats():
+    pool = _make_pool(maxconn=2)
+
+    async def use():
+        async with pool.connection():
+            assert pool.stats()["in_use"] == 1
+
+    asyncio.run(use())
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 1
+    pool._pool.release.assert_awaited_once()
+
+
+def test_checkout_timeout_raises_pool_timeout():
+    pool = _make_pool(timeout=0.01)
+    pool._pool.acquire.side_effect = asyncio.TimeoutError
+    with pytest.raises(PoolTimeout):
+        asyncio.run(pool.acquire())
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,21 @@
+"""
+Tests for the set-based alert matcher (database mocked out).
+"""
+
+from unittest.mock import MagicMock
+
+from scraper.src.alerts import MATCH_ALERTS_SQL, match_alerts
+
+
+def test_match_alerts_runs_one_statement_for_the_sync():
+    cur = MagicMock()
+    cur.rowcount = 4
+    assert match_alerts(cur, "2026-01-01 09:00:00") == 4
+    cur.execute.assert_called_once_with(MATCH_ALERTS_SQL, ("2026-01-01 09:00:00",))
+
+
+def test_match_sql_is_scoped_to_the_sync_and_deduplicated():
+    """Only listings priced since the sync began are matched; re-runs add nothing."""
+    assert "FROM car_price_history WHERE observed_at >= %s" in MATCH_ALERTS_SQL
+    assert "@@ candidates.query" in MATCH_ALERTS_SQL
+    assert "ON CONFLICT (alert_id, car_id, price_cents) DO NOTHING" in MATCH_ALERTS_SQL
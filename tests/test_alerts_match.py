@@ -0,0 +1,111 @@
+"""
+Runs the alert matcher against PostgreSQL and checks the outbox rows.
+
+Needs a PostgreSQL server: set TEST_DATABASE_URL (skipped otherwise).
+Everything happens in session-local temp tables, so any database works.
+"""
+
+import os
+
+import pytest
+
+from scraper.src.alerts import match_alerts
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+SYNC_STARTED = "2026-01-02 00:00:00"
+BEFORE_SYNC = "2026-01-01 12:00:00"
+IN_SYNC = "2026-01-02 00:05:00"
+
+# (id, title, price_cents, observed_at of its latest price)
+CARS = (
+    (1, "2019 Honda Civic EX", 1_500_000, IN_SYNC),
+    (2, "2018 Honda Civic LX", 2_200_000, IN_SYNC),
+    (3, "2020 Toyota Corolla LE", 1_400_000, IN_SYNC),
+    (4, "2017 Honda Civic Si", 1_200_000, BEFORE_SYNC),  # not touched by this sync
+)
+
+# (id, keyword, target_price in dollars)
+ALERTS = (
+    (1, "honda civic", 16_000),
+    (2, "civic", 25_000),
+    (3, "Civic", 13_000),  # same query as alert 2, but only car 4 is cheap enough
+    (4, "civic hybrid", 30_000),  # no listing has "hybrid"
+    (5, "corolla", 10_000),
+    (6, None, 99_000),
+)
+
+
+@pytest.fixture
+def cur():
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE cars (id INTEGER PRIMARY KEY, title TEXT, price_cents INTEGER);")
+    cur.execute("""
+        CREATE TEMP TABLE car_price_history (
+            listing_id INTEGER NOT NULL REFERENCES cars (id),
+            observed_at TIMESTAMP NOT NULL,
+            price_cents INTEGER NOT NULL,
+            PRIMARY KEY (listing_id, observed_at)
+        );
+    """)
+    cur.execute("""
+        CREATE TEMP TABLE price_alerts (
+            id INTEGER PRIMARY KEY,
+            target_price INTEGER NOT NULL,
+            keyword TEXT,
+            query tsquery GENERATED ALWAYS AS (plainto_tsquery('english', keyword)) STORED
+        );
+    """)
+    cur.execute("""
+        CREATE TEMP TABLE alert_matches (
+            id BIGSERIAL PRIMARY KEY,
+            alert_id INTEGER NOT NULL REFERENCES price_alerts (id),
+            car_id INTEGER NOT NULL REFERENCES cars (id),
+            price_cents INTEGER NOT NULL,
+            UNIQUE (alert_id, car_id, price_cents)
+        );
+    """)
+    cur.executemany("INSERT INTO cars VALUES (%s, %s, %s);", [c[:3] for c in CARS])
+    cur.executemany(
+        "INSERT INTO car_price_history VALUES (%s, %s, %s);",
+        [(car_id, observed_at, price) for car_id, _, price, observed_at in CARS],
+    )
+    cur.executemany("INSERT INTO price_alerts (id, keyword, target_price) VALUES (%s, %s, %s);", ALERTS)
+    yield cur
+    conn.close()
+
+
+def _matches(cur):
+    cur.execute("SELECT alert_id, car_id, price_cents FROM alert_matches ORDER BY 1, 2, 3;")
+    return cur.fetchall()
+
+
+def test_sync_queues_one_row_per_alert_and_listing_at_or_below_target(cur):
+    assert match_alerts(cur, SYNC_STARTED) == 3
+    assert _matches(cur) == [
+        (1, 1, 1_500_000),
+        (2, 1, 1_500_000),
+        (2, 2, 2_200_000),
+    ]
+
+
+def test_rerunning_the_matcher_queues_nothing(cur):
+    match_alerts(cur, SYNC_STARTED)
+    assert match_alerts(cur, SYNC_STARTED) == 0
+    assert len(_matches(cur)) == 3
+
+
+def test_price_drop_matches_again_at_the_new_price(cur):
+    match_alerts(cur, SYNC_STARTED)
+    cur.execute("UPDATE cars SET price_cents = 1250000 WHERE id = 1;")
+    cur.execute("INSERT INTO car_price_history VALUES (1, '2026-01-03 00:05:00', 1250000);")
+    assert match_alerts(cur, "2026-01-03 00:00:00") == 3
+    assert [m for m in _matches(cur) if m[2] == 1_250_000] == [
+        (1, 1, 1_250_000),
+        (2, 1, 1_250_000),
+        (3, 1, 1_250_000),
+    ]
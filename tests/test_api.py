@@ -9,36 +9,82 @@ Tests cover:
     - POST /alert (success, validation, rate limiting)
 """
 
+import asyncpg
 import pytest
-from unittest.mock import patch, MagicMock
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from scraper.src.api import app, _alert_timestamps
+from scraper.src.cache import ResponseCache
+from scraper.src.model import fit_pricing_model
+from scraper.src.normalize import parse_title
+from scraper.src.queries import decode_cursor, encode_cursor
 
 client = TestClient(app)
 
 # ─── Test Data ────────────────────────────────────────────────────────────────
 
 SAMPLE_ROWS = [
-    (1, "2019 Honda Civic", "$15,000", "80,000 km", "https://example.com/1"),
-    (2, "2020 Toyota Corolla", "$18,500", "45,000 km", "https://example.com/2"),
-    (3, "2018 Ford F-150", "$32,000", "110,000 km", "https://example.com/3"),
-    (4, "2021 Mazda CX-5", "$27,000", "30,000 km", "https://example.com/4"),
-    (5, "2017 Hyundai Elantra", "$11,000", "140,000 km", "https://example.com/5"),
-    (6, "2022 Kia Sportage", "$29,500", "20,000 km", "https://example.com/6"),
+    (1, "2019 Honda Civic", "$15,000", "80,000 km", "https://example.com/1", 1_500_000, 80_000),
+    (2, "2020 Toyota Corolla", "$18,500", "45,000 km", "https://example.com/2", 1_850_000, 45_000),
+    (3, "2018 Ford F-150", "$32,000", "110,000 km", "https://example.com/3", 3_200_000, 110_000),
+    (4, "2021 Mazda CX-5", "$27,000", "30,000 km", "https://example.com/4", 2_700_000, 30_000),
+    (5, "2017 Hyundai Elantra", "$11,000", "140,000 km", "https://example.com/5", 1_100_000, 140_000),
+    (6, "2022 Kia Sportage", "$29,500", "20,000 km", "https://example.com/6", 2_950_000, 20_000),
 ]
 
 
+SAMPLE_MODEL = fit_pricing_model(
+    [(r[5], r[6], *parse_title(r[1])) for r in SAMPLE_ROWS], data_version=1
+)
+
+
+@pytest.fixture(autouse=True)
+def _pricing_model():
+    """Serve a pre-fitted model instead of hitting the registry's DB lookup."""
+    with patch("scraper.src.api.registry.get", return_value=SAMPLE_MODEL) as mock_get:
+        yield mock_get
+
+
+def _listing_rows(rows=None, total=None, rating=("FAIR PRICE", "gray")):
+    """Attach the stored deal rating, created_at, title features and COUNT(*) OVER () total."""
+    if rows is None:
+        rows = SAMPLE_ROWS
+    if total is None:
+        total = len(rows)
+    return [r + rating + (datetime(2026, 1, 10 - r[0], 12, 0), *parse_title(r[1]), total) for r in rows]
+
+
+def _keyset_rows(rows):
+    """Keyset pages carry no total column."""
+    return [r[:-1] for r in _listing_rows(rows)]
+
+
 def _make_mock_db(rows=None):
     """Create a mock database connection that returns specified rows."""
     if rows is None:
         rows = SAMPLE_ROWS
     mock_conn = MagicMock()
+    mock_conn.__enter__.return_value = mock_conn
     mock_cur = MagicMock()
     mock_cur.fetchall.return_value = rows
     mock_conn.cursor.return_value = mock_cur
     return mock_conn
 
 
+def _make_async_db(rows=None):
+    """Create a mock async (get_adb) connection whose fetch returns specified rows."""
+    if rows is None:
+        rows = SAMPLE_ROWS
+    mock_conn = MagicMock()
+    mock_conn.__aenter__.return_value = mock_conn
+    mock_conn.fetch = AsyncMock(return_value=rows)
+    mock_conn.fetchrow = AsyncMock()
+    mock_conn.execute = AsyncMock()
+    return mock_conn
+
+
 # ─── Root / Health Check ─────────────────────────────────────────────────────
 
 
@@ -62,6 +108,8 @@ def test_health_endpoint_returns_diagnostics():
     assert "uptime_seconds" in body
     assert isinstance(body["uptime_seconds"], int)
     assert body["uptime_seconds"] >= 0
+    assert "db_pool" in body
+    assert "db_pool_async" in body
 
 
 # ─── GET /cars ────────────────────────────────────────────────────────────────
@@ -69,7 +117,7 @@ def test_health_endpoint_returns_diagnostics():
 
 def test_get_cars_returns_paginated_response():
     """GET /cars should return cars list with pagination metadata."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
         response = client.get("/cars")
     assert response.status_code == 200
     body = response.json()
@@ -82,28 +130,101 @@ def test_get_cars_returns_paginated_response():
 
 def test_get_cars_has_deal_rating():
     """Every car should have deal_rating and deal_color fields."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
         response = client.get("/cars")
     body = response.json()
     for car in body["cars"]:
         assert "deal_rating" in car, f"Car {car.get('title')} missing deal_rating"
         assert "deal_color" in car, f"Car {car.get('title')} missing deal_color"
+        assert car["deal_rating"] != "N/A"
+
+
+def test_get_cars_uses_stored_ratings(_pricing_model):
+    """Precomputed ratings should be returned without touching the model."""
+    rows = _listing_rows(rating=("GREAT DEAL", "green"))
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(rows)):
+        response = client.get("/cars")
+    assert {c["deal_rating"] for c in response.json()["cars"]} == {"GREAT DEAL"}
+    _pricing_model.assert_not_called()
+
+
+def test_get_cars_rates_unscored_rows(_pricing_model):
+    """Rows not yet scored should be rated on the fly by the cached model."""
+    rows = _listing_rows(SAMPLE_ROWS[:1], total=2) + _listing_rows(SAMPLE_ROWS[1:2], total=2, rating=(None, None))
+    # Rating runs in the threadpool on a psycopg2 connection (for the registry)
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(rows)), \
+            patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+        response = client.get("/cars")
+    cars = response.json()["cars"]
+    assert cars[0]["deal_rating"] == "FAIR PRICE"
+    assert cars[1]["deal_rating"] not in (None, "N/A")
+    _pricing_model.assert_called_once()
+
+
+def test_get_cars_without_model_marks_na(_pricing_model):
+    """With too little data to train, unscored cars should be rated N/A."""
+    _pricing_model.return_value = None
+    rows = _listing_rows(rating=(None, None))
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(rows)), \
+            patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+        response = client.get("/cars")
+    assert {c["deal_rating"] for c in response.json()["cars"]} == {"N/A"}
+
+
+def test_get_cars_deal_filter_and_sort():
+    """deal/sort should map to the indexed deal_rating and margin columns."""
+    mock_db = _make_async_db(_listing_rows(rating=("GREAT DEAL", "green")))
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.get("/cars?deal=great%20deal&sort=deal")
+    assert response.status_code == 200
+    sql, params = mock_db.fetch.call_args[0]
+    assert "deal_rating = %s" in sql and "GREAT DEAL" in params
+    assert "ORDER BY (fair_price_cents - price_cents) DESC" in sql
+
+
+def test_get_cars_rejects_unknown_deal_or_sort():
+    """Unknown deal ratings or sort modes should return 422."""
+    assert client.get("/cars?deal=steal").status_code == 422
+    assert client.get("/cars?sort=random").status_code == 422
 
 
 def test_get_cars_keyword_filter():
-    """Keyword filter should only return matching cars."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    """Keyword filter should be pushed into SQL as an indexed full-text match."""
+    civics = _listing_rows([r for r in SAMPLE_ROWS if "civic" in r[1].lower()])
+    mock_db = _make_async_db(civics)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/cars?keyword=civic")
     body = response.json()
+    sql, params = mock_db.fetch.call_args[0]
+    assert "@@ websearch_to_tsquery('english', %s)" in sql
+    assert "civic" in params
+    assert body["total"] == 1
+    assert body["search"] == "fulltext"
     assert all(
         "civic" in c["title"].lower()
         for c in body["cars"]
     ), "Keyword filter should only return matching titles"
 
 
+def test_get_cars_keyword_fragment_falls_back_to_substring():
+    """A fragment with no whole-word match is retried as a substring search."""
+    civics = _listing_rows([r for r in SAMPLE_ROWS if "civic" in r[1].lower()])
+    mock_db = _make_async_db()
+    mock_db.fetch.side_effect = [[], civics]
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.get("/cars?keyword=civ")
+    body = response.json()
+    calls = mock_db.fetch.call_args_list
+    assert "@@" in calls[0][0][0]
+    sql, params = calls[1][0]
+    assert "title ILIKE %s" in sql and "%civ%" in params
+    assert body["search"] == "partial"
+    assert body["total"] == 1
+
+
 def test_get_cars_keyword_filter_no_match():
     """Keyword filter with no matches should return empty list."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(rows=[])):
         response = client.get("/cars?keyword=lamborghini")
     body = response.json()
     assert body["cars"] == []
@@ -111,9 +232,12 @@ def test_get_cars_keyword_filter_no_match():
 
 
 def test_get_cars_price_filter_max():
-    """Max price filter should exclude expensive cars."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    """Max price filter should be applied as a SQL upper bound."""
+    mock_db = _make_async_db(_listing_rows(SAMPLE_ROWS[:2]))
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/cars?max_price=20000")
+    sql, params = mock_db.fetch.call_args[0]
+    assert "price_cents <= %s" in sql and 2_000_000 in params
     body = response.json()
     for car in body["cars"]:
         price = int(car["price"].replace("$", "").replace(",", ""))
@@ -121,9 +245,12 @@ def test_get_cars_price_filter_max():
 
 
 def test_get_cars_price_filter_min():
-    """Min price filter should exclude cheap cars."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    """Min price filter should be applied as a SQL lower bound."""
+    mock_db = _make_async_db(_listing_rows([SAMPLE_ROWS[2], SAMPLE_ROWS[3], SAMPLE_ROWS[5]]))
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/cars?min_price=25000")
+    sql, params = mock_db.fetch.call_args[0]
+    assert "price_cents >= %s" in sql and 2_500_000 in params
     body = response.json()
     for car in body["cars"]:
         price = int(car["price"].replace("$", "").replace(",", ""))
@@ -131,42 +258,128 @@ def test_get_cars_price_filter_min():
 
 
 def test_get_cars_pagination():
-    """Pagination should limit results per page."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    """Pagination should be applied in SQL via LIMIT/OFFSET."""
+    mock_db = _make_async_db(_listing_rows(SAMPLE_ROWS[:2], total=6))
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/cars?page=1&limit=2")
     body = response.json()
+    sql, params = mock_db.fetch.call_args[0]
+    assert "LIMIT %s OFFSET %s" in sql
+    assert params[-2:] == [2, 0]
     assert len(body["cars"]) <= 2
+    assert body["total"] == 6
     assert body["page"] == 1
     assert body["limit"] == 2
 
 
 def test_get_cars_pagination_page_2():
-    """Page 2 should return different results than page 1."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    """Page 2 should request the next offset and return different results."""
+    db1 = _make_async_db(_listing_rows(SAMPLE_ROWS[:2], total=6))
+    db2 = _make_async_db(_listing_rows(SAMPLE_ROWS[2:4], total=6))
+    with patch("scraper.src.api.get_adb", side_effect=[db1, db2]):
         r1 = client.get("/cars?page=1&limit=2")
         r2 = client.get("/cars?page=2&limit=2")
+    _, params = db2.fetch.call_args[0]
+    assert params[-2:] == [2, 2]
     page1_ids = [c["id"] for c in r1.json()["cars"]]
     page2_ids = [c["id"] for c in r2.json()["cars"]]
     assert page1_ids != page2_ids, "Page 2 should have different cars than page 1"
 
 
+def test_get_cars_page_past_end_reports_total():
+    """A page past the end should fall back to a COUNT(*) for the total."""
+    mock_db = _make_async_db(rows=[])
+    mock_db.fetchrow.return_value = (6,)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.get("/cars?page=10&limit=2")
+    body = response.json()
+    assert body["cars"] == []
+    assert body["total"] == 6
+
+
+def test_get_cars_newest_returns_next_cursor():
+    """A page with more rows after it hands out a cursor to the next one."""
+    mock_db = _make_async_db(_listing_rows(SAMPLE_ROWS[:2], total=6))
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        body = client.get("/cars?limit=2").json()
+    assert decode_cursor(body["next_cursor"]) == ((datetime(2026, 1, 8, 12, 0), 2), False)
+
+
+def test_get_cars_last_page_has_no_cursor():
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
+        body = client.get("/cars").json()
+    assert body["next_cursor"] is None
+
+
+def test_get_cars_cursor_uses_keyset_without_count():
+    """A cursor page seeks past the cursor row and skips the total count."""
+    mock_db = _make_async_db(_keyset_rows(SAMPLE_ROWS[2:5]))
+    token = encode_cursor(datetime(2026, 1, 8, 12, 0), 2)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.get(f"/cars?limit=2&cursor={token}")
+    assert response.status_code == 200
+    body = response.json()
+    mock_db.fetch.assert_called_once()
+    sql, params = mock_db.fetch.call_args[0]
+    assert "(created_at, id) < (%s::timestamp, %s)" in sql
+    assert "OFFSET" not in sql and "COUNT" not in sql
+    assert params[-3:] == [datetime(2026, 1, 8, 12, 0), 2, 3]
+    assert [c["id"] for c in body["cars"]] == [3, 4]
+    assert "total" not in body
+    assert decode_cursor(body["next_cursor"]) == ((datetime(2026, 1, 6, 12, 0), 4), False)
+
+
+def test_get_cars_cursor_with_total():
+    mock_db = _make_async_db(_keyset_rows(SAMPLE_ROWS[4:]))
+    mock_db.fetchrow.return_value = (6,)
+    token = encode_cursor(datetime(2026, 1, 6, 12, 0), 4)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        body = client.get(f"/cars?limit=2&cursor={token}&with_total=true").json()
+    assert body["total"] == 6
+    assert body["next_cursor"] is None
+
+
+def test_get_cars_cursor_keeps_partial_search():
+    """A cursor from a substring-fallback page stays a substring search."""
+    mock_db = _make_async_db([])
+    token = encode_cursor(datetime(2026, 1, 9, 12, 0), 1, partial=True)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        body = client.get(f"/cars?keyword=civ&cursor={token}").json()
+    sql, params = mock_db.fetch.call_args[0]
+    assert "title ILIKE %s" in sql and "%civ%" in params
+    assert body["search"] == "partial"
+
+
+def test_get_cars_invalid_cursor():
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
+        response = client.get("/cars?cursor=not-a-cursor")
+    assert response.status_code == 422
+
+
+def test_get_cars_cursor_requires_newest_sort():
+    token = encode_cursor(datetime(2026, 1, 8, 12, 0), 2)
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
+        response = client.get(f"/cars?sort=deal&cursor={token}")
+    assert response.status_code == 422
+
+
 def test_get_cars_invalid_page_zero():
     """Page 0 should return 422 validation error."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
         response = client.get("/cars?page=0")
     assert response.status_code == 422
 
 
 def test_get_cars_limit_too_large():
     """Limit > 100 should return 422 validation error."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
         response = client.get("/cars?limit=9999")
     assert response.status_code == 422
 
 
 def test_get_cars_empty_db():
     """Empty database should return empty list with total 0."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db(rows=[])):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(rows=[])):
         response = client.get("/cars")
     body = response.json()
     assert body["cars"] == []
@@ -175,13 +388,16 @@ def test_get_cars_empty_db():
 
 # ─── GET /stats ───────────────────────────────────────────────────────────────
 
-# Stats endpoint receives (price, mileage) tuples
-STATS_ROWS = [(r[2], r[3]) for r in SAMPLE_ROWS]
+# Stats endpoint reads one pre-aggregated row from the market_stats view:
+# (total_listings, avg_price, median_price, avg_mileage, min_price, max_price)
+STATS_ROW = (6, Decimal("22166.67"), Decimal("22750.00"), Decimal("70833.33"), 11000, 32000)
 
 
 def test_get_stats_returns_summary():
     """GET /stats should return aggregate market analytics."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db(rows=STATS_ROWS)):
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/stats")
     assert response.status_code == 200
     body = response.json()
@@ -190,27 +406,240 @@ def test_get_stats_returns_summary():
     assert "median_price" in body
     assert "avg_mileage" in body
     assert "price_range" in body
-    assert body["total_listings"] == len(STATS_ROWS)
+    assert body["total_listings"] == 6
     assert body["avg_price"] > 0
     assert body["median_price"] > 0
+    assert body["price_range"] == {"min": 11000, "max": 32000}
+
+
+def test_get_stats_reads_materialized_view():
+    """Stats should be a single-row read of market_stats, not a table scan."""
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        client.get("/stats")
+    sql = mock_db.fetchrow.call_args[0][0]
+    assert "FROM market_stats" in sql
+    mock_db.fetch.assert_not_called()
 
 
 def test_get_stats_empty_db():
     """Empty database should return zeroed stats."""
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db(rows=[])):
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = (0, None, None, None, None, None)
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
         response = client.get("/stats")
     body = response.json()
     assert body["total_listings"] == 0
     assert body["avg_price"] is None
 
 
+# ─── Response cache ──────────────────────────────────────────────────────────
+
+
+@pytest.fixture
+def cache_enabled():
+    """A fresh response cache, serving as if the sync listener were connected."""
+    cache = ResponseCache()
+    cache.enable()
+    with patch("scraper.src.api.response_cache", cache):
+        yield cache
+
+
+def test_get_cars_repeat_is_served_from_cache(cache_enabled):
+    """Equivalent queries after the first one never reach the database."""
+    mock_db = _make_async_db(_listing_rows())
+    with patch("scraper.src.api.get_adb", return_value=mock_db) as get_adb:
+        first = client.get("/cars?keyword=Honda%20Civic")
+        second = client.get("/cars?keyword=%20honda%20%20civic")
+    assert get_adb.call_count == 1
+    assert second.json() == first.json()
+    assert cache_enabled.stats()["hits"] == 1
+
+
+def test_get_cars_cache_keys_on_query_params(cache_enabled):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())) as get_adb:
+        client.get("/cars?page=1")
+        client.get("/cars?page=2")
+        client.get("/cars?page=1&max_price=20000")
+    assert get_adb.call_count == 3
+
+
+def test_get_stats_cache_is_cleared_by_a_sync(cache_enabled):
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.get_adb", return_value=mock_db) as get_adb:
+        client.get("/stats")
+        client.get("/stats")
+        cache_enabled.invalidate("3")
+        client.get("/stats")
+    assert get_adb.call_count == 2
+
+
+def test_errors_are_not_cached(cache_enabled):
+    client.get("/cars?sort=cheapest")
+    assert cache_enabled.stats()["entries"] == 0
+
+
+def test_health_reports_cache_counters(cache_enabled):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
+        client.get("/cars")
+        client.get("/cars")
+        stats = client.get("/health").json()["response_cache"]
+    assert stats["enabled"] is True
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert {"entries", "bytes", "evictions", "expired", "invalidations"} <= set(stats)
+
+
+# ─── Conditional requests ────────────────────────────────────────────────────
+
+
+@pytest.fixture
+def listening_cache():
+    """A response cache that knows the data stamp, as with a connected listener."""
+    cache = ResponseCache()
+    cache.enable("7.1")
+    with patch("scraper.src.api.response_cache", cache):
+        yield cache
+
+
+def test_get_cars_sends_etag_and_cache_control(listening_cache):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
+        response = client.get("/cars?keyword=civic")
+    assert response.headers["etag"].startswith('"')
+    assert "must-revalidate" in response.headers["cache-control"]
+
+
+def test_get_cars_if_none_match_returns_304_without_db_or_model(listening_cache, _pricing_model):
+    """A revalidation at the same data stamp never reaches the handler's work."""
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
+        etag = client.get("/cars?keyword=civic").headers["etag"]
+    listening_cache.disable()
+    listening_cache.enable("7.1")  # empty cache: a 200 would have to hit the DB
+    _pricing_model.reset_mock()
+    with patch("scraper.src.api.get_adb") as get_adb, \
+            patch("scraper.src.api._listings_page") as build:
+        response = client.get("/cars?keyword=%20Civic", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    get_adb.assert_not_called()
+    build.assert_not_called()
+    _pricing_model.assert_not_called()
+
+
+def test_etag_changes_with_params_and_data_stamp(listening_cache):
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        stats_etag = client.get("/stats").headers["etag"]
+        # Re-scoring within data version 7 still advances the stamp
+        listening_cache.invalidate("7.2")
+        response = client.get("/stats", headers={"If-None-Match": stats_etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != stats_etag
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db(_listing_rows())):
+        page1 = client.get("/cars?page=1").headers["etag"]
+        page2 = client.get("/cars?page=2").headers["etag"]
+    assert page1 != page2
+
+
+def test_etags_work_with_the_response_cache_turned_off():
+    """API_CACHE_MAX_ENTRIES=0 stores no bodies, but revalidation still gets 304s."""
+    cache = ResponseCache(max_entries=0)
+    cache.enable("7.1")
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.response_cache", cache), \
+            patch("scraper.src.api.get_adb", return_value=mock_db):
+        etag = client.get("/stats").headers["etag"]
+        assert client.get("/stats").status_code == 200
+        response = client.get("/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert mock_db.fetchrow.await_count == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_no_etag_without_a_known_data_stamp():
+    """Without the sync listener the stamp is unknown, so nothing is promised."""
+    mock_db = _make_async_db()
+    mock_db.fetchrow.return_value = STATS_ROW
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.get("/stats", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert "cache-control" in response.headers
+
+
+def test_page_rated_on_the_fly_is_neither_tagged_nor_cached(listening_cache):
+    """Unscored rows are rated by this worker's model, so the body is not fixed by the stamp."""
+    rows = _listing_rows(SAMPLE_ROWS[:1], total=2) + _listing_rows(SAMPLE_ROWS[1:2], total=2, rating=(None, None))
+    mock_db = _make_async_db(rows)
+    with patch("scraper.src.api.get_adb", return_value=mock_db), \
+            patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+        first = client.get("/cars")
+        second = client.get("/cars")
+    assert first.status_code == second.status_code == 200
+    assert "etag" not in first.headers
+    assert mock_db.fetch.await_count == 2
+    assert listening_cache.stats()["entries"] == 0
+
+
+# ─── Price history / drops ───────────────────────────────────────────────────
+
+
+def test_get_price_history_returns_series():
+    mock_db = _make_mock_db([
+        (datetime(2026, 1, 1), 1_500_000),
+        (datetime(2026, 1, 8), 1_350_000),
+    ])
+    mock_db.cursor.return_value.fetchone.return_value = ("2018 Honda Civic", "https://a/1")
+    with patch("scraper.src.api.get_db", return_value=mock_db):
+        response = client.get("/cars/7/price-history")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["title"] == "2018 Honda Civic"
+    assert body["history"] == [
+        {"observed_at": "2026-01-01T00:00:00", "price": 15000.0},
+        {"observed_at": "2026-01-08T00:00:00", "price": 13500.0},
+    ]
+
+
+def test_get_price_history_unknown_listing():
+    mock_db = _make_mock_db()
+    mock_db.cursor.return_value.fetchone.return_value = None
+    with patch("scraper.src.api.get_db", return_value=mock_db):
+        response = client.get("/cars/999/price-history")
+    assert response.status_code == 404
+
+
+def test_get_price_drops():
+    row = (7, "2018 Honda Civic", "https://a/1", 50000, 1_500_000, 1_350_000,
+           datetime(2026, 1, 8), 150_000)
+    mock_db = _make_mock_db([row])
+    with patch("scraper.src.api.get_db", return_value=mock_db):
+        response = client.get("/price-drops?days=14&limit=5")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["days"] == 14
+    assert body["drops"][0]["old_price"] == 15000.0
+    assert body["drops"][0]["drop"] == 1500.0
+    assert body["drops"][0]["drop_pct"] == 10.0
+    assert mock_db.cursor.return_value.execute.call_args[0][1] == [14, 5]
+
+
+def test_get_price_drops_rejects_bad_window():
+    response = client.get("/price-drops?days=0")
+    assert response.status_code == 422
+
+
 # ─── POST /alert ──────────────────────────────────────────────────────────────
 
 
 def test_alert_creation_success():
     """Valid alert should return 201."""
     _alert_timestamps.clear()
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
         response = client.post(
             "/alert",
             json={"email": "test@example.com", "target_price": 15000, "keyword": "Civic"},
@@ -219,6 +648,23 @@ def test_alert_creation_success():
     assert response.json()["status"] == "success"
 
 
+def test_alert_database_error_returns_500():
+    """A failed insert should surface as a 500, not leak the driver error."""
+    _alert_timestamps.clear()
+    mock_db = _make_async_db()
+    mock_db.execute.side_effect = asyncpg.PostgresError("boom")
+    with patch("scraper.src.api.get_adb", return_value=mock_db):
+        response = client.post(
+            "/alert",
+            json={"email": "test@example.com", "target_price": 15000, "keyword": "Civic"},
+        )
+    assert response.status_code == 500
+    sql, params = mock_db.execute.call_args[0]
+    assert "INSERT INTO price_alerts" in sql
+    assert params == ("test@example.com", 15000, "Civic")
+    _alert_timestamps.clear()
+
+
 def test_alert_rejects_invalid_email():
     """Invalid email should return 422."""
     response = client.post(
@@ -268,7 +714,7 @@ def test_alert_rate_limiting():
     """6th request from same IP within 1 hour should get 429."""
     _alert_timestamps.clear()
 
-    with patch("scraper.src.api.get_db", return_value=_make_mock_db()):
+    with patch("scraper.src.api.get_adb", return_value=_make_async_db()):
         # Send 5 valid requests
         for _ in range(5):
             r = client.post(
@@ -0,0 +1,134 @@
+"""
+Tests for the API response cache and its sync listener.
+
+The listener test needs a PostgreSQL server: set TEST_DATABASE_URL
+(skipped otherwise).
+"""
+
+import os
+import time
+
+import pytest
+
+from scraper.src.cache import ResponseCache, SyncListener
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(**options):
+    cache = ResponseCache(**{"max_entries": 3, "max_bytes": 100, "ttl": 60, **options})
+    cache.enable()
+    return cache
+
+
+def test_disabled_cache_never_serves():
+    cache = ResponseCache()
+    cache.put("a", b"1", cache.generation)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_hit_and_miss_counters():
+    cache = _cache()
+    assert cache.get("a") is None
+    cache.put("a", b"1", cache.generation)
+    assert cache.get("a") == b"1"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_evicts_least_recently_used():
+    cache = _cache()
+    for key in "abc":
+        cache.put(key, b"1", cache.generation)
+    cache.get("a")
+    cache.put("d", b"1", cache.generation)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_bound_evicts_and_skips_oversized_bodies():
+    cache = _cache(max_bytes=10)
+    cache.put("a", b"x" * 6, cache.generation)
+    cache.put("b", b"x" * 6, cache.generation)
+    assert cache.get("a") is None
+    cache.put("c", b"x" * 11, cache.generation)
+    assert cache.get("c") is None
+    assert cache.stats()["bytes"] == 6
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = _cache(clock=clock)
+    cache.put("a", b"1", cache.generation)
+    clock.now = 61
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_invalidate_drops_entries_and_late_puts():
+    """A response computed before a sync committed must not be stored after it."""
+    cache = _cache()
+    cache.put("a", b"1", cache.generation)
+    generation = cache.generation
+    cache.invalidate("7")
+    cache.put("b", b"stale", generation)
+    assert cache.get("a") is None and cache.get("b") is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["data_stamp"] == "7"
+
+
+def test_zero_entry_cache_stores_nothing_but_keeps_the_stamp():
+    cache = ResponseCache(max_entries=0)
+    cache.enable("7.1")
+    cache.put("a", b"1", cache.generation)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["enabled"] is False
+    assert stats["evictions"] == stats["misses"] == 0
+    assert cache.data_stamp == "7.1"
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+def test_listener_invalidates_on_committed_notify(monkeypatch):
+    import psycopg2
+
+    from scraper.src.db import get_data_stamp, init_db, notify_data_change
+
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    init_db()
+    cache = ResponseCache()
+    listener = SyncListener(TEST_DATABASE_URL, cache, poll_interval=0.05)
+    listener.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not cache.stats()["enabled"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cache.put("a", b"1", cache.generation)
+
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+        assert cache.stats()["data_stamp"] == get_data_stamp(conn.cursor())
+        stamp = notify_data_change(conn.cursor())
+        time.sleep(0.2)
+        assert cache.get("a") == b"1", "not delivered before commit"
+        conn.commit()
+        conn.close()
+
+        deadline = time.monotonic() + 5
+        while cache.stats()["data_stamp"] != stamp and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert cache.get("a") is None
+    finally:
+        listener.stop()
+    assert not cache.stats()["enabled"]
@@ -0,0 +1,167 @@
+"""
+Tests for the concurrent crawl against the local fixture server.
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from scraper.src.crawl import Crawler, RateLimiter, run_crawl
+from scraper.src.main import DedupWriter, JSONSink, page_url
+
+
+class FixtureDriver:
+    """
+    Stand-in for a Chrome driver that loads pages from the fixture server.
+
+    Like a real browser it gets past the server's challenge, and exposes
+    the cookie that did so.
+    """
+
+    def __init__(self, server, fail_first=0):
+        self.base = server.url
+        self.cookie = server.challenge_cookie
+        self.fail_first = fail_first
+        self.page_source = ""
+        self.quit_called = False
+
+    def get(self, url):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise RuntimeError("chrome not reachable")
+        query = urllib.parse.urlsplit(url).query
+        request = urllib.request.Request(
+            f"{self.base}?{query}", headers={"Cookie": self.cookie}
+        )
+        try:
+            with urllib.request.urlopen(request) as resp:
+                self.page_source = resp.read().decode()
+        except urllib.error.HTTPError as e:
+            # A browser renders error pages rather than raising
+            self.page_source = e.read().decode()
+
+    def get_cookies(self):
+        name, value = self.cookie.split("=")
+        return [{"name": name, "value": value, "domain": "127.0.0.1", "path": "/"}]
+
+    def execute_script(self, script):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def _crawler(server, drivers, broken_drivers=0):
+    """Crawler whose first ``broken_drivers`` browsers fail every page load."""
+    def factory():
+        driver = FixtureDriver(server, fail_first=len(drivers) < broken_drivers)
+        drivers.append(driver)
+        return driver
+
+    return Crawler(factory, workers=3, min_interval=0, backoff=0, page_timeout=0)
+
+
+def test_page_url_sets_offset_and_keeps_filters():
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(page_url(30)).query)
+    assert query["rcs"] == ["30"]
+    assert query["rcp"] == ["15"]
+    assert query["loc"] == ["Sudbury"]
+
+
+def test_crawl_merges_pages_into_one_deduplicated_stream(fixture_server, tmp_path):
+    drivers = []
+    crawler = _crawler(fixture_server, drivers)
+    sink = JSONSink(str(tmp_path / "cars.json"))
+    stats = crawler.run([page_url(offset) for offset in (0, 15, 30)], DedupWriter(sink))
+    crawler.close()
+
+    # Seven distinct cars; the Civic is listed on two pages
+    assert stats["pages"] == 3 and stats["failed"] == 0
+    assert stats["new"] == sink.count == 7
+    assert len(drivers) <= 3
+    assert all(d.quit_called for d in drivers)
+
+
+def test_crawl_retries_page_with_fresh_driver(fixture_server, tmp_path):
+    drivers = []
+    crawler = _crawler(fixture_server, drivers, broken_drivers=1)
+    crawler.workers = 1
+    stats = crawler.run([page_url(0)], DedupWriter(JSONSink(str(tmp_path / "c.json"))))
+
+    assert stats["pages"] == 1 and stats["new"] == 3
+    assert len(drivers) == 2 and drivers[0].quit_called
+
+
+def test_crawl_gives_up_after_retries(fixture_server, tmp_path):
+    crawler = _crawler(fixture_server, [], broken_drivers=5)
+    crawler.retries = 1
+    stats = crawler.run([page_url(0)], DedupWriter(JSONSink(str(tmp_path / "c.json"))))
+    assert stats == {
+        "pages": 0, "failed": 1, "unchanged": 0, "listings": 0, "new": 0, "fallbacks": 0,
+    }
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = RateLimiter(0.05)
+    stamps = []
+
+    def call():
+        limiter.wait()
+        stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stamps.sort()
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert min(gaps) == pytest.approx(0.05, abs=0.02)
+
+
+def test_run_crawl_writes_ndjson(fixture_server, tmp_path):
+    path = tmp_path / "cars.ndjson"
+    stats = run_crawl(
+        4, workers=2, driver_factory=lambda: FixtureDriver(fixture_server),
+        output_file=str(path), min_interval=0, page_timeout=0,
+    )
+    # The fourth page is past the end of the fixtures (404 → no cards)
+    assert stats["pages"] == 4
+    lines = path.read_text().splitlines()
+    assert len(lines) == 7
+    assert {"title", "price", "mileage", "link"} <= set(json.loads(lines[0]))
+    assert (tmp_path / "cars.ndjson.done").exists()
+
+
+def test_http_crawl_falls_back_to_browser_on_challenge(fixture_server, tmp_path):
+    """Only the challenged page needs a browser; its cookie unlocks the rest."""
+    fixture_server.challenged.update({"0", "15", "30"})
+    drivers = []
+
+    def factory():
+        drivers.append(FixtureDriver(fixture_server))
+        return drivers[-1]
+
+    stats = run_crawl(
+        3, workers=1, driver_factory=factory, output_file=str(tmp_path / "cars.json"),
+        fetch="http", base_url=fixture_server.url, min_interval=0, page_timeout=0,
+    )
+    assert stats["pages"] == 3 and stats["new"] == 7
+    assert stats["fallbacks"] == 1
+    assert len(drivers) == 1
+
+
+def test_http_crawl_needs_no_browser_without_challenge(fixture_server, tmp_path):
+    def factory():
+        raise AssertionError("browser started")
+
+    stats = run_crawl(
+        3, workers=2, driver_factory=factory, output_file=str(tmp_path / "cars.json"),
+        fetch="http", base_url=fixture_server.url, min_interval=0, page_timeout=0,
+    )
+    assert stats["pages"] == 3 and stats["new"] == 7 and stats["fallbacks"] == 0
@@ -0,0 +1,348 @@
+"""
+Tests for bulk and streaming ingest in db.py (database mocked out).
+
+The listing-key tests at the end need a PostgreSQL server: set
+TEST_DATABASE_URL (skipped otherwise). They roll back what they write.
+"""
+
+import json
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from scraper.src.db import (
+    SYNC_CHANNEL,
+    _copy_field,
+    bump_data_version,
+    iter_ndjson,
+    init_db,
+    load_data,
+    migrate_priced_listing_key,
+    notify_data_change,
+    upsert_listings,
+)
+from scraper.src.normalize import listing_key, parse_price_cents
+
+CARS = [
+    {"title": "2019 Honda Civic", "price": "$15,000", "mileage": "80,000 km", "link": "#"},
+    {"title": "2020 Toyota\tCorolla", "price": "N/A", "mileage": "45,000 km", "link": "#"},
+    {"title": "2019 Honda Civic", "price": "$14,500", "mileage": "80,000 km", "link": "#"},
+]
+
+
+def _make_cursor(returning):
+    cur = MagicMock()
+    payloads = []
+    cur.copy_expert.side_effect = lambda sql, buf: payloads.append(buf.read())
+    cur.fetchall.return_value = returning
+    return cur, payloads
+
+
+def test_copy_field_escapes_text_format():
+    """NULLs and control characters must survive COPY text format."""
+    assert _copy_field(None) == "\\N"
+    assert _copy_field(12) == "12"
+    assert _copy_field("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+
+
+def test_upsert_copies_batch_with_typed_columns():
+    """The whole batch should go through one COPY, normalized once."""
+    cur, payloads = _make_cursor([(True,), (True,)])
+    upsert_listings(cur, CARS)
+    assert len(payloads) == 1
+    lines = payloads[0].splitlines()
+    assert len(lines) == 3
+    assert lines[0].split("\t")[-5:] == ["1500000", "80000", "2019", "Honda", "Civic"]
+    assert lines[1].split("\t")[0] == "2020 Toyota\\tCorolla"
+    assert lines[1].split("\t")[-5:] == ["\\N", "45000", "2020", "Toyota", "Corolla"]
+
+
+def test_upsert_counts_inserted_updated_unchanged():
+    """RETURNING (xmax = 0) splits inserts from updates; the rest is unchanged."""
+    cur, _ = _make_cursor([(True,), (False,)])
+    assert upsert_listings(cur, CARS) == (1, 1, 1)
+    upsert_sql = cur.execute.call_args[0][0]
+    assert "ON CONFLICT (listing_key) DO UPDATE" in upsert_sql
+    assert "DISTINCT ON (key)" in upsert_sql
+
+
+def test_upsert_records_price_changes_in_history():
+    """The same statement appends history only for new or re-priced listings."""
+    cur, _ = _make_cursor([(True,)])
+    upsert_listings(cur, CARS[:1])
+    upsert_sql = cur.execute.call_args[0][0]
+    assert "INSERT INTO car_price_history" in upsert_sql
+    assert "p.price_cents IS DISTINCT FROM u.price_cents" in upsert_sql
+
+
+def test_bump_data_version_notifies_listeners():
+    """The version bump announces a new data stamp on SYNC_CHANNEL (delivered on commit)."""
+    cur, _ = _make_cursor([])
+    cur.fetchone.side_effect = [(5,), (5, 12)]
+    assert bump_data_version(cur) == 5
+    assert "change_seq = change_seq + 1" in cur.execute.call_args_list[1][0][0]
+    sql, params = cur.execute.call_args[0]
+    assert "pg_notify" in sql
+    assert params == (SYNC_CHANNEL, "5.12")
+
+
+def test_every_data_change_advances_the_stamp():
+    """Re-scoring within one data version must still yield a new stamp."""
+    cur, _ = _make_cursor([])
+    cur.fetchone.side_effect = [(5, 12), (5, 13)]
+    assert notify_data_change(cur) == "5.12"
+    assert notify_data_change(cur) == "5.13"
+
+
+def test_upsert_empty_batch_is_noop():
+    cur, _ = _make_cursor([])
+    assert upsert_listings(cur, []) == (0, 0, 0)
+    cur.execute.assert_not_called()
+
+
+def _write_ndjson(path, items, trailing=""):
+    path.write_text("".join(json.dumps(i) + "\n" for i in items) + trailing)
+
+
+def test_iter_ndjson_skips_malformed_lines(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS[:2], trailing="{not json}\n")
+    assert list(iter_ndjson(str(path))) == CARS[:2] + [None]
+
+
+def test_iter_ndjson_follow_stops_at_done_marker(tmp_path):
+    """A record finished after the marker check is still drained."""
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS[:1], trailing=json.dumps(CARS[1])[:10])
+
+    def finish_writing(_):
+        with open(path, "a") as f:
+            f.write(json.dumps(CARS[1])[10:] + "\n")
+        (tmp_path / "cars.ndjson.done").touch()
+
+    with patch("scraper.src.db.time.sleep", side_effect=finish_writing):
+        items = list(iter_ndjson(str(path), follow=True, poll_interval=0))
+    assert items == CARS[:2]
+
+
+def _start_scraper_run(path, items):
+    """Open the output the way NDJSONSink does: truncate, then drop the old marker."""
+    _write_ndjson(path, items)
+    done = path.parent / (path.name + ".done")
+    if done.exists():
+        done.unlink()
+
+
+def test_iter_ndjson_follow_waits_out_the_previous_runs_marker(tmp_path):
+    """An old file and .done marker are not mistaken for the run being followed."""
+    path = tmp_path / "cars.ndjson"
+    done = tmp_path / "cars.ndjson.done"
+    _write_ndjson(path, [{"title": "OLD"}])
+    done.touch()
+    os.utime(done, (time.time() - 60, time.time() - 60))
+    polls = []
+
+    def scraper(_):
+        polls.append(1)
+        if len(polls) == 1:
+            _start_scraper_run(path, CARS[:1])
+        else:
+            _write_ndjson(path, CARS[:2])
+            done.touch()
+
+    with patch("scraper.src.db.time.sleep", side_effect=scraper):
+        items = list(iter_ndjson(str(path), follow=True, poll_interval=0))
+    assert items == CARS[:2]
+
+
+def test_iter_ndjson_follow_waits_for_the_file_to_appear(tmp_path):
+    path = tmp_path / "cars.ndjson"
+
+    def scraper(_):
+        if not path.exists():
+            _start_scraper_run(path, CARS[:1])
+        else:
+            (tmp_path / "cars.ndjson.done").touch()
+
+    with patch("scraper.src.db.time.sleep", side_effect=scraper):
+        assert list(iter_ndjson(str(path), follow=True, poll_interval=0)) == CARS[:1]
+
+
+def test_iter_ndjson_follow_restarts_when_a_new_run_truncates_the_file(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS)
+
+    def scraper(_):
+        if not (tmp_path / "cars.ndjson.done").exists():
+            _write_ndjson(path, CARS[:1])
+            (tmp_path / "cars.ndjson.done").touch()
+
+    with patch("scraper.src.db.time.sleep", side_effect=scraper):
+        items = list(iter_ndjson(str(path), follow=True, poll_interval=0))
+    assert items == CARS + CARS[:1]
+
+
+def test_load_data_reports_a_missing_file(tmp_path):
+    with patch("scraper.src.db.get_db") as get_db:
+        load_data(str(tmp_path / "missing.ndjson"))
+    get_db.return_value.close.assert_called_once()
+
+
+def test_load_data_upserts_in_batches(tmp_path):
+    """Each full batch is upserted and committed before the next is read."""
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS + [{"title": "missing fields"}])
+    conn = MagicMock()
+    with patch("scraper.src.db.get_db", return_value=conn), \
+            patch("scraper.src.db.upsert_listings", return_value=(1, 0, 0)) as upsert, \
+            patch("scraper.src.db.bump_data_version", return_value=2), \
+            patch("scraper.src.db.refresh_market_stats"), \
+            patch("scraper.src.model.registry") as registry:
+        load_data(str(path), batch_size=2)
+
+    assert [len(c.args[1]) for c in upsert.call_args_list] == [2, 1]
+    assert conn.commit.call_count == 2
+    registry.get.assert_called_once_with(conn)
+
+
+def test_load_data_publishes_committed_batches_when_a_later_batch_fails(tmp_path):
+    """Rows already committed still bump the version, so caches cannot go stale."""
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS)
+    conn = MagicMock()
+    failure = psycopg2.OperationalError("server closed the connection")
+    with patch("scraper.src.db.get_db", return_value=conn), \
+            patch("scraper.src.db.upsert_listings", side_effect=[(2, 0, 0), failure]), \
+            patch("scraper.src.db.bump_data_version", return_value=4) as bump, \
+            patch("scraper.src.db.refresh_market_stats") as refresh, \
+            patch("scraper.src.db.match_alerts", return_value=0) as match, \
+            patch("scraper.src.model.registry") as registry:
+        load_data(str(path), batch_size=2)
+
+    conn.rollback.assert_called()
+    bump.assert_called_once()
+    refresh.assert_called_once()
+    match.assert_called_once()
+    assert conn.commit.call_count == 2  # the first batch, then the publish
+    registry.get.assert_not_called()
+    conn.close.assert_called_once()
+
+
+def test_load_data_failing_before_any_commit_publishes_nothing(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS)
+    conn = MagicMock()
+    with patch("scraper.src.db.get_db", return_value=conn), \
+            patch("scraper.src.db.upsert_listings", side_effect=psycopg2.OperationalError("gone")), \
+            patch("scraper.src.db.bump_data_version") as bump:
+        load_data(str(path), batch_size=2)
+
+    bump.assert_not_called()
+    conn.commit.assert_not_called()
+
+
+def test_load_data_applies_removals_from_a_delta(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, [CARS[0], {"listing_key": "md5:abc", "removed": True}])
+    conn = MagicMock()
+    with patch("scraper.src.db.get_db", return_value=conn), \
+            patch("scraper.src.db.upsert_listings", return_value=(0, 1, 0)) as upsert, \
+            patch("scraper.src.db.delete_listings", return_value=1) as delete, \
+            patch("scraper.src.db.bump_data_version", return_value=3) as bump, \
+            patch("scraper.src.db.refresh_market_stats"), \
+            patch("scraper.src.model.registry"):
+        load_data(str(path))
+
+    assert upsert.call_args.args[1] == [CARS[0]]
+    assert delete.call_args.args[1] == ["md5:abc"]
+    bump.assert_called_once()
+
+
+def test_load_data_matches_alerts_for_the_sync(tmp_path):
+    """Alerts are matched against rows written since the sync began."""
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS[:1])
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = ("2026-01-01 09:00:00",)
+    with patch("scraper.src.db.get_db", return_value=conn), \
+            patch("scraper.src.db.upsert_listings", return_value=(1, 0, 0)), \
+            patch("scraper.src.db.bump_data_version", return_value=2), \
+            patch("scraper.src.db.refresh_market_stats"), \
+            patch("scraper.src.db.match_alerts", return_value=3) as match, \
+            patch("scraper.src.model.registry"):
+        load_data(str(path))
+    match.assert_called_once_with(conn.cursor.return_value, "2026-01-01 09:00:00")
+
+
+def test_load_data_skips_matching_when_nothing_changed(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    _write_ndjson(path, CARS[:1])
+    with patch("scraper.src.db.get_db", return_value=MagicMock()), \
+            patch("scraper.src.db.upsert_listings", return_value=(0, 0, 1)), \
+            patch("scraper.src.db.get_data_version", return_value=2), \
+            patch("scraper.src.db.match_alerts") as match, \
+            patch("scraper.src.model.registry"):
+        load_data(str(path))
+    match.assert_not_called()
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# New vehicles are often listed without a mileage
+NEW_CRVS = [
+    {"title": "2025 Honda CR-V Sport", "price": "$41,995", "mileage": "N/A", "link": "#"},
+    {"title": "2025 Honda CR-V Sport", "price": "$39,500", "mileage": "N/A", "link": "#"},
+]
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    init_db()
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    yield conn.cursor()
+    conn.rollback()
+    conn.close()
+
+
+def _stored_keys(cur):
+    cur.execute(
+        "SELECT listing_key, price_cents FROM cars WHERE title = %s ORDER BY price_cents;",
+        (NEW_CRVS[0]["title"],),
+    )
+    return cur.fetchall()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+def test_same_title_listings_without_mileage_both_survive_an_upsert(pg):
+    pg.execute("DELETE FROM cars WHERE title = %s;", (NEW_CRVS[0]["title"],))
+    assert upsert_listings(pg, NEW_CRVS) == (2, 0, 0)
+    # The scraper's incremental state keys them exactly as the table does
+    assert _stored_keys(pg) == [
+        (listing_key(c["link"], c["title"], c["mileage"], c["price"]), parse_price_cents(c["price"]))
+        for c in reversed(NEW_CRVS)
+    ]
+    assert upsert_listings(pg, NEW_CRVS) == (0, 0, 2)
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+def test_migration_rekeys_listings_without_mileage_on_price(pg):
+    pg.execute("DELETE FROM cars WHERE title = %s;", (NEW_CRVS[0]["title"],))
+    # As keyed before: title alone, the second listing suffixed to stay unique
+    old_key = "md5:by-title"
+    for i, car in enumerate(NEW_CRVS):
+        pg.execute(
+            "INSERT INTO cars (listing_key, title, price, mileage, link, price_cents) "
+            "VALUES (%s, %s, %s, %s, %s, %s);",
+            (old_key + ("#%d" % i if i else ""), car["title"], car["price"], car["mileage"],
+             car["link"], parse_price_cents(car["price"])),
+        )
+    migrate_priced_listing_key(pg)
+    assert [key for key, _ in _stored_keys(pg)] == [
+        listing_key(c["link"], c["title"], c["mileage"], c["price"]) for c in reversed(NEW_CRVS)
+    ]
+    migrate_priced_listing_key(pg)
+    assert pg.rowcount == 0
@@ -0,0 +1,47 @@
+"""
+Tests for the browserless HTTP fetcher against the local fixture server.
+"""
+
+import pytest
+
+from scraper.src.fetch import ChallengeDetected, HttpFetcher, is_challenge
+from scraper.src.main import extract_listings, page_url
+
+
+def test_fetch_reuses_one_compressed_keep_alive_connection(fixture_server):
+    fetcher = HttpFetcher()
+    pages = [
+        fetcher.fetch(page_url(offset, base_url=fixture_server.url))
+        for offset in (0, 15, 30)
+    ]
+    fetcher.close()
+
+    assert [len(extract_listings(html)) for html in pages] == [3, 3, 2]
+    assert len(fixture_server.connections) == 1
+    assert fixture_server.gzipped == 3
+
+
+def test_fetch_raises_on_challenge_page(fixture_server):
+    fixture_server.challenged.add("0")
+    with pytest.raises(ChallengeDetected):
+        HttpFetcher().fetch(page_url(0, base_url=fixture_server.url))
+
+
+def test_adopted_browser_cookies_clear_the_challenge(fixture_server):
+    fixture_server.challenged.add("0")
+    name, value = fixture_server.challenge_cookie.split("=")
+
+    class Browser:
+        def get_cookies(self):
+            return [{"name": name, "value": value, "domain": "127.0.0.1"}]
+
+    fetcher = HttpFetcher()
+    fetcher.adopt_cookies(Browser())
+    html = fetcher.fetch(page_url(0, base_url=fixture_server.url))
+    assert len(extract_listings(html)) == 3
+
+
+def test_is_challenge_checks_status_and_markers():
+    assert is_challenge(429, "")
+    assert is_challenge(200, "<title>Pardon Our Interruption</title>")
+    assert not is_challenge(200, "<div class='listing-details'>$15,900</div>")
@@ -0,0 +1,290 @@
+"""
+Tests for the pricing model registry (database mocked out).
+"""
+
+import os
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+import joblib
+import numpy as np
+
+from scraper.src.model import (
+    ModelRegistry,
+    deal_rating,
+    deal_ratings,
+    fit_pricing_model,
+    rate_listings,
+    score_listings,
+)
+
+TRAINING_ROWS = [
+    (1_500_000, 80_000, 2019, "Honda", "Civic"),
+    (1_850_000, 45_000, 2020, "Toyota", "Corolla"),
+    (3_200_000, 110_000, 2018, "Ford", "F-150"),
+    (2_700_000, 30_000, 2021, "Mazda", "CX-5"),
+    (1_100_000, 140_000, 2017, "Hyundai", "Elantra"),
+    (2_950_000, 20_000, None, None, None),
+]
+
+
+def _make_conn(version, rows=TRAINING_ROWS, scored=False):
+    """``scored``: whether every listing already carries ratings for ``version``."""
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+
+    def fetchone():
+        return (scored,) if "scored_version" in cur.execute.call_args.args[0] else (version,)
+
+    cur.fetchone.side_effect = fetchone
+    cur.fetchall.return_value = rows
+    return conn
+
+
+def test_fit_requires_enough_data():
+    """Fewer than 5 rows or constant values should yield no model."""
+    assert fit_pricing_model(TRAINING_ROWS[:4], 1) is None
+    assert fit_pricing_model([(1_000_000, 5_000, 2019, "Honda", "Civic")] * 6, 1) is None
+    assert fit_pricing_model(TRAINING_ROWS, 1).n_samples == 6
+
+
+def test_registry_trains_once_per_version():
+    """Repeated gets for the same data version should reuse the model."""
+    registry = ModelRegistry()
+    with patch("scraper.src.model.fit_pricing_model", wraps=fit_pricing_model) as fit, \
+            patch("scraper.src.model.score_listings") as score:
+        first = registry.get(_make_conn(1))
+        again = registry.get(_make_conn(1))
+        newer = registry.get(_make_conn(2))
+    assert first is again
+    assert newer is not first and newer.data_version == 2
+    assert fit.call_count == 2
+    assert score.call_count == 2
+
+
+def test_registry_loads_persisted_model(tmp_path):
+    """A worker should adopt a model persisted for the current version."""
+    path = str(tmp_path / "model.joblib")
+    with patch("scraper.src.model.score_listings"):
+        ModelRegistry(path).get(_make_conn(7))
+
+    worker = ModelRegistry(path)
+    worker.warm()
+    assert worker.model.data_version == 7
+    with patch("scraper.src.model.fit_pricing_model") as fit:
+        assert worker.get(_make_conn(7)).data_version == 7
+    fit.assert_not_called()
+
+
+def test_registry_saves_from_overlapping_workers_do_not_collide(tmp_path):
+    """Two workers persisting at once each write their own temp file."""
+    path = str(tmp_path / "model.joblib")
+    first, second = fit_pricing_model(TRAINING_ROWS, 1), fit_pricing_model(TRAINING_ROWS, 2)
+    replace = os.replace
+    calls = []
+
+    def interleaved_replace(src, dst):
+        # The second worker saves between the first one's dump and rename
+        calls.append(src)
+        if len(calls) == 1:
+            ModelRegistry(path).save(second)
+        replace(src, dst)
+
+    with patch("scraper.src.model.os.replace", side_effect=interleaved_replace), \
+            patch("scraper.src.model.log") as log:
+        ModelRegistry(path).save(first)
+
+    log.warning.assert_not_called()
+    assert joblib.load(path).data_version == 1
+    assert os.listdir(tmp_path) == ["model.joblib"]
+
+
+def test_registry_save_failure_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / "model.joblib")
+
+    def partial_dump(model, target):
+        target.write(b"partial")
+        raise OSError("disk full")
+
+    with patch("scraper.src.model.joblib.dump", side_effect=partial_dump):
+        ModelRegistry(path).save(fit_pricing_model(TRAINING_ROWS, 1))
+    assert os.listdir(tmp_path) == []
+
+
+class ManualExecutor:
+    """Executor whose futures complete only when the test says so."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.append((future, args))
+        return future
+
+
+def test_background_training_serves_current_model_until_swap():
+    """A non-blocking get must never fit inline, and swaps only when the job lands."""
+    executor = ManualExecutor()
+    registry = ModelRegistry(executor=executor)
+    with patch("scraper.src.model.score_listings"):
+        current = registry.get(_make_conn(1))
+    with patch("scraper.src.model.fit_pricing_model") as fit:
+        assert registry.get(_make_conn(2), block=False) is current
+        assert registry.get(_make_conn(2), block=False) is current
+    fit.assert_not_called()
+    assert len(executor.jobs) == 1
+    assert registry.status()["training_version"] == 2
+
+    future, args = executor.jobs[0]
+    assert args == (2, None)
+    newer = fit_pricing_model(TRAINING_ROWS, 2)
+    future.set_result(newer)
+    assert registry.get(_make_conn(2), block=False) is newer
+    assert registry.status()["training_version"] is None
+    assert len(executor.jobs) == 1
+
+
+def test_background_training_failure_keeps_model_and_retries():
+    executor = ManualExecutor()
+    registry = ModelRegistry(executor=executor)
+    registry.get(_make_conn(2), block=False)
+    executor.jobs[0][0].set_exception(RuntimeError("DATABASE_URL not configured"))
+    assert registry.model is None
+    assert registry.status()["training_failures"] == 1
+    registry.get(_make_conn(2), block=False)
+    assert len(executor.jobs) == 2
+
+
+def test_background_job_adopts_a_model_another_worker_trained(tmp_path):
+    """A worker that waited on the training lock neither refits nor re-scores."""
+    path = str(tmp_path / "model.joblib")
+    ModelRegistry(path).save(fit_pricing_model(TRAINING_ROWS, 7))
+    conn = _make_conn(7, scored=True)
+    with patch("scraper.src.model.fit_pricing_model") as fit, \
+            patch("scraper.src.model.score_listings") as score:
+        model = ModelRegistry(path)._train(conn, 7)
+    assert model.data_version == 7
+    fit.assert_not_called()
+    score.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+def test_background_job_without_a_model_path_skips_a_scored_version():
+    """With no persisted model to adopt, a waiting worker still neither refits nor re-scores."""
+    conn = _make_conn(7, scored=True)
+    with patch("scraper.src.model.fit_pricing_model") as fit, \
+            patch("scraper.src.model.score_listings") as score:
+        assert ModelRegistry(None)._train(conn, 7) is None
+    fit.assert_not_called()
+    score.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+def test_skipped_background_job_keeps_the_current_model():
+    executor = ManualExecutor()
+    registry = ModelRegistry(executor=executor)
+    current = registry._model = fit_pricing_model(TRAINING_ROWS, 6)
+    registry.get(_make_conn(7), block=False)
+    executor.jobs[0][0].set_result(None)
+    assert registry.model is current
+    assert registry.get(_make_conn(7), block=False) is current
+    assert len(executor.jobs) == 1
+
+
+def test_background_job_scores_rows_an_adopted_model_missed(tmp_path):
+    path = str(tmp_path / "model.joblib")
+    ModelRegistry(path).save(fit_pricing_model(TRAINING_ROWS, 7))
+    conn = _make_conn(7, scored=False)
+    with patch("scraper.src.model.fit_pricing_model") as fit, \
+            patch("scraper.src.model.score_listings") as score:
+        ModelRegistry(path)._train(conn, 7)
+    fit.assert_not_called()
+    score.assert_called_once()
+
+
+def test_fit_reports_duration():
+    model = fit_pricing_model(TRAINING_ROWS, 1, n_jobs=2)
+    assert model.train_seconds > 0
+    registry = ModelRegistry()
+    registry._model = model
+    status = registry.status()
+    assert status["train_seconds"] == round(model.train_seconds, 3)
+    assert status["age_seconds"] >= 0
+
+
+def test_model_learns_from_year_and_make():
+    """Same mileage, different year/make → different fair prices; unknowns still predict."""
+    rows = [
+        (price_cents, 60_000 + 1_000 * i, year, make, "X")
+        for i in range(20)
+        for year, make, price_cents in ((2012, "Kia", 800_000), (2022, "Porsche", 9_000_000))
+    ]
+    model = fit_pricing_model(rows, 1)
+    old_kia = model.fair_price(70_000, 2012, "Kia", "X")
+    new_porsche = model.fair_price(70_000, 2022, "PORSCHE", "x")
+    assert new_porsche - old_kia > 50_000
+    assert np.isfinite(model.fair_price(70_000, None, "Lada", None))
+
+
+def test_registry_retrains_persisted_model_of_older_schema(tmp_path):
+    path = str(tmp_path / "model.joblib")
+    registry = ModelRegistry(path)
+    stale = fit_pricing_model(TRAINING_ROWS, 7)
+    stale.schema = 1
+    registry.save(stale)
+    assert registry.load() is None
+
+
+def test_deal_rating_thresholds():
+    assert deal_rating(5000) == ("GREAT DEAL", "green")
+    assert deal_rating(1000) == ("GOOD DEAL", "teal")
+    assert deal_rating(0) == ("FAIR PRICE", "gray")
+    assert deal_rating(-5000) == ("OVERPRICED", "red")
+
+
+def test_vectorized_deal_ratings_match_scalar():
+    """np.select version should agree with deal_rating at every boundary."""
+    diffs = np.array([-5000, -3000, -2999, 0, 500, 501, 3000, 3001, 9000])
+    ratings, colors = deal_ratings(diffs)
+    assert list(zip(ratings, colors)) == [deal_rating(d) for d in diffs]
+
+
+def test_rate_listings_batches_and_skips_missing():
+    """One predict per page; rows without typed values stay N/A."""
+    model = fit_pricing_model(TRAINING_ROWS, 1)
+    values = TRAINING_ROWS[:2] + [(None, 50_000, 2019, "Kia", "Soul"), (1_000_000, None, None, None, None)]
+    with patch.object(model, "fair_prices", wraps=model.fair_prices) as predict:
+        rated = rate_listings(model, values)
+    predict.assert_called_once()
+    assert rated[:2] == [deal_rating(model.fair_price(*row[1:]) - row[0] / 100) for row in TRAINING_ROWS[:2]]
+    assert rated[2:] == [("N/A", "gray"), ("N/A", "gray")]
+    assert rate_listings(None, values) == [("N/A", "gray")] * 4
+
+
+def test_score_listings_bulk_updates_with_version():
+    """Scoring should batch one UPDATE ... FROM (VALUES ...) stamped with the version."""
+    model = fit_pricing_model(TRAINING_ROWS, 3)
+    conn = _make_conn(3, rows=[(i, *row) for i, row in enumerate(TRAINING_ROWS, 1)])
+    with patch("scraper.src.model.execute_values") as bulk, \
+            patch("scraper.src.model.notify_data_change") as notify:
+        assert score_listings(conn, model, 3) == len(TRAINING_ROWS)
+    # New ratings change /cars bodies, so the ETag stamp must advance
+    notify.assert_called_once()
+    values = list(bulk.call_args[0][2])
+    assert [v[0] for v in values] == list(range(1, 7))
+    assert {v[4] for v in values} == {3}
+    assert {v[2] for v in values} <= {"GREAT DEAL", "GOOD DEAL", "FAIR PRICE", "OVERPRICED"}
+    conn.commit.assert_called_once()
+
+
+def test_score_listings_without_model_marks_all_na():
+    """No model → every listing is marked N/A, no bulk update."""
+    conn = _make_conn(4)
+    with patch("scraper.src.model.execute_values") as bulk, \
+            patch("scraper.src.model.notify_data_change"):
+        assert score_listings(conn, None, 4) == 0
+    bulk.assert_not_called()
+    sql, params = conn.cursor.return_value.execute.call_args[0]
+    assert "deal_rating = 'N/A'" in sql and "WHERE TRUE" in sql
+    assert params == (4,)
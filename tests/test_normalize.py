@@ -0,0 +1,66 @@
+"""
+Tests for ingest-time price/mileage normalization.
+"""
+
+import pytest
+
+from scraper.src.normalize import listing_key, parse_mileage_km, parse_price_cents, parse_title
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("$15,900", 1_590_000),
+    ("$1,234.5", 123_450),
+    (" $999 ", 99_900),
+    ("N/A", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_price_cents(raw, expected):
+    assert parse_price_cents(raw) == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("85,000 km", 85_000),
+    ("120000KM", 120_000),
+    ("0 km", 0),
+    ("N/A", None),
+    (None, None),
+])
+def test_parse_mileage_km(raw, expected):
+    assert parse_mileage_km(raw) == expected
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("2022 Subaru Ascent Limited", (2022, "Subaru", "Ascent")),
+    ("Certified 2018 Chevy Silverado 1500 LT", (2018, "Chevrolet", "Silverado")),
+    ("2019 Land Rover Discovery Sport", (2019, "Land Rover", "Discovery")),
+    ("2020 Mercedes-Benz C300 4MATIC", (2020, "Mercedes-Benz", "C300")),
+    ("BMW 330i xDrive", (None, "BMW", "330i")),
+    ("2021 Ford", (2021, "Ford", None)),
+    ("2017 Unknown Roadster", (2017, None, None)),
+    ("2099 Honda Civic", (None, "Honda", "Civic")),
+    ("N/A", (None, None, None)),
+    (None, (None, None, None)),
+])
+def test_parse_title(title, expected):
+    assert parse_title(title) == expected
+
+
+def test_listing_key_keeps_real_urls():
+    url = "https://www.autotrader.ca/a/honda/civic/sudbury/ontario/5_123"
+    assert listing_key(url, "2019 Honda Civic", "85,000 km", "$18,500") == url
+
+
+@pytest.mark.parametrize("link", ["#", "https://www.google.com/search?q=x&ref=abc"])
+def test_listing_key_falls_back_to_title_and_mileage(link):
+    """Price-dependent fallback links must not change a listing's identity."""
+    key = listing_key(link, " 2019 Honda Civic", "85,000 km", "$18,500")
+    assert key == listing_key("#", "2019 HONDA CIVIC ", "85000 km", "$17,900")
+    assert key.startswith("md5:")
+
+
+def test_listing_key_without_mileage_falls_back_to_title_and_price():
+    """Same-title listings with no parsable mileage (e.g. new vehicles) stay apart."""
+    first = listing_key("#", "2025 Honda CR-V Sport", "N/A", "$41,995")
+    assert first != listing_key("#", "2025 Honda CR-V Sport", "N/A", "$39,500")
+    assert first == listing_key("#", "2025 HONDA CR-V SPORT ", None, "$41995")
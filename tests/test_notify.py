@@ -0,0 +1,161 @@
+"""
+Tests for the alert notification dispatcher (database and SMTP mocked out).
+"""
+
+import smtplib
+from email import message_from_bytes
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from scraper.src.notify import (
+    Digest,
+    Dispatcher,
+    FileTransport,
+    SMTPTransport,
+    get_transport,
+    is_transient,
+    render_digest,
+)
+
+ROWS = [
+    (11, "civic", 16000, "2017 Honda Civic LX", "https://a/1", 1_390_000),
+    (12, "corolla", 20000, "2019 Toyota Corolla", "https://a/2", 1_850_000),
+]
+
+
+def _stats():
+    return {"digests": 0, "matches": 0, "failed": 0, "retries": 0}
+
+
+def _dispatcher(transport, rows=ROWS, **options):
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = rows
+    options.setdefault("backoff", 0)
+    return Dispatcher(transport, connect=lambda: conn, workers=1, **options), conn
+
+
+def test_render_digest_lists_every_match():
+    msg = render_digest(Digest("a@example.com", ROWS))
+    assert msg["To"] == "a@example.com"
+    assert msg["Subject"].startswith("2 cars matched")
+    body = msg.get_content()
+    assert "2017 Honda Civic LX — $13,900" in body
+    assert "https://a/2" in body
+
+
+def test_message_id_is_stable_for_the_same_matches():
+    """A re-sent digest carries the same Message-ID, whatever the row order."""
+    assert Digest("a@example.com", ROWS).message_id == Digest("a@example.com", ROWS[::-1]).message_id
+    assert Digest("a@example.com", ROWS).message_id != Digest("a@example.com", ROWS[:1]).message_id
+
+
+def test_file_transport_overwrites_a_resent_digest(tmp_path):
+    transport = FileTransport(str(tmp_path))
+    msg = render_digest(Digest("a@example.com", ROWS))
+    transport.send(msg)
+    transport.send(render_digest(Digest("a@example.com", ROWS)))
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert message_from_bytes(files[0].read_bytes())["To"] == "a@example.com"
+
+
+def test_get_transport_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        get_transport("pigeon")
+
+
+def test_smtp_transport_reuses_connection_and_reconnects_after_drop():
+    with patch("scraper.src.notify.smtplib.SMTP") as smtp:
+        first, second = MagicMock(), MagicMock()
+        smtp.side_effect = [first, second]
+        first.send_message.side_effect = [None, smtplib.SMTPServerDisconnected()]
+        transport = SMTPTransport(starttls=False)
+        msg = render_digest(Digest("a@example.com", ROWS))
+
+        transport.send(msg)
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            transport.send(msg)
+        transport.send(msg)
+
+    assert smtp.call_count == 2
+    second.send_message.assert_called_once_with(msg)
+
+
+def test_deliver_sends_then_marks_matches_in_one_transaction():
+    transport = MagicMock()
+    dispatcher, conn = _dispatcher(transport)
+    stats = _stats()
+    dispatcher.deliver("a@example.com", stats)
+
+    transport.send.assert_called_once()
+    claim_sql = conn.cursor.return_value.execute.call_args_list[0][0][0]
+    assert "FOR UPDATE OF m SKIP LOCKED" in claim_sql
+    mark_sql, params = conn.cursor.return_value.execute.call_args_list[1][0]
+    assert "SET notified_at = CURRENT_TIMESTAMP" in mark_sql
+    assert params == ([11, 12],)
+    conn.commit.assert_called_once()
+    assert stats == {"digests": 1, "matches": 2, "failed": 0, "retries": 0}
+
+
+def test_deliver_skips_recipient_claimed_elsewhere():
+    transport = MagicMock()
+    dispatcher, conn = _dispatcher(transport, rows=[])
+    dispatcher.deliver("a@example.com", _stats())
+    transport.send.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+def test_deliver_retries_transient_failures():
+    transport = MagicMock()
+    transport.send.side_effect = [smtplib.SMTPServerDisconnected(), OSError("reset"), None]
+    dispatcher, conn = _dispatcher(transport, retries=2)
+    stats = _stats()
+    dispatcher.deliver("a@example.com", stats)
+    assert transport.send.call_count == 3
+    assert stats["retries"] == 2
+    assert stats["digests"] == 1
+    conn.commit.assert_called_once()
+
+
+def test_deliver_leaves_matches_pending_after_final_failure():
+    transport = MagicMock()
+    transport.send.side_effect = smtplib.SMTPRecipientsRefused({})
+    dispatcher, conn = _dispatcher(transport, retries=3)
+    stats = _stats()
+    dispatcher.deliver("a@example.com", stats)
+    # Permanent errors are not retried
+    assert transport.send.call_count == 1
+    assert stats["failed"] == 1
+    conn.commit.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+def test_run_once_reports_queue_depth_and_throughput():
+    transport = MagicMock()
+    dispatcher, conn = _dispatcher(transport, batch=10)
+    cur = conn.cursor.return_value
+    cur.fetchone.side_effect = [(2,), (0,)]
+    # pending recipients, then the claim for the one recipient
+    cur.fetchall.side_effect = [[("a@example.com",)], ROWS]
+    stats = dispatcher.run_once()
+    dispatcher.close()
+
+    assert stats["queue_before"] == 2
+    assert stats["queue_after"] == 0
+    assert stats["digests"] == 1
+    assert stats["matches"] == 2
+    assert stats["matches_per_s"] > 0
+
+
+@pytest.mark.parametrize("exc, transient", [
+    (smtplib.SMTPServerDisconnected(), True),
+    (ConnectionResetError(), True),
+    (smtplib.SMTPDataError(451, b"try later"), True),
+    (smtplib.SMTPDataError(554, b"rejected"), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"mailbox busy")}), True),
+    (smtplib.SMTPNotSupportedError(), False),
+])
+def test_is_transient(exc, transient):
+    assert is_transient(exc) is transient
@@ -0,0 +1,67 @@
+"""
+Tests for the API connection pool (psycopg2 pool mocked out).
+"""
+
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from scraper.src.pool import ConnectionPool, PoolTimeout
+
+
+def _make_pool(conns, **kwargs):
+    """Build a ConnectionPool whose underlying psycopg2 pool hands out conns."""
+    raw = MagicMock()
+    raw.getconn.side_effect = conns
+    with patch("scraper.src.pool.ThreadedConnectionPool", return_value=raw):
+        pool = ConnectionPool("postgresql://test", **kwargs)
+    return pool, raw
+
+
+def _conn(closed=0):
+    conn = MagicMock()
+    conn.closed = closed
+    return conn
+
+
+def test_checkout_and_return_updates_stats():
+    """A checkout should count as in use until returned."""
+    conn = _conn()
+    pool, raw = _make_pool([conn], maxconn=2)
+    with pool.connection() as got:
+        assert got is conn
+        assert pool.stats()["in_use"] == 1
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 1
+    raw.putconn.assert_called_once_with(conn, close=False)
+
+
+def test_closed_connection_is_discarded():
+    """A closed connection should be dropped and replaced on checkout."""
+    dead, fresh = _conn(closed=1), _conn()
+    pool, raw = _make_pool([dead, fresh])
+    assert pool.getconn() is fresh
+    raw.putconn.assert_called_once_with(dead, close=True)
+    assert pool.stats()["discarded"] == 1
+
+
+def test_stale_connection_is_pinged():
+    """Connections idle past ping_after should be probed before reuse."""
+    stale, fresh = _conn(), _conn()
+    stale.cursor.return_value.__enter__.return_value.execute.side_effect = (
+        psycopg2.OperationalError("server closed the connection")
+    )
+    pool, _ = _make_pool([stale, fresh], ping_after=0)
+    pool._last_used[id(stale)] = 0.0
+    assert pool.getconn() is fresh
+
+
+def test_exhausted_pool_times_out():
+    """Checkout should fail with PoolTimeout once every slot is taken."""
+    pool, _ = _make_pool([_conn()], maxconn=1, timeout=0.01)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
@@ -0,0 +1,120 @@
+"""
+Tests for the SQL query builders behind /cars and price history.
+
+These check the generated SQL and parameters only — no database needed.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from scraper.src.queries import (
+    TITLE_TSVECTOR,
+    build_count_query,
+    build_keyset_query,
+    build_listings_query,
+    build_price_drops_query,
+    build_price_history_query,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_listings_query_without_filters():
+    """No filters should produce no WHERE clause, just order + page."""
+    sql, params = build_listings_query()
+    assert "WHERE" not in sql
+    assert "COUNT(*) OVER ()" in sql
+    assert "ORDER BY created_at DESC, id DESC" in sql
+    assert params == [20, 0]
+
+
+def test_listings_query_combines_filters():
+    """Keyword and price bounds (dollars → cents) should be AND-ed."""
+    sql, params = build_listings_query("civic", 5000, 20000, page=3, limit=10)
+    assert sql.count(" AND ") == 2
+    assert params == ["civic", 500_000, 2_000_000, 10, 20]
+
+
+def test_listings_query_keyword_uses_indexed_full_text_expression():
+    sql, _ = build_listings_query("honda civic")
+    assert f"{TITLE_TSVECTOR} @@ websearch_to_tsquery('english', %s)" in sql
+    assert "ILIKE" not in sql
+
+
+def test_listings_query_collects_keyword_matches_first():
+    """Counted keyword pages must not be planned as a walk of the created_at index."""
+    sql, _ = build_listings_query("civic")
+    assert sql.startswith("WITH matches AS MATERIALIZED (SELECT * FROM cars WHERE")
+    assert "FROM matches ORDER BY" in sql
+    assert "MATERIALIZED" not in build_listings_query(min_price=5000)[0]
+
+
+def test_listings_query_relevance_sort_ranks_matches():
+    sql, params = build_listings_query("civic", sort="relevance")
+    assert f"ORDER BY ts_rank({TITLE_TSVECTOR}, websearch_to_tsquery('english', %s)) DESC" in sql
+    assert params == ["civic", "civic", 20, 0]
+
+
+def test_listings_query_relevance_without_keyword_is_newest():
+    sql, _ = build_listings_query(sort="relevance")
+    assert "ORDER BY created_at DESC, id DESC" in sql
+
+
+def test_partial_keyword_escapes_like_wildcards():
+    """Substring fallback: user-supplied % and _ must be matched literally."""
+    sql, params = build_listings_query("50%_off", partial=True)
+    assert "title ILIKE %s" in sql
+    assert params[0] == "%50\\%\\_off%"
+
+
+def test_count_query_shares_filters():
+    """COUNT(*) fallback must use the same WHERE clause, without paging."""
+    sql, params = build_count_query("civic", 0, 20000)
+    assert sql.startswith("SELECT COUNT(*) FROM cars WHERE")
+    assert "LIMIT" not in sql
+    assert params == ["civic", 2_000_000]
+    _, params = build_count_query("civ", partial=True)
+    assert params == ["%civ%"]
+
+
+def test_keyset_query_seeks_past_cursor_row():
+    """Cursor pages seek on (created_at, id) instead of counting and offsetting."""
+    sql, params = build_keyset_query("civic", max_price=20000, limit=10, after=(datetime(2026, 1, 1, 9, 0), 7))
+    assert "AND (created_at, id) < (%s::timestamp, %s)" in sql
+    assert "ORDER BY created_at DESC, id DESC" in sql
+    assert "OFFSET" not in sql and "COUNT" not in sql
+    assert params == ["civic", 2_000_000, datetime(2026, 1, 1, 9, 0), 7, 11]
+
+
+def test_keyset_query_first_page():
+    sql, params = build_keyset_query(limit=5)
+    assert "WHERE" not in sql
+    assert params == [6]
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(datetime(2026, 1, 1, 9, 0, 0, 123456), 42, partial=True)
+    assert "=" not in token
+    assert decode_cursor(token) == ((datetime(2026, 1, 1, 9, 0, 0, 123456), 42), True)
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", encode_cursor(datetime(2026, 1, 1), 1) + "x", "WyJ4IiwxXQ"])
+def test_decode_cursor_rejects_garbage(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_price_history_query_is_keyed_by_listing():
+    sql, params = build_price_history_query(42)
+    assert "WHERE listing_id = %s ORDER BY observed_at" in sql
+    assert params == [42]
+
+
+def test_price_drops_query_windows_by_observed_at():
+    """Only in-window observations are scanned; the previous price is one probe."""
+    sql, params = build_price_drops_query(days=3, limit=5)
+    assert "observed_at >= CURRENT_TIMESTAMP - make_interval(days => %s)" in sql
+    assert "LIMIT 1" in sql
+    assert "WHERE prev.price_cents > latest.price_cents" in sql
+    assert params == [3, 5]
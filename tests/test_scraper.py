@@ -0,0 +1,227 @@
+"""
+Tests for listing extraction and the scraper's output sinks (no browser needed).
+"""
+
+import glob
+import json
+import os
+import urllib.parse
+from unittest.mock import patch
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException, SessionNotCreatedException
+
+from bs4 import BeautifulSoup
+
+from scraper.src import main
+from scraper.src.main import (
+    JSONSink,
+    NDJSONSink,
+    clean_data,
+    driver_path,
+    extract_listings,
+    open_sink,
+    run_scraper,
+    wait_for_listings,
+)
+from scraper.src.parsing import PARSERS, find_card_roots
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "autotrader")
+
+ITEM = {"title": "2019 Honda Civic", "price": "$15,000", "mileage": "80,000 km", "link": "#"}
+
+
+def test_open_sink_picks_format_from_extension(tmp_path):
+    assert isinstance(open_sink(str(tmp_path / "cars.json")), JSONSink)
+    sink = open_sink(str(tmp_path / "cars.ndjson"))
+    assert isinstance(sink, NDJSONSink)
+    sink.close()
+
+
+def test_ndjson_sink_writes_each_item_immediately(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    sink = NDJSONSink(str(path))
+    sink.write(ITEM)
+    assert json.loads(path.read_text()) == ITEM
+    assert not (tmp_path / "cars.ndjson.done").exists()
+    sink.close()
+    assert (tmp_path / "cars.ndjson.done").exists()
+
+
+def test_ndjson_sink_clears_stale_done_marker(tmp_path):
+    (tmp_path / "cars.ndjson.done").touch()
+    sink = NDJSONSink(str(tmp_path / "cars.ndjson"))
+    assert not (tmp_path / "cars.ndjson.done").exists()
+    sink.close()
+
+
+def test_json_sink_writes_array_on_close(tmp_path):
+    path = tmp_path / "cars.json"
+    sink = JSONSink(str(path))
+    sink.write(ITEM)
+    sink.close()
+    assert json.loads(path.read_text()) == [ITEM]
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_clean_data_extracts_price_and_highest_mileage():
+    assert clean_data("Now $15,900 was $16,500", "price") == "$15,900"
+    assert clean_data("85,000 km (12 km from you)", "mileage") == "85,000 km"
+    assert clean_data("Call for price", "price") == "N/A"
+
+
+def test_extract_listings_parses_each_card_once():
+    """Two seed divs per card must still yield one listing per card."""
+    listings = extract_listings(_fixture("results_0.html"))
+    assert [(c["title"], c["price"], c["mileage"]) for c in listings] == [
+        ("2019 Honda Civic LX", "$15,900", "85,000 km"),
+        ("2020 Toyota Corolla LE", "$19,450", "42,300 km"),
+        ("2017 Ford F-150 XLT", "$27,995", "131,000 km"),
+    ]
+
+
+def test_card_root_is_nearest_priced_ancestor():
+    html = (
+        "<section><article id='card'><p>$9,999</p>"
+        "<div><div><div class='listing-details'>2015 Dodge Caravan 160,000 km</div></div></div>"
+        "</article></section>"
+    )
+    roots = find_card_roots(BeautifulSoup(html, "html.parser"))
+    assert [r.get("id") for r in roots] == ["card"]
+
+
+def test_dollar_in_script_or_comment_is_not_a_price():
+    html = (
+        "<div class='result-item'><script>var p = '$1';</script><!-- $2 -->"
+        "<div class='listing-details'>2015 Dodge Caravan</div></div>"
+    )
+    assert extract_listings(html) == []
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_parser_backends_match_html_parser(parser):
+    """Every backend must extract exactly what the default one does."""
+    if parser == "selectolax":
+        pytest.importorskip("selectolax")
+    pages = [
+        _fixture(os.path.basename(p))
+        for p in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    ]
+    pages.append(
+        "<div class='result-item'><script>var p = '$1';</script>"
+        "<div class='listing-details'>2015 Dodge Caravan &amp; more $5,000 12 km</div></div>"
+    )
+    for html in pages:
+        assert extract_listings(html, parser) == extract_listings(html, "html.parser")
+
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ValueError):
+        extract_listings("<div></div>", "html5lib")
+
+
+class PageDriver:
+    """Fake browser serving fixture pages whose cards render over ``render_polls`` polls."""
+
+    def __init__(self, render_polls=2):
+        self.render_polls = render_polls
+        self.urls = []
+        self.page_source = ""
+        self.quits = 0
+
+    def get(self, url):
+        offset = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)["rcs"][0]
+        path = os.path.join(FIXTURE_DIR, f"results_{offset}.html")
+        self.page_source = _fixture(os.path.basename(path)) if os.path.exists(path) else ""
+        self.urls.append(url)
+        self.polls = 0
+
+    def find_elements(self, by, selector):
+        self.polls += 1
+        cards = self.page_source.count('class="re-layout-inner"')
+        return [object()] * min(cards, self.polls // self.render_polls)
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(selector)
+        return elements[0]
+
+    def execute_script(self, script):
+        pass
+
+    def quit(self):
+        self.quits += 1
+
+
+@pytest.fixture
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(main, "_POLL_INTERVAL", 0.01)
+
+
+def test_wait_for_listings_returns_once_cards_settle(fast_polls):
+    driver = PageDriver()
+    driver.get("https://example.test/?rcs=0")
+    assert wait_for_listings(driver, timeout=2)
+    assert len(driver.find_elements(None, None)) == 3
+
+
+def test_wait_for_listings_times_out_without_cards(fast_polls):
+    driver = PageDriver()
+    driver.get("https://example.test/?rcs=999")
+    assert not wait_for_listings(driver, timeout=0.1)
+
+
+def test_unattended_run_reuses_one_browser_without_prompting(fast_polls, tmp_path, monkeypatch):
+    driver = PageDriver()
+    monkeypatch.setattr(main, "OUTPUT_FILE", str(tmp_path / "cars.json"))
+    monkeypatch.setattr(main, "PAGE_TIMEOUT", 0.2)
+    with patch.object(main, "get_driver", return_value=driver) as get_driver, \
+            patch("builtins.input", side_effect=AssertionError("prompted")):
+        run_scraper(pages=4, unattended=True)
+
+    get_driver.assert_called_once_with(headless=True)
+    # The fourth page has no cards, which ends the run
+    assert len(driver.urls) == 4 and driver.quits == 1
+    assert len(json.loads((tmp_path / "cars.json").read_text())) == 7
+
+
+def test_output_is_opened_before_the_browser_launches(tmp_path, monkeypatch):
+    """A following loader sees the new run before Chrome has even started."""
+    path = tmp_path / "cars.ndjson"
+    path.write_text('{"title": "OLD"}\n')
+    (tmp_path / "cars.ndjson.done").touch()
+    monkeypatch.setattr(main, "OUTPUT_FILE", str(path))
+    seen = {}
+
+    def launch(headless):
+        seen["size"] = path.stat().st_size
+        seen["marker"] = (tmp_path / "cars.ndjson.done").exists()
+        raise SessionNotCreatedException("no chrome")
+
+    with patch.object(main, "get_driver", side_effect=launch):
+        run_scraper(unattended=True)
+
+    assert seen == {"size": 0, "marker": False}
+    # The failed run is still marked done, so the loader stops
+    assert (tmp_path / "cars.ndjson.done").exists()
+
+
+def test_driver_path_is_resolved_once_and_cached_on_disk(tmp_path, monkeypatch):
+    binary = tmp_path / "chromedriver"
+    binary.touch()
+    monkeypatch.delenv("CHROMEDRIVER_PATH", raising=False)
+    monkeypatch.setattr(main, "DRIVER_CACHE", str(tmp_path / "cache" / "path"))
+    monkeypatch.setattr(main, "_driver_path", None)
+    with patch.object(main, "ChromeDriverManager") as manager:
+        manager.return_value.install.return_value = str(binary)
+        assert driver_path() == str(binary)
+        assert driver_path() == str(binary)
+        # A new process reads the cached path instead of resolving again
+        monkeypatch.setattr(main, "_driver_path", None)
+        assert driver_path() == str(binary)
+    assert manager.return_value.install.call_count == 1
@@ -0,0 +1,104 @@
+"""
+EXPLAIN checks that keyword search is served by the title indexes and
+cursor pages by the (created_at, id) index.
+
+Needs a PostgreSQL server: set TEST_DATABASE_URL (skipped otherwise).
+Everything happens in session-local temp tables, so any database works.
+"""
+
+import json
+import os
+
+import pytest
+
+from scraper.src.queries import TITLE_TSVECTOR, build_count_query, build_keyset_query, build_listings_query
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+MODELS = ("Honda Civic", "Toyota Corolla", "Ford F-150", "Mazda CX-5", "Kia Soul", "Jeep Wrangler")
+
+
+@pytest.fixture(scope="module")
+def cur():
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE cars (
+            id SERIAL PRIMARY KEY,
+            title TEXT, price TEXT, mileage TEXT, link TEXT,
+            price_cents INTEGER, mileage_km INTEGER,
+            model_year SMALLINT, make TEXT, model TEXT,
+            fair_price_cents INTEGER, deal_rating TEXT, deal_color TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute(f"CREATE INDEX idx_cars_title ON cars USING gin({TITLE_TSVECTOR});")
+    cur.execute("CREATE INDEX idx_cars_created_at ON cars (created_at DESC, id DESC);")
+    cur.execute(
+        "INSERT INTO cars (title, price_cents) "
+        "SELECT (2000 + g %% 24) || ' ' || (%s::text[])[1 + g %% %s] || ' #' || g, g * 100 "
+        "FROM generate_series(1, 20000) AS g;",
+        (list(MODELS), len(MODELS)),
+    )
+    cur.execute("ANALYZE cars;")
+    conn.commit()
+    yield cur
+    conn.close()
+
+
+def _plan_indexes(cur, sql, params):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    indexes = set()
+
+    def walk(node):
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    plan = cur.fetchone()[0]
+    walk((plan if isinstance(plan, list) else json.loads(plan))[0]["Plan"])
+    return indexes
+
+
+@pytest.mark.parametrize("keyword", ["civic", "2019 honda civic", '"ford f-150"', "honda -civic"])
+def test_full_text_keyword_uses_gin_index(cur, keyword):
+    assert "idx_cars_title" in _plan_indexes(cur, *build_listings_query(keyword))
+    assert "idx_cars_title" in _plan_indexes(cur, *build_count_query(keyword))
+
+
+def test_relevance_sort_uses_gin_index(cur):
+    sql, params = build_listings_query("civic", sort="relevance")
+    assert "idx_cars_title" in _plan_indexes(cur, sql, params)
+    cur.execute(sql, params)
+    assert all("Civic" in row[1] for row in cur.fetchall())
+
+
+def test_keyset_page_seeks_created_at_index(cur):
+    """A deep cursor page is an index seek, and paging by cursor matches paging by offset."""
+    cur.execute(*build_listings_query(page=500, limit=20))
+    by_offset = [row[0] for row in cur.fetchall()]
+    cur.execute(*build_listings_query(page=499, limit=20))
+    last = cur.fetchall()[-1]
+    sql, params = build_keyset_query(limit=20, after=(last[9], last[0]))
+    assert _plan_indexes(cur, sql, params) == {"idx_cars_created_at"}
+    cur.execute(sql, params)
+    assert [row[0] for row in cur.fetchall()][:20] == by_offset
+
+
+def test_partial_keyword_uses_trigram_index(cur):
+    cur.execute("SAVEPOINT trgm;")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT trgm;")
+        pytest.skip("pg_trgm is not available on this server")
+    cur.execute("CREATE INDEX idx_cars_title_trgm ON cars USING gin (title gin_trgm_ops);")
+    cur.execute("ANALYZE cars;")
+    try:
+        assert "idx_cars_title_trgm" in _plan_indexes(cur, *build_listings_query("civ", partial=True))
+    finally:
+        cur.execute("ROLLBACK TO SAVEPOINT trgm;")
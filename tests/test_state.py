@@ -0,0 +1,121 @@
+"""
+Tests for incremental scraping: page hashes, listing deltas and removals.
+"""
+
+import json
+from unittest.mock import patch
+
+from scraper.src.crawl import Crawler, run_crawl
+from scraper.src.main import JSONSink, page_url
+from scraper.src.normalize import listing_key
+from scraper.src.state import DeltaWriter, ScrapeState, page_digest
+
+CIVIC = {"title": "2019 Honda Civic", "price": "$15,000", "mileage": "80,000 km", "link": "#"}
+COROLLA = {"title": "2020 Toyota Corolla", "price": "$19,000", "mileage": "45,000 km", "link": "#"}
+SOUL = {"title": "2021 Kia Soul", "price": "$21,000", "mileage": "30,000 km", "link": "#"}
+
+
+def _run(state, pages, tmp_path):
+    """One scrape over {url: listings}; returns what was written."""
+    sink = JSONSink(str(tmp_path / "delta.json"))
+    writer = DeltaWriter(sink, state)
+    for url, listings in pages.items():
+        digest = page_digest(json.dumps(listings))
+        if not writer.page_unchanged(url, digest):
+            writer.write_page(url, digest, listings)
+    writer.finish()
+    sink.close()
+    return json.loads((tmp_path / "delta.json").read_text())
+
+
+def test_first_run_emits_everything_then_nothing(tmp_path):
+    state = ScrapeState(str(tmp_path / "state.json"))
+    pages = {"p1": [CIVIC], "p2": [COROLLA]}
+    assert _run(state, pages, tmp_path) == [CIVIC, COROLLA]
+    assert _run(ScrapeState.load(state.path), pages, tmp_path) == []
+
+
+def test_price_change_is_emitted_once(tmp_path):
+    state = ScrapeState(str(tmp_path / "state.json"))
+    _run(state, {"p1": [CIVIC, COROLLA]}, tmp_path)
+    cheaper = dict(CIVIC, price="$14,000")
+    assert _run(state, {"p1": [cheaper, COROLLA]}, tmp_path) == [cheaper]
+
+
+def test_removal_only_for_pages_crawled_this_run(tmp_path):
+    state = ScrapeState(str(tmp_path / "state.json"))
+    _run(state, {"p1": [CIVIC], "p2": [COROLLA]}, tmp_path)
+
+    # p2 was not crawled, so the Corolla is not assumed gone
+    delta = _run(state, {"p1": [SOUL]}, tmp_path)
+    civic_key = listing_key(CIVIC["link"], CIVIC["title"], CIVIC["mileage"], CIVIC["price"])
+    assert delta == [SOUL, {"listing_key": civic_key, "removed": True}]
+    assert sorted(state.listings) == sorted(
+        listing_key(car["link"], car["title"], car["mileage"], car["price"]) for car in (COROLLA, SOUL)
+    )
+
+
+def test_page_without_listings_is_not_a_removal(tmp_path):
+    """A challenge or error page parses to nothing; its listings must survive."""
+    state = ScrapeState(str(tmp_path / "state.json"))
+    _run(state, {"p1": [CIVIC, COROLLA]}, tmp_path)
+    digest = state.pages["p1"]
+
+    assert _run(state, {"p1": []}, tmp_path) == []
+    assert len(state.listings) == 2
+    assert state.pages["p1"] == digest
+
+
+def test_challenge_surviving_browser_fallback_fails_page(tmp_path):
+    """No cards after the browser wait → the page fails; nothing is removed."""
+    state = ScrapeState(str(tmp_path / "state.json"))
+    url = page_url(0)
+    _run(state, {url: [CIVIC, COROLLA]}, tmp_path)
+
+    class ChallengeDriver:
+        page_source = "<html><title>Just a moment...</title></html>"
+
+        def get(self, url):
+            pass
+
+        def quit(self):
+            pass
+
+    crawler = Crawler(ChallengeDriver, workers=1, retries=1, min_interval=0, backoff=0)
+    sink = JSONSink(str(tmp_path / "delta.json"))
+    writer = DeltaWriter(sink, state)
+    with patch("scraper.src.crawl.wait_for_listings", return_value=False) as wait:
+        stats = crawler.run([url], writer)
+    assert writer.finish() == 0
+    sink.close()
+
+    assert wait.call_count == 2
+    assert stats["failed"] == 1 and stats["pages"] == 0
+    assert json.loads((tmp_path / "delta.json").read_text()) == []
+    assert len(state.listings) == 2
+
+
+def test_unreadable_state_starts_fresh(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("{truncated")
+    state = ScrapeState.load(str(path))
+    assert state.pages == {} and state.listings == {}
+
+
+def test_warm_crawl_skips_unchanged_pages(fixture_server, tmp_path):
+    options = dict(
+        fetch="http", base_url=fixture_server.url, min_interval=0, page_timeout=0,
+        workers=2,
+    )
+    state_path = str(tmp_path / "state.json")
+    cold = run_crawl(
+        3, output_file=str(tmp_path / "cold.json"), state=ScrapeState.load(state_path), **options
+    )
+    warm = run_crawl(
+        3, output_file=str(tmp_path / "warm.json"), state=ScrapeState.load(state_path), **options
+    )
+
+    assert cold["new"] == 7 and cold["unchanged"] == 0
+    assert warm["unchanged"] == 3 and warm["listings"] == 0
+    assert json.loads((tmp_path / "warm.json").read_text()) == []
+    assert page_url(0, base_url=fixture_server.url) in ScrapeState.load(state_path).pages